@@ -0,0 +1,145 @@
+"""
+Deteksi transaksi dengan jumlah tidak biasa untuk kategorinya
+
+Untuk setiap kategori disimpan statistik berjalan (algoritma Welford:
+jumlah data, rata-rata, dan M2) atas log(jumlah) di tabel
+`category_amount_stats`. Trigger memperbaruinya dalam O(1) pada setiap
+insert, update, dan delete; Welford bisa dibalik, jadi transaksi yang
+dihapus atau diedit keluar dari statistik dengan tepat.
+
+Skala log dipakai karena jumlah pengeluaran condong ke kanan: tagihan dua
+kali lipat dari biasanya punya skor yang sama, berapa pun besar tagihannya.
+log(jumlah) diambil dari nomor bucket sketch (lihat `utils.amount_bucket`,
+galat maksimal 1%) agar trigger tidak butuh fungsi matematika SQLite.
+
+Skor sebuah transaksi adalah z-score log(jumlah)-nya terhadap statistik
+kategori tepat sebelum transaksi itu dicatat, disimpan di kolom
+`transactions.anomaly_score`.
+"""
+import math
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from utils import SKETCH_GAMMA, SKETCH_ZERO_BUCKET
+
+MIN_SAMPLES = 10  # Kategori dengan data lebih sedikit tidak diberi skor
+MIN_STD = 0.1  # Batas bawah simpangan baku log, kira-kira 10% dari jumlah
+THRESHOLD = 3.0  # Skor minimal untuk ditandai sebagai tidak biasa
+BUCKET_LOG = math.log(SKETCH_GAMMA)
+
+
+def bucket_log(bucket: Optional[int]) -> Optional[float]:
+    """log(jumlah) dari nomor bucket sketch, None untuk jumlah 0"""
+    if bucket is None or bucket == SKETCH_ZERO_BUCKET:
+        return None
+    return bucket * BUCKET_LOG
+
+
+def typical_amount(log_mean: float) -> float:
+    """Jumlah khas sebuah kategori (rata-rata geometris)"""
+    return math.exp(log_mean)
+
+
+@dataclass
+class RunningStats:
+    """Rata-rata dan varians berjalan (Welford) yang bisa ditambah dan dikurangi"""
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+
+    def add(self, x: float):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+
+    def remove(self, x: float):
+        if self.count <= 1:
+            self.count, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        mean = (self.count * self.mean - x) / (self.count - 1)
+        self.m2 = max(self.m2 - (x - mean) * (x - self.mean), 0.0)
+        self.mean = mean
+        self.count -= 1
+
+    @property
+    def std(self) -> Optional[float]:
+        if self.count < 2:
+            return None
+        return max(math.sqrt(self.m2 / (self.count - 1)), MIN_STD)
+
+    def score(self, x: float) -> Optional[float]:
+        """z-score x terhadap statistik ini, None jika datanya belum cukup"""
+        if self.count < MIN_SAMPLES:
+            return None
+        return (x - self.mean) / self.std
+
+
+class AnomalyScorer:
+    """Memberi skor transaksi baru secara berurutan.
+
+    Statistik dimuat sekali lalu diperbarui di sini untuk setiap baris,
+    sama seperti yang dilakukan trigger di database, sehingga transaksi
+    dalam satu batch import dinilai terhadap transaksi sebelumnya di batch
+    yang sama.
+    """
+
+    def __init__(self, stats: Dict[int, RunningStats]):
+        self.stats = stats
+
+    def score(self, category_id: int, bucket: Optional[int]) -> Optional[float]:
+        x = bucket_log(bucket)
+        if x is None:
+            return None
+        stats = self.stats.setdefault(category_id, RunningStats())
+        score = stats.score(x)
+        stats.add(x)
+        return score
+
+
+def backfill(cursor, batch_size: int = 10000) -> int:
+    """Menghitung ulang skor seluruh riwayat dan statistik per kategori dalam
+    satu kali baca (urut kategori, tanggal), mengembalikan jumlah transaksi
+    yang diberi skor.
+
+    Skor ditampung dulu di tabel sementara dan baru ditulis ke `transactions`
+    setelah pembacaan selesai, karena menulis tabel yang sedang dibaca lewat
+    koneksi yang sama hasilnya tidak terdefinisi di SQLite.
+    """
+    cursor.execute('''
+        CREATE TEMP TABLE IF NOT EXISTS anomaly_backfill (
+            id INTEGER PRIMARY KEY,
+            score REAL
+        )
+    ''')
+    cursor.execute('DELETE FROM temp.anomaly_backfill')
+    reader = cursor.connection.execute('''
+        SELECT id, category_id, amount_bucket FROM transactions
+        ORDER BY category_id, date, id
+    ''')
+    scorer = AnomalyScorer({})
+    updates = []
+    scored = 0
+    for transaction_id, category_id, bucket in reader:
+        score = scorer.score(category_id, bucket)
+        updates.append((transaction_id, score))
+        scored += score is not None
+        if len(updates) >= batch_size:
+            cursor.executemany('INSERT INTO temp.anomaly_backfill (id, score) VALUES (?, ?)', updates)
+            updates = []
+    cursor.executemany('INSERT INTO temp.anomaly_backfill (id, score) VALUES (?, ?)', updates)
+    reader.close()
+
+    cursor.execute('''
+        UPDATE transactions
+        SET anomaly_score = (SELECT b.score FROM temp.anomaly_backfill b WHERE b.id = transactions.id)
+    ''')
+    cursor.execute('DELETE FROM temp.anomaly_backfill')
+
+    cursor.execute('DELETE FROM category_amount_stats')
+    cursor.executemany(
+        'INSERT INTO category_amount_stats (category_id, count, mean, m2) VALUES (?, ?, ?, ?)',
+        [(category_id, stats.count, stats.mean, stats.m2)
+         for category_id, stats in scorer.stats.items() if stats.count]
+    )
+    return scored
@@ -0,0 +1,223 @@
+"""
+Penyimpanan lampiran transaksi (foto/PDF struk) berbasis hash isi
+
+Isi file tidak disimpan di tabel `transactions` (agar scan laporan tidak
+ikut membaca blob), melainkan di folder samping database:
+
+    py_money.db.attachments/
+        ab/ab12...ef    blob, nama file = sha256 isi aslinya (hex)
+        tmp/            file sementara selama penulisan
+
+Metadata ada di tabel `attachment_blobs` (ukuran, kompresi) dan
+`attachments` (lampiran per transaksi, nama file asli). File yang isinya
+sama hanya disimpan sekali. Blob dikompres zlib kecuali formatnya memang
+sudah terkompres (JPEG, PNG, ZIP, ...).
+
+Penulisan dan pembacaan dilakukan per potongan `CHUNK_SIZE`, jadi file
+sebesar apa pun tidak pernah dimuat utuh ke memori. Blob ditulis ke file
+sementara lalu di-rename, baru kemudian dicatat di database; blob yang
+tidak lagi dipakai lampiran mana pun (misalnya karena transaksinya
+dihapus) dibuang oleh `gc()`.
+"""
+import hashlib
+import mimetypes
+import os
+import tempfile
+import time
+import zlib
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+from database import Database
+
+CHUNK_SIZE = 64 * 1024
+COMPRESSION_LEVEL = 6
+# Format yang sudah terkompres; mengompres ulang hanya membuang waktu
+COMPRESSED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic', '.heif',
+                         '.zip', '.gz', '.bz2', '.xz', '.7z', '.mp4', '.mov'}
+TEMP_MAX_AGE = 3600  # Detik; file sementara yang lebih tua dianggap sisa proses gagal
+
+
+def default_path(db: Database) -> str:
+    """Lokasi penyimpanan lampiran bawaan: di samping file database"""
+    return db.db_name + '.attachments'
+
+
+class AttachmentStore:
+    """Menyimpan, membaca, dan membersihkan lampiran milik satu database"""
+
+    def __init__(self, db: Database, path: Optional[str] = None):
+        self.db = db
+        self.path = path or default_path(db)
+        self.temp_dir = os.path.join(self.path, 'tmp')
+
+    def blob_path(self, content_hash: str) -> str:
+        return os.path.join(self.path, content_hash[:2], content_hash)
+
+    # ===== MENULIS =====
+    def add(self, transaction_id: int, source: str, filename: Optional[str] = None,
+            compress: Optional[bool] = None) -> int:
+        """Melampirkan file `source` ke transaksi, mengembalikan ID lampiran.
+
+        `compress` None = otomatis berdasarkan ekstensi file.
+        """
+        filename = filename or os.path.basename(source)
+        with open(source, 'rb') as stream:
+            return self.add_stream(transaction_id, stream, filename, compress)
+
+    def add_stream(self, transaction_id: int, stream: BinaryIO, filename: str,
+                   compress: Optional[bool] = None) -> int:
+        """Seperti `add`, dengan isi dibaca dari stream biner"""
+        if self.db.get_transaction(transaction_id) is None:
+            raise ValueError(f"Transaksi {transaction_id} tidak ditemukan")
+        if compress is None:
+            compress = os.path.splitext(filename)[1].lower() not in COMPRESSED_EXTENSIONS
+        content_hash, size, stored_size, temp = self._write_temp(stream, compress)
+        try:
+            blob = self.db.get_attachment_blob(content_hash)
+            if blob is None:
+                target = self.blob_path(content_hash)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(temp, target)
+            else:
+                # Isi yang sama sudah tersimpan; pakai blob yang ada
+                size, stored_size = blob['size'], blob['stored_size']
+                compress = blob['compression'] == 'zlib'
+        finally:
+            if os.path.exists(temp):
+                os.remove(temp)
+        return self.db.add_attachment(transaction_id, content_hash, size, stored_size,
+                                      'zlib' if compress else 'none', filename,
+                                      mimetypes.guess_type(filename)[0])
+
+    def _write_temp(self, stream: BinaryIO, compress: bool) -> Tuple[str, int, int, str]:
+        """Menulis isi stream ke file sementara sambil menghitung sha256-nya.
+
+        Mengembalikan (hash, ukuran asli, ukuran tersimpan, path sementara).
+        """
+        os.makedirs(self.temp_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        compressor = zlib.compressobj(COMPRESSION_LEVEL) if compress else None
+        size = 0
+        fd, temp = tempfile.mkstemp(dir=self.temp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    size += len(chunk)
+                    out.write(compressor.compress(chunk) if compressor else chunk)
+                if compressor:
+                    out.write(compressor.flush())
+                stored_size = out.tell()
+                out.flush()
+                os.fsync(out.fileno())
+        except BaseException:
+            os.remove(temp)
+            raise
+        return digest.hexdigest(), size, stored_size, temp
+
+    # ===== MEMBACA =====
+    def iter_content(self, attachment_id: int) -> Iterator[bytes]:
+        """Isi asli lampiran per potongan; ValueError jika blob rusak"""
+        attachment = self.db.get_attachment(attachment_id)
+        if attachment is None:
+            raise KeyError(f"Lampiran {attachment_id} tidak ditemukan")
+        decompressor = zlib.decompressobj() if attachment['compression'] == 'zlib' else None
+        digest = hashlib.sha256()
+        with open(self.blob_path(attachment['hash']), 'rb') as f:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if decompressor:
+                    # Batasi hasil per langkah agar memori tetap kecil
+                    data = decompressor.decompress(chunk, CHUNK_SIZE)
+                    while data:
+                        digest.update(data)
+                        yield data
+                        data = decompressor.decompress(decompressor.unconsumed_tail, CHUNK_SIZE)
+                else:
+                    digest.update(chunk)
+                    yield chunk
+        if decompressor:
+            rest = decompressor.flush()
+            digest.update(rest)
+            if rest:
+                yield rest
+        if digest.hexdigest() != attachment['hash']:
+            raise ValueError(f"Isi lampiran {attachment_id} rusak (hash tidak cocok)")
+
+    def extract(self, attachment_id: int, destination: str, overwrite: bool = False) -> int:
+        """Menyalin isi lampiran ke file `destination` (folder = pakai nama
+        file asli), mengembalikan jumlah byte. File yang sudah ada hanya
+        ditimpa jika `overwrite`."""
+        if os.path.isdir(destination):
+            attachment = self.db.get_attachment(attachment_id)
+            if attachment is None:
+                raise KeyError(f"Lampiran {attachment_id} tidak ditemukan")
+            destination = os.path.join(destination, os.path.basename(attachment['filename']))
+        if not overwrite and os.path.exists(destination):
+            raise ValueError(f"File {destination} sudah ada (pakai --force untuk menimpa)")
+        temp = destination + '.part'
+        written = 0
+        try:
+            with open(temp, 'wb') as out:
+                for chunk in self.iter_content(attachment_id):
+                    out.write(chunk)
+                    written += len(chunk)
+        except BaseException:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+        os.replace(temp, destination)
+        return written
+
+    # ===== PEMBERSIHAN =====
+    def gc(self) -> Tuple[int, int]:
+        """Membuang blob yang tidak dipakai lampiran mana pun, file yang tidak
+        tercatat di database, dan sisa file sementara yang sudah lama.
+
+        Mengembalikan (jumlah file dibuang, byte dibebaskan).
+        """
+        removed, freed = 0, 0
+        for blob in self.db.delete_unreferenced_blobs():
+            size = self._remove(self.blob_path(blob['hash']))
+            if size is not None:
+                removed += 1
+                freed += size
+
+        if not os.path.isdir(self.path):
+            return removed, freed
+        known = self.db.get_attachment_blob_hashes()
+        cutoff = time.time() - TEMP_MAX_AGE
+        for entry in os.scandir(self.path):
+            if not entry.is_dir():
+                continue
+            for item in os.scandir(entry.path):
+                if entry.path == self.temp_dir:
+                    stale = item.stat().st_mtime < cutoff
+                else:
+                    stale = item.name not in known and item.stat().st_mtime < cutoff
+                if stale:
+                    size = self._remove(item.path)
+                    if size is not None:
+                        removed += 1
+                        freed += size
+            if entry.path != self.temp_dir and not os.listdir(entry.path):
+                os.rmdir(entry.path)
+        return removed, freed
+
+    def remove(self, attachment_id: int) -> bool:
+        """Melepas lampiran dari transaksinya (isinya dibuang saat gc)"""
+        return self.db.delete_attachment(attachment_id)
+
+    @staticmethod
+    def _remove(path: str) -> Optional[int]:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            return size
+        except FileNotFoundError:
+            return None
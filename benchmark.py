@@ -0,0 +1,723 @@
+"""
+Benchmark performa py-money
+
+Contoh:
+    python benchmark.py startup --runs 20
+    python benchmark.py memory --rows 200000
+    python benchmark.py reports --ledgers 4 --rows 250000
+    python benchmark.py tags --rows 1000000
+    python benchmark.py cache --rows 200000
+    python benchmark.py stats --rows 1000000
+    python benchmark.py anomaly --rows 1000000
+    python benchmark.py snapshot --rows 1000000
+    python benchmark.py reconcile --rows 500000
+    python benchmark.py sync --rows 500000
+    python benchmark.py merchants --rows 1000000
+    python benchmark.py rules --rows 200000 --rules 10 100 1000
+"""
+import argparse
+import os
+import random
+import re
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, List, Optional
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+
+
+def _measure(func: Callable[[], None], runs: int,
+             setup: Optional[Callable[[], None]] = None) -> List[float]:
+    """Menjalankan `func` sebanyak `runs` kali, mengembalikan durasi (detik)"""
+    durations = []
+    for _ in range(runs):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def _report(label: str, durations: List[float]):
+    """Mencetak median dan p90 durasi dalam milidetik"""
+    ordered = sorted(durations)
+    p90 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))]
+    print(f"  {label:42} median {statistics.median(ordered) * 1000:8.2f} ms"
+          f" | p90 {p90 * 1000:8.2f} ms")
+
+
+# ===== STARTUP =====
+FIRST_MENU_SCRIPT = (
+    "import sys; sys.path.insert(0, {root!r})\n"
+    "from main import PyMoneyApp\n"
+    "app = PyMoneyApp(); app.switch_ledger(app.ledger); app.show_main_menu()\n"
+)
+
+
+def bench_startup(args: argparse.Namespace):
+    """Waktu sampai menu pertama tampil dan sampai hasil CLI pertama keluar"""
+    import migrations
+    from database import Database
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'py_money.db')
+
+        def remove_db():
+            if os.path.exists(db_path):
+                os.remove(db_path)
+
+        def run(cmd: List[str]):
+            subprocess.run(cmd, cwd=workdir, check=True, stdout=subprocess.DEVNULL)
+
+        first_menu = [sys.executable, '-c', FIRST_MENU_SCRIPT.format(root=ROOT)]
+        first_cli = [sys.executable, os.path.join(ROOT, 'main.py'), 'list', '--limit', '1']
+
+        print(f"\n⏱️  Startup (proses baru, {args.runs} kali, termasuk start interpreter)")
+        _report("menu pertama, database baru", _measure(lambda: run(first_menu), args.runs, remove_db))
+        _report("menu pertama, skema terbaru", _measure(lambda: run(first_menu), args.runs))
+        _report("hasil CLI pertama, database baru", _measure(lambda: run(first_cli), args.runs, remove_db))
+        _report("hasil CLI pertama, skema terbaru", _measure(lambda: run(first_cli), args.runs))
+
+        def reset_version():
+            with sqlite3.connect(db_path) as conn:
+                conn.execute('PRAGMA user_version = 0')
+            conn.close()
+
+        print(f"\n⏱️  Database() di dalam proses ({args.runs} kali)")
+        _report("semua migrasi dijalankan ulang", _measure(lambda: Database(db_path).close(),
+                                                           args.runs, reset_version))
+        _report(f"jalur cepat (user_version={migrations.latest_version()})",
+                _measure(lambda: Database(db_path).close(), args.runs))
+
+
+# ===== DATA UJI =====
+def populate(db, rows: int, seed: int = 42, batch_size: int = 10000):
+    """Mengisi database dengan transaksi acak yang tersebar dalam 10 tahun"""
+    rng = random.Random(seed)
+    categories = [(cat['id'], cat['type']) for cat in db.get_all_categories()]
+    words = ['indomaret', 'grab', 'gojek', 'pln', 'kopi', 'gaji', 'tokopedia', 'shopee', 'bioskop']
+
+    def generate():
+        for _ in range(rows):
+            category_id, type_ = rng.choice(categories)
+            amount = round(rng.lognormvariate(11, 1.2), 2)
+            date = f"{rng.randint(2015, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+            yield (type_, amount, category_id, f"{rng.choice(words)} {rng.randint(1, 500)}", date)
+
+    batch = []
+    for row in generate():
+        batch.append(row)
+        if len(batch) >= batch_size:
+            db.add_transactions_bulk(batch)
+            batch = []
+    if batch:
+        db.add_transactions_bulk(batch)
+
+
+# ===== IN-MEMORY =====
+def bench_memory(args: argparse.Namespace):
+    """Latensi query mode file vs mode in-memory"""
+    from database import Database
+    from query import TransactionQuery
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'bench.db')
+        db = Database(db_path)
+        print(f"\n📦 Mengisi {args.rows:,} transaksi...")
+        populate(db, args.rows)
+        db.close()
+
+        workloads = {
+            'get_balance_summary': lambda db: db.get_balance_summary(),
+            'query: expense, 1 bulan': lambda db: db.query_transactions(TransactionQuery(
+                type='expense', start_date='2020-03-01', end_date='2020-03-31', limit=None)),
+            'query: teks deskripsi': lambda db: db.query_transactions(TransactionQuery(text='kopi 12')),
+            'get_transaction (by id)': lambda db: db.get_transaction(args.rows // 2),
+            'add_transaction': lambda db: db.add_transaction('expense', 1000, 4, 'bench', '2024-01-01'),
+        }
+
+        for label, in_memory in (("file", False), ("in-memory", True)):
+            start = time.perf_counter()
+            # Tanpa cache laporan: yang diukur latensi query, bukan cache hit
+            db = Database(db_path, in_memory=in_memory, persist_interval=3600, cache_size=0)
+            db.get_connection()
+            print(f"\n⏱️  Mode {label} (buka: {(time.perf_counter() - start) * 1000:.1f} ms)")
+            for name, workload in workloads.items():
+                _report(name, _measure(lambda: workload(db), args.runs))
+            start = time.perf_counter()
+            db.close()
+            print(f"  {'tutup (termasuk persist)':42} {(time.perf_counter() - start) * 1000:8.2f} ms")
+
+
+# ===== LAPORAN PARALEL =====
+def bench_reports(args: argparse.Namespace):
+    """Waktu laporan tahunan lintas ledger vs jumlah worker"""
+    from database import Database
+    from ledger import LedgerRegistry
+    from reports import plan_tasks, run_report
+
+    with tempfile.TemporaryDirectory() as workdir:
+        registry = LedgerRegistry(os.path.join(workdir, 'ledgers.json'), os.path.join(workdir, 'ledgers'))
+        print(f"\n📦 Mengisi {args.ledgers} ledger x {args.rows:,} transaksi...")
+        for i in range(args.ledgers):
+            db = Database(registry.create(f"ledger{i}"))
+            populate(db, args.rows, seed=i)
+            db.close()
+
+        tasks = plan_tasks(registry, [f"ledger{i}" for i in range(args.ledgers)])
+        cores = os.cpu_count() or 1
+        max_workers = args.max_workers or cores
+        print(f"\n⏱️  {len(tasks)} tugas (ledger x tahun), {cores} core")
+        worker_counts = sorted({1, 2, 4, 8, 16, max_workers} & set(range(1, max_workers + 1)))
+        baseline = None
+        for workers in worker_counts:
+            durations = _measure(lambda: run_report(tasks, workers), args.runs)
+            median = statistics.median(durations)
+            baseline = baseline or median
+            print(f"  {workers:2d} worker   median {median * 1000:9.1f} ms | speedup {baseline / median:5.2f}x")
+
+
+# ===== TAG =====
+TAGS = ['proyek', 'trip', 'reimburse', 'pajak', 'keluarga', 'kantor', 'hobi', 'darurat']
+
+
+def bench_tags(args: argparse.Namespace):
+    """Latensi query dengan filter tag pada jutaan baris bertag"""
+    from database import Database
+    from query import TransactionQuery
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db = Database(os.path.join(workdir, 'bench.db'), cache_size=0)
+        print(f"\n📦 Mengisi {args.rows:,} transaksi...")
+        populate(db, args.rows)
+
+        # Setiap tag dipasang ke sebagian transaksi acak (makin belakang makin jarang)
+        rng = random.Random(7)
+        start = time.perf_counter()
+        pairs = 0
+        for i, tag in enumerate(TAGS):
+            share = 0.3 / (i + 1)
+            ids = [tid for tid in range(1, args.rows + 1) if rng.random() < share]
+            pairs += db.tag_transactions(ids, [tag])
+        print(f"🔖 {pairs:,} pasangan transaksi-tag dalam {time.perf_counter() - start:.1f} detik")
+
+        workloads = {
+            'list 50 terbaru (tanpa tag)': lambda: db.query_transactions(TransactionQuery()),
+            'list 50: tag trip': lambda: db.query_transactions(TransactionQuery(tags_any=['trip'])),
+            'list 50: tag pajak ATAU darurat': lambda: db.query_transactions(
+                TransactionQuery(tags_any=['pajak', 'darurat'])),
+            'list 50: tag proyek DAN trip': lambda: db.query_transactions(
+                TransactionQuery(tags_all=['proyek', 'trip'])),
+            'list: tag darurat, 1 bulan': lambda: db.query_transactions(TransactionQuery(
+                tags_any=['darurat'], start_date='2020-03-01', end_date='2020-03-31', limit=None)),
+            'ringkasan: tag darurat': lambda: db.get_balance_summary(tags_any=['darurat']),
+            'ringkasan: tag kantor DAN hobi': lambda: db.get_balance_summary(tags_all=['kantor', 'hobi']),
+            'ringkasan per tag (semua tag)': db.get_tag_totals,
+        }
+        print(f"\n⏱️  Query bertag ({args.runs} kali)")
+        for name, workload in workloads.items():
+            _report(name, _measure(workload, args.runs))
+
+        label = 'tag_matching: 1 bulan (INSERT ... SELECT)'
+        _report(label, _measure(lambda: db.tag_matching(TransactionQuery(
+            start_date='2021-06-01', end_date='2021-06-30', limit=None), ['bench']), 1))
+        db.close()
+
+
+# ===== CACHE LAPORAN =====
+def bench_cache(args: argparse.Namespace):
+    """Laporan pertama vs tampilan ulang (cache), dan invalidasi lintas koneksi"""
+    from database import Database
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'bench.db')
+        db = Database(db_path)
+        print(f"\n📦 Mengisi {args.rows:,} transaksi...")
+        populate(db, args.rows)
+        other = Database(db_path, cache_size=0)  # Mewakili proses lain yang menulis
+
+        workloads = {
+            'get_balance_summary': lambda: db.get_balance_summary(),
+            'get_balance_summary(level=0)': lambda: db.get_balance_summary(0),
+            'get_monthly_balance_series': lambda: db.get_monthly_balance_series(),
+            'get_daily_balance_series (1 tahun)': lambda: db.get_daily_balance_series('2023-01-01',
+                                                                                      '2023-12-31'),
+            'get_budget_status': lambda: db.get_budget_status('2024-01'),
+        }
+        print(f"\n⏱️  Tanpa cache vs tampilan ulang ({args.runs} kali)")
+        for name, workload in workloads.items():
+            _report(f"{name} (miss)", _measure(workload, args.runs, db.report_cache.clear))
+            _report(f"{name} (hit)", _measure(workload, args.runs))
+
+        def write_from_other():
+            other.add_transaction('expense', 1000, 4, 'bench', '2024-01-01')
+
+        _report("summary setelah tulis dari proses lain",
+                _measure(lambda: db.get_balance_summary(), args.runs, write_from_other))
+
+        stats = db.report_cache.stats()
+        print(f"\n📊 Cache: {stats.hits:,} hit, {stats.misses:,} miss "
+              f"(hit rate {stats.hit_rate * 100:.1f}%), {stats.invalidations:,} invalidasi")
+        other.close()
+        db.close()
+
+
+# ===== STATISTIK PENGELUARAN =====
+def bench_stats(args: argparse.Namespace):
+    """Persentil dari sketch vs persentil eksak (mengurutkan semua jumlah)"""
+    from database import Database
+    from spending_stats import DEFAULT_QUANTILES, SpendingStats
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db = Database(os.path.join(workdir, 'bench.db'), cache_size=0)
+        print(f"\n📦 Mengisi {args.rows:,} transaksi...")
+        start = time.perf_counter()
+        populate(db, args.rows)
+        print(f"  insert + update sketch: {time.perf_counter() - start:.1f} detik")
+        stats = SpendingStats(db)
+        conn = db.get_connection()
+
+        def exact(start_period, end_period):
+            result = {}
+            for row in db.get_all_categories('expense'):
+                amounts = [r[0] for r in conn.execute(
+                    'SELECT amount FROM transactions WHERE category_id = ? AND date >= ? AND date <= ? '
+                    'ORDER BY amount', (row['id'], start_period + '-01', end_period + '-31'))]
+                if amounts:
+                    result[row['id']] = {q: amounts[int(q * (len(amounts) - 1))] for q in DEFAULT_QUANTILES}
+            return result
+
+        for label, start_period, end_period in (("1 bulan", '2020-03', '2020-03'),
+                                                ("1 tahun", '2020-01', '2020-12'),
+                                                ("semua data", '0000-00', '9999-12')):
+            print(f"\n⏱️  {label} ({args.runs} kali)")
+            _report("eksak (ORDER BY amount)", _measure(lambda: exact(start_period, end_period), args.runs))
+            _report("sketch", _measure(lambda: stats.by_category('expense', start_period, end_period),
+                                       args.runs))
+            truth = exact(start_period, end_period)
+            rows, _ = stats.by_category('expense', start_period, end_period)
+            error = max(abs(row.quantiles[q] - truth[row.category_id][q]) / truth[row.category_id][q]
+                        for row in rows for q in DEFAULT_QUANTILES)
+            print(f"  galat relatif maksimal: {error * 100:.2f}%")
+
+        start = time.perf_counter()
+        db.rebuild_amount_sketches()
+        print(f"\n🔄 Rebuild sketch dari nol: {time.perf_counter() - start:.1f} detik")
+        db.close()
+
+
+# ===== ANOMALI =====
+def bench_anomaly(args: argparse.Namespace):
+    """Biaya skor anomali saat insert, deteksi tagihan yang membengkak, dan backfill"""
+    from database import Database
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db = Database(os.path.join(workdir, 'bench.db'), cache_size=0)
+        print(f"\n📦 Mengisi {args.rows:,} transaksi...")
+        start = time.perf_counter()
+        populate(db, args.rows)
+        elapsed = time.perf_counter() - start
+        print(f"  insert + statistik + skor: {elapsed:.1f} detik ({args.rows / elapsed:,.0f} baris/detik)")
+
+        categories = [cat['id'] for cat in db.get_all_categories('expense')]
+        rng = random.Random(7)
+        counter = iter(range(10 ** 9))
+
+        def add_one():
+            db.add_transaction('expense', round(rng.lognormvariate(11, 1.2), 2), rng.choice(categories),
+                               f"bench {next(counter)}", '2024-12-31')
+
+        print(f"\n⏱️  add_transaction ({args.runs} kali)")
+        _report("insert + skor anomali", _measure(add_one, args.runs))
+
+        # Batch import dengan sebagian kecil tagihan yang membengkak 100x
+        batch, injected = [], set()
+        first_id = db.max_transaction_id() + 1
+        for i in range(args.batch):
+            amount = round(rng.lognormvariate(11, 1.2), 2)
+            if rng.random() < 0.01:
+                amount *= 100
+                injected.add(first_id + i)
+            batch.append(('expense', amount, rng.choice(categories), f"impor {i}", '2025-01-15'))
+        start = time.perf_counter()
+        db.add_transactions_bulk(batch)
+        elapsed = time.perf_counter() - start
+        flagged = {row['id'] for row in db.get_anomalies(min_id=first_id, limit=None)}
+        print(f"\n📥 Import {args.batch:,} baris: {args.batch / elapsed:,.0f} baris/detik")
+        print(f"  tagihan 100x terdeteksi: {len(flagged & injected):,}/{len(injected):,}, "
+              f"salah tandai: {len(flagged - injected):,}")
+
+        start = time.perf_counter()
+        scored = db.rebuild_anomaly_scores()
+        print(f"\n🔄 Backfill skor {scored:,} transaksi: {time.perf_counter() - start:.1f} detik")
+        db.close()
+
+
+# ===== SNAPSHOT KOLUMNAR =====
+def bench_snapshot(args: argparse.Namespace):
+    """Ringkasan per kategori dan per bulan: scan SQLite vs snapshot mmap"""
+    import snapshot
+    from database import Database
+    from models import Transaction
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db = Database(os.path.join(workdir, 'bench.db'), cache_size=0)
+        print(f"\n📦 Mengisi {args.rows:,} transaksi...")
+        populate(db, args.rows)
+        conn = db.get_connection()
+        path = snapshot.default_path(db)
+
+        start = time.perf_counter()
+        snapshot.write_snapshot(db, path)
+        print(f"\n🧊 Tulis snapshot penuh: {time.perf_counter() - start:.1f} detik")
+        populate(db, 1000, seed=1)
+        start = time.perf_counter()
+        snapshot.write_snapshot(db, path)
+        print(f"  append 1.000 transaksi baru: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        def sqlite_rows():
+            totals = {}
+            for row in db.iter_transactions(10000):
+                transaction = Transaction.from_db_row(row)
+                totals[transaction.category_id] = totals.get(transaction.category_id, 0) + transaction.amount
+
+        def sqlite_group():
+            conn.execute('SELECT category_id, SUM(amount), COUNT(*) FROM transactions '
+                         'GROUP BY category_id').fetchall()
+
+        def sqlite_monthly():
+            conn.execute("SELECT substr(date, 1, 7), type, SUM(amount) FROM transactions "
+                         "GROUP BY substr(date, 1, 7), type").fetchall()
+
+        reader = snapshot.ColumnarSnapshot(path)
+        print(f"\n⏱️  Total per kategori, semua data ({args.runs} kali)")
+        _report("SQLite baris + Transaction.from_db_row", _measure(sqlite_rows, max(1, args.runs // 5)))
+        _report("SQLite GROUP BY (full scan)", _measure(sqlite_group, args.runs))
+        _report("buka snapshot (mmap)", _measure(lambda: snapshot.ColumnarSnapshot(path).close(), args.runs))
+        _report("snapshot" + (" (numpy)" if snapshot.np is not None else " (tanpa numpy)"),
+                _measure(reader.category_totals, args.runs))
+        print(f"\n⏱️  Total per bulan ({args.runs} kali)")
+        _report("SQLite GROUP BY bulan, type", _measure(sqlite_monthly, args.runs))
+        _report("snapshot", _measure(reader.monthly_totals, args.runs))
+        reader.close()
+        db.close()
+
+
+# ===== REKONSILIASI =====
+def bench_reconcile(args: argparse.Namespace):
+    """Waktu dan memori puncak merge-join mutasi bank vs panjang mutasi"""
+    import csv
+    import tracemalloc
+    from datetime import date, timedelta
+    from database import Database
+    from reconcile import Reconciler, read_statement
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db = Database(os.path.join(workdir, 'bench.db'), cache_size=0)
+        print(f"\n📦 Mengisi {args.rows:,} transaksi...")
+        populate(db, args.rows)
+
+        # Mutasi = isi ledger dengan tanggal bergeser 0-2 hari, 1% hilang, 1% tambahan
+        rng = random.Random(5)
+        lines = []
+        for row in db.iter_transactions(10000):
+            if rng.random() < 0.01:
+                continue
+            posted = date.fromisoformat(row['date']) + timedelta(days=rng.randint(0, 2))
+            lines.append((posted.isoformat(), -row['amount'] if row['type'] == 'expense' else row['amount'],
+                          row['description']))
+            if rng.random() < 0.01:
+                lines.append((posted.isoformat(), -round(rng.uniform(1, 1e6), 2), 'tidak dicatat'))
+        lines.sort()
+
+        for fraction in (0.1, 1.0):
+            count = int(len(lines) * fraction)
+            path = os.path.join(workdir, f'mutasi-{count}.csv')
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['date', 'amount', 'description'])
+                writer.writerows(lines[:count])
+
+            reconciler = Reconciler(db)
+            start = time.perf_counter()
+            for _ in reconciler.run(read_statement(path)):
+                pass
+            elapsed = time.perf_counter() - start
+            tracemalloc.start()
+            for _ in Reconciler(db).run(read_statement(path)):
+                pass
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            summary = reconciler.summary
+            print(f"\n🏦 {count:,} baris mutasi: {elapsed:.1f} detik ({count / elapsed:,.0f} baris/detik), "
+                  f"memori puncak {peak / 1024:,.0f} KB")
+            print(f"  cocok {summary.matched:,} | belum dicatat {summary.missing:,} | "
+                  f"tidak ada di mutasi {summary.extra:,}")
+        db.close()
+
+
+# ===== MERCHANT =====
+def bench_merchants(args: argparse.Namespace):
+    """Merchant teratas: GROUP BY lewat index covering vs sketch Space-Saving"""
+    from database import Database
+    from merchants import MerchantReport
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db = Database(os.path.join(workdir, 'bench.db'), cache_size=0)
+        rng = random.Random(7)
+        letters = 'abcdefghijklmnopqrstuvwxyz'
+        names = [''.join(rng.choice(letters) for _ in range(8)) for _ in range(args.merchants)]
+        weights = [1 / (rank + 1) ** 1.1 for rank in range(len(names))]  # Sebaran Zipf
+        categories = [cat['id'] for cat in db.get_all_categories('expense')]
+        print(f"\n📦 Mengisi {args.rows:,} transaksi, {args.merchants:,} merchant...")
+        for start in range(0, args.rows, 50000):
+            count = min(50000, args.rows - start)
+            db.add_transactions_bulk(
+                ('expense', round(rng.lognormvariate(11, 1.2), 2), rng.choice(categories),
+                 f"QRIS {name.upper()} {rng.randint(1, 999)}",
+                 f"{rng.randint(2015, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}")
+                for name in rng.choices(names, weights, k=count)
+            )
+
+        report = MerchantReport(db)
+        for label, start_date, end_date in (("semua data", None, None),
+                                            ("satu tahun", '2024-01-01', '2024-12-31')):
+            print(f"\n🏪 Top {args.limit} merchant, {label}")
+            for order_by in ('total', 'count'):
+                start = time.perf_counter()
+                exact = report.top(args.limit, 'expense', start_date, end_date, order_by)
+                exact_time = time.perf_counter() - start
+                start = time.perf_counter()
+                approx = report.top(args.limit, 'expense', start_date, end_date, order_by,
+                                    approximate=True, capacity=args.capacity)
+                approx_time = time.perf_counter() - start
+                truth = {row.merchant: (row.total if order_by == 'total' else row.count) for row in exact}
+                recall = len(truth.keys() & {row.merchant for row in approx}) / max(len(truth), 1)
+                worst = max((abs((row.total if order_by == 'total' else row.count) - truth[row.merchant])
+                             / truth[row.merchant] for row in approx if row.merchant in truth), default=0)
+                print(f"  {order_by:5} | eksak {exact_time * 1000:8.1f} ms | perkiraan "
+                      f"{approx_time * 1000:8.1f} ms (kapasitas {args.capacity}) | "
+                      f"recall {recall:.0%} | galat maks {worst:.2%}")
+        db.close()
+
+
+# ===== SINKRONISASI =====
+def bench_sync(args: argparse.Namespace):
+    """Export/apply perubahan: biaya sebanding jumlah perubahan, bukan ukuran ledger"""
+    import sync
+    from database import Database
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db = Database(os.path.join(workdir, 'a.db'), cache_size=0)
+        print(f"\n📦 Mengisi {args.rows:,} transaksi...")
+        populate(db, args.rows)
+        db.close()
+        shutil.copy(os.path.join(workdir, 'a.db'), os.path.join(workdir, 'b.db'))
+        db = Database(os.path.join(workdir, 'a.db'), cache_size=0)
+        peer = Database(os.path.join(workdir, 'b.db'), cache_size=0)
+        peer.update_sync_device('b', reset=True)
+        path = os.path.join(workdir, 'changes.jsonl.gz')
+
+        def round_trip(label: str):
+            start = time.perf_counter()
+            count, _, _ = sync.export_changes(db, path, 'b')
+            exported = time.perf_counter() - start
+            start = time.perf_counter()
+            result = sync.apply_changes(peer, path)
+            applied = time.perf_counter() - start
+            print(f"  {label:28} {count:>9,} perubahan | export {exported * 1000:9.1f} ms | "
+                  f"apply {applied * 1000:9.1f} ms | {os.path.getsize(path) / 1024:,.0f} KB "
+                  f"({result.applied:,} diterapkan)")
+
+        print("\n🔄 Sinkronisasi A -> B")
+        round_trip("sinkronisasi pertama")
+        rng = random.Random(9)
+        max_id = db.max_transaction_id()
+        for changes in (10, 1000, 10000):
+            populate(db, changes // 2, seed=changes)
+            for transaction_id in rng.sample(range(1, max_id + 1), changes // 2):
+                row = db.get_transaction(transaction_id)
+                if row is not None:
+                    db.update_transaction(transaction_id, row['amount'] + 1, row['category_id'],
+                                          row['description'], row['date'])
+            round_trip(f"{changes:,} perubahan baru")
+        db.close()
+        peer.close()
+
+
+# ===== ATURAN KATEGORI =====
+def _naive_match(rules, type_: str, amount: float, description: Optional[str]):
+    """Pembanding: memeriksa (aturan, regex terkompilasi) satu per satu sesuai peringkat"""
+    from utils import normalize_description
+
+    text = f" {' '.join(normalize_description(description).split())} "
+    for rule, regex in rules:
+        if not rule.applies_to(type_, amount):
+            continue
+        if (rule.kind == 'amount'
+                or rule.kind == 'keyword' and f" {rule.pattern} " in text
+                or rule.kind == 'regex' and regex.search(description or '')):
+            return rule
+    return None
+
+
+def bench_rules(args: argparse.Namespace):
+    """Kategori otomatis: matcher gabungan vs aturan satu per satu, import, dan apply"""
+    from database import Database
+    from rules import Rule, RuleSet, recategorize
+    from transfer import import_transactions
+
+    rng = random.Random(11)
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    words = [''.join(rng.choice(letters) for _ in range(rng.randint(4, 9))) for _ in range(5000)]
+    rows = [('expense', round(rng.lognormvariate(11, 1.2), 2),
+             f"QRIS {' '.join(rng.choices(words, k=rng.randint(2, 4))).upper()} {rng.randint(1, 999)}")
+            for _ in range(args.rows)]
+
+    def make_rules(count: int) -> List[Rule]:
+        # 80% keyword, 15% regex, 5% rentang jumlah
+        rules = []
+        for i in range(count):
+            roll = rng.random()
+            if roll < 0.8:
+                rules.append(Rule(i + 1, 'keyword', ' '.join(rng.sample(words, rng.randint(1, 2))),
+                                  4, 'expense'))
+            elif roll < 0.95:
+                rules.append(Rule(i + 1, 'regex', f"{rng.choice(words)}\\s+\\w+", 4, 'expense'))
+            else:
+                low = round(rng.lognormvariate(11, 1.2), 2)
+                rules.append(Rule(i + 1, 'amount', None, 4, 'expense', low, low * 1.01))
+        return rules
+
+    print(f"\n🏷️  Mencocokkan {args.rows:,} deskripsi")
+    for count in args.rules:
+        rules = make_rules(count)
+        start = time.perf_counter()
+        compiled = RuleSet(rules)
+        compile_time = time.perf_counter() - start
+        start = time.perf_counter()
+        found = [compiled.match(*row) for row in rows]
+        compiled_rate = len(rows) / (time.perf_counter() - start)
+
+        sample = rows[:max(1, len(rows) // 20)]  # Cara naif lambat, cukup 5% baris
+        naive = [(rule, re.compile(rule.pattern, re.IGNORECASE) if rule.kind == 'regex' else None)
+                 for rule in compiled.rules]
+        start = time.perf_counter()
+        expected = [_naive_match(naive, *row) for row in sample]
+        naive_rate = len(sample) / (time.perf_counter() - start)
+        same = all(a is b for a, b in zip(found, expected))
+        matched = sum(rule is not None for rule in found) / len(found)
+        print(f"  {count:5,} aturan | kompilasi {compile_time * 1000:7.1f} ms | gabungan "
+              f"{compiled_rate:>10,.0f} baris/detik | satu per satu {naive_rate:>10,.0f} baris/detik | "
+              f"cocok {matched:.0%} | hasil sama: {'ya' if same else 'TIDAK'}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db = Database(os.path.join(workdir, 'bench.db'), cache_size=0)
+        for rule in make_rules(max(args.rules)):
+            db.add_category_rule(rule.kind, rule.pattern, rule.category_id,
+                                 rule.min_amount, rule.max_amount)
+        # Kategori cadangan untuk baris yang tidak cocok aturan lain
+        db.add_category_rule('amount', None, 7, min_amount=0, priority=-1)
+        path = os.path.join(workdir, 'import.csv')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('date,type,amount,category,description\n')
+            for type_, amount, description in rows:
+                f.write(f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d},{type_},{amount},,"
+                        f"{description}\n")
+
+        print(f"\n📥 Import {args.rows:,} baris tanpa kategori, {max(args.rules):,} aturan")
+        result = import_transactions(db, path)
+        print(f"  {result.imported:,} diimport ({result.rate:,.0f} baris/detik), "
+              f"{result.categorized:,} dikategorikan aturan")
+
+        db.add_category_rule('keyword', words[0], 5)
+        db.add_category_rule('regex', f"^qris {words[1]}", 6, priority=1)
+        result = recategorize(db)
+        print(f"\n🔄 Kategorisasi ulang riwayat: {result.scanned:,} diperiksa, "
+              f"{result.changed:,} dipindah ({result.scanned / result.elapsed:,.0f} baris/detik)")
+        db.close()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='Benchmark py-money')
+    subparsers = parser.add_subparsers(dest='benchmark', metavar='BENCHMARK', required=True)
+
+    startup_parser = subparsers.add_parser('startup', help='Waktu start aplikasi dan CLI')
+    startup_parser.add_argument('--runs', type=int, default=10)
+    startup_parser.set_defaults(func=bench_startup)
+
+    memory_parser = subparsers.add_parser('memory', help='Latensi query mode file vs in-memory')
+    memory_parser.add_argument('--rows', type=int, default=200000)
+    memory_parser.add_argument('--runs', type=int, default=20)
+    memory_parser.set_defaults(func=bench_memory)
+
+    reports_parser = subparsers.add_parser('reports', help='Skala laporan paralel vs jumlah core')
+    reports_parser.add_argument('--ledgers', type=int, default=4)
+    reports_parser.add_argument('--rows', type=int, default=250000, help='Transaksi per ledger')
+    reports_parser.add_argument('--runs', type=int, default=3)
+    reports_parser.add_argument('--max-workers', type=int, help='Worker terbanyak (default: jumlah core)')
+    reports_parser.set_defaults(func=bench_reports)
+
+    tags_parser = subparsers.add_parser('tags', help='Latensi filter tag pada jutaan baris')
+    tags_parser.add_argument('--rows', type=int, default=1000000)
+    tags_parser.add_argument('--runs', type=int, default=10)
+    tags_parser.set_defaults(func=bench_tags)
+
+    cache_parser = subparsers.add_parser('cache', help='Laporan dengan dan tanpa cache')
+    cache_parser.add_argument('--rows', type=int, default=200000)
+    cache_parser.add_argument('--runs', type=int, default=20)
+    cache_parser.set_defaults(func=bench_cache)
+
+    stats_parser = subparsers.add_parser('stats', help='Persentil sketch vs eksak')
+    stats_parser.add_argument('--rows', type=int, default=1000000)
+    stats_parser.add_argument('--runs', type=int, default=5)
+    stats_parser.set_defaults(func=bench_stats)
+
+    anomaly_parser = subparsers.add_parser('anomaly', help='Skor anomali saat insert dan backfill')
+    anomaly_parser.add_argument('--rows', type=int, default=1000000)
+    anomaly_parser.add_argument('--batch', type=int, default=50000, help='Baris per import uji')
+    anomaly_parser.add_argument('--runs', type=int, default=200)
+    anomaly_parser.set_defaults(func=bench_anomaly)
+
+    snapshot_parser = subparsers.add_parser('snapshot', help='Scan SQLite vs snapshot kolumnar mmap')
+    snapshot_parser.add_argument('--rows', type=int, default=1000000)
+    snapshot_parser.add_argument('--runs', type=int, default=10)
+    snapshot_parser.set_defaults(func=bench_snapshot)
+
+    reconcile_parser = subparsers.add_parser('reconcile', help='Rekonsiliasi mutasi: waktu dan memori')
+    reconcile_parser.add_argument('--rows', type=int, default=500000)
+    reconcile_parser.set_defaults(func=bench_reconcile)
+
+    merchants_parser = subparsers.add_parser('merchants', help='Top merchant eksak vs sketch')
+    merchants_parser.add_argument('--rows', type=int, default=1000000)
+    merchants_parser.add_argument('--merchants', type=int, default=50000)
+    merchants_parser.add_argument('--limit', type=int, default=10)
+    merchants_parser.add_argument('--capacity', type=int, default=200)
+    merchants_parser.set_defaults(func=bench_merchants)
+
+    rules_parser = subparsers.add_parser('rules', help='Kategori otomatis: gabungan vs satu per satu')
+    rules_parser.add_argument('--rows', type=int, default=200000)
+    rules_parser.add_argument('--rules', type=int, nargs='+', default=[10, 100, 1000])
+    rules_parser.set_defaults(func=bench_rules)
+
+    sync_parser = subparsers.add_parser('sync', help='Export/apply sinkronisasi vs jumlah perubahan')
+    sync_parser.add_argument('--rows', type=int, default=500000)
+    sync_parser.set_defaults(func=bench_sync)
+
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Cache hasil laporan per koneksi database
+
+Hasil query laporan (ringkasan saldo, riwayat, budget, dst.) disimpan
+dengan kunci nama method + argumennya. Validitasnya dicek lewat token
+`(PRAGMA data_version, total_changes)`: `data_version` berubah jika proses
+atau koneksi lain meng-commit perubahan ke file database, `total_changes`
+berubah jika koneksi ini sendiri menulis. Begitu token berbeda, seluruh
+isi cache dibuang, karena satu transaksi bisa memengaruhi laporan mana pun.
+
+Nilai yang dikembalikan dari cache adalah objek yang sama untuk setiap
+hit, jadi pemanggil tidak boleh mengubahnya.
+"""
+import functools
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+
+@dataclass
+class CacheStats:
+    """Statistik pemakaian cache"""
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0  # Entri dibuang karena cache penuh (LRU)
+    invalidations: int = 0  # Cache dikosongkan karena data berubah
+    size: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class ReportCache:
+    """Cache LRU untuk hasil laporan, divalidasi dengan token versi data"""
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._token: Optional[Tuple[int, int]] = None
+        self._stats = CacheStats()
+
+    def validate(self, token: Tuple[int, int]):
+        """Mengosongkan cache jika data sudah berubah sejak token terakhir"""
+        if token != self._token:
+            if self._entries:
+                self._entries.clear()
+                self._stats.invalidations += 1
+            self._token = token
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """Mengembalikan (ketemu, nilai)"""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self._stats.hits += 1
+            return True, self._entries[key]
+        self._stats.misses += 1
+        return False, None
+
+    def put(self, key: Hashable, value: Any):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._token = None
+
+    def stats(self) -> CacheStats:
+        return CacheStats(self._stats.hits, self._stats.misses, self._stats.evictions,
+                          self._stats.invalidations, len(self._entries))
+
+
+def _freeze(value: Any) -> Hashable:
+    """Mengubah argumen (list, set, dict) menjadi bentuk yang bisa jadi kunci"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return value
+
+
+def cached_report(method: Callable) -> Callable:
+    """Decorator untuk method `Database` yang hasilnya boleh di-cache.
+
+    Objek pemilik method harus punya atribut `report_cache` (ReportCache
+    atau None untuk menonaktifkan) dan method `data_token()`.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        cache = self.report_cache
+        if cache is None:
+            return method(self, *args, **kwargs)
+
+        cache.validate(self.data_token())
+        key = (method.__name__, _freeze(args), _freeze(kwargs))
+        found, value = cache.get(key)
+        if not found:
+            value = method(self, *args, **kwargs)
+            cache.put(key, value)
+        return value
+    return wrapper
@@ -0,0 +1,769 @@
+"""
+Perintah command line (non-interaktif) untuk py-money
+
+Contoh:
+    python main.py export transaksi.csv.gz
+    python main.py import transaksi.jsonl
+    python main.py --ledger bisnis export bisnis.jsonl
+    python main.py list --type expense --category Makanan --from 2024-01-01 --min 50000
+    python main.py tag add trip-bali --from 2024-07-01 --to 2024-07-10
+    python main.py summary --tag trip-bali --level 0
+    python main.py stats --from 2024-01 --to 2024-12
+    python main.py anomalies --from 2024-01-01
+    python main.py merchants --from 2024-01-01 --to 2024-12-31 --by count
+    python main.py rules add --keyword "grab food" --category Makanan
+    python main.py rules apply --from 2024-01-01 --dry-run
+    python main.py reconcile mutasi-juli.csv --days 3 --output rekonsiliasi.csv
+    python main.py snapshot --summary --from 2024-01-01
+    python main.py sync export laptop.sync.gz --peer laptop
+    python main.py sync apply hp.sync.gz
+    python main.py attach add 123 struk.pdf
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+from typing import List
+
+from anomaly import THRESHOLD, typical_amount
+from database import Database
+from ledger import LedgerRouter
+from models import Transaction
+from query import SORT_COLUMNS, TransactionQuery
+from utils import (format_currency, format_date, parse_tags, print_progress, validate_date,
+                   validate_period)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Membuat parser argumen command line"""
+    parser = argparse.ArgumentParser(
+        prog='py-money',
+        description='Pencatat keuangan CLI. Jalankan tanpa perintah untuk mode interaktif.'
+    )
+    parser.add_argument('--ledger', help='Nama ledger yang dipakai (default: ledger default)')
+    parser.add_argument('--in-memory', action='store_true',
+                        help='Muat ledger ke RAM, simpan ke file secara berkala dan saat keluar')
+    subparsers = parser.add_subparsers(dest='command', metavar='PERINTAH')
+
+    export_parser = subparsers.add_parser('export', help='Export transaksi ke CSV/JSONL')
+    export_parser.add_argument('path', help='File tujuan (.csv, .jsonl, opsional .gz)')
+    export_parser.add_argument('--format', choices=('csv', 'jsonl'), help='Paksa format file')
+    export_parser.add_argument('--gzip', action='store_true', help='Kompres output dengan gzip')
+    export_parser.add_argument('--batch-size', type=int, default=5000, help='Ukuran batch baca')
+    export_parser.set_defaults(handler=cmd_export)
+
+    import_parser = subparsers.add_parser('import', help='Import transaksi dari CSV/JSONL')
+    import_parser.add_argument('path', help='File sumber (.csv, .jsonl, opsional .gz)')
+    import_parser.add_argument('--format', choices=('csv', 'jsonl'), help='Paksa format file')
+    import_parser.add_argument('--batch-size', type=int, default=5000, help='Ukuran batch insert')
+    import_parser.add_argument('--dedupe', choices=('skip', 'flag', 'merge', 'off'), default='flag',
+                               help='Penanganan transaksi duplikat (default: flag)')
+    import_parser.set_defaults(handler=cmd_import)
+
+    reconcile_parser = subparsers.add_parser('reconcile', help='Cocokkan ledger dengan mutasi bank')
+    reconcile_parser.add_argument('path', help='File mutasi urut tanggal (.csv, .jsonl, opsional .gz)')
+    reconcile_parser.add_argument('--format', choices=('csv', 'jsonl'), help='Paksa format file')
+    reconcile_parser.add_argument('--days', type=int, default=3, help='Toleransi tanggal (hari, default 3)')
+    reconcile_parser.add_argument('--amount-tolerance', type=float, default=0.0,
+                                  help='Toleransi selisih jumlah (default 0)')
+    reconcile_parser.add_argument('--type', choices=('income', 'expense'), help='Hanya tipe ini')
+    reconcile_parser.add_argument('--output', help='Tulis semua hasil (termasuk yang cocok) ke CSV')
+    reconcile_parser.add_argument('--limit', type=int, default=50,
+                                  help='Maksimal baris selisih yang ditampilkan')
+    reconcile_parser.set_defaults(handler=cmd_reconcile)
+
+    attach_parser = subparsers.add_parser('attach', help='Lampiran transaksi (foto/PDF struk)')
+    attach_parser.add_argument('action', choices=('add', 'list', 'get', 'remove', 'gc'))
+    attach_parser.add_argument('id', nargs='?', type=int,
+                               help='ID transaksi (add, list) atau ID lampiran (get, remove)')
+    attach_parser.add_argument('file', nargs='?', help='File yang dilampirkan (add)')
+    attach_parser.add_argument('--output', help='get: file/folder tujuan (default: folder ini)')
+    attach_parser.add_argument('--force', action='store_true', help='get: timpa file tujuan yang sudah ada')
+    attach_parser.add_argument('--compress', choices=('auto', 'yes', 'no'), default='auto',
+                               help='add: kompres zlib (default: otomatis menurut jenis file)')
+    attach_parser.set_defaults(handler=cmd_attach)
+
+    sync_parser = subparsers.add_parser('sync', help='Sinkronisasi antar perangkat lewat file')
+    sync_parser.add_argument('action', choices=('export', 'apply', 'peers', 'device', 'compact'))
+    sync_parser.add_argument('path', nargs='?', help='File sinkronisasi (.jsonl, opsional .gz)')
+    sync_parser.add_argument('--peer', help='Nama perangkat tujuan (export) atau pengirim (apply)')
+    sync_parser.add_argument('--since', type=int,
+                             help='Export mulai dari seq ini (0 = kirim ulang semuanya)')
+    sync_parser.add_argument('--reset', action='store_true',
+                             help='device: buat device ID baru (setelah menyalin file database)')
+    sync_parser.add_argument('--name', help='device: ganti nama perangkat ini')
+    sync_parser.set_defaults(handler=cmd_sync)
+
+    duplicates_parser = subparsers.add_parser('duplicates', help='Tampilkan transaksi duplikat')
+    duplicates_parser.add_argument('--scan', action='store_true',
+                                   help='Tandai dulu duplikat yang sudah ada di riwayat')
+    duplicates_parser.add_argument('--limit', type=int, default=100)
+    duplicates_parser.set_defaults(handler=cmd_duplicates)
+
+    list_parser = subparsers.add_parser('list', help='Cari dan tampilkan transaksi')
+    add_filter_arguments(list_parser)
+    list_parser.add_argument('--sort', choices=sorted(SORT_COLUMNS), default='date')
+    list_parser.add_argument('--asc', action='store_true', help='Urutkan naik')
+    list_parser.add_argument('--limit', type=int, default=50)
+    list_parser.add_argument('--explain', action='store_true', help='Tampilkan query plan SQLite')
+    list_parser.set_defaults(handler=cmd_list)
+
+    tag_parser = subparsers.add_parser('tag', help='Kelola tag transaksi')
+    tag_parser.add_argument('action', choices=('list', 'add', 'remove', 'delete'),
+                            help='add/remove: pasang/lepas tag, delete: hapus tag seluruhnya')
+    tag_parser.add_argument('names', nargs='?', help='Nama tag, pisahkan dengan koma')
+    tag_parser.add_argument('--ids', type=int, nargs='+', help='ID transaksi')
+    add_filter_arguments(tag_parser)
+    tag_parser.set_defaults(handler=cmd_tag)
+
+    summary_parser = subparsers.add_parser('summary', help='Ringkasan saldo per kategori')
+    summary_parser.add_argument('--level', type=int, help='Gulung subkategori ke level ini (0 = teratas)')
+    summary_parser.add_argument('--tag', action='append', default=[], help='Hanya transaksi dengan tag ini')
+    summary_parser.add_argument('--all-tags', action='store_true', help='Wajib punya semua --tag')
+    summary_parser.set_defaults(handler=cmd_summary)
+
+    anomalies_parser = subparsers.add_parser('anomalies', help='Pengeluaran dengan jumlah tidak biasa')
+    anomalies_parser.add_argument('--from', dest='start', help='Mulai tanggal YYYY-MM-DD')
+    anomalies_parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                                  help=f'Skor minimal (default {THRESHOLD})')
+    anomalies_parser.add_argument('--limit', type=int, default=50)
+    anomalies_parser.add_argument('--rebuild', action='store_true',
+                                  help='Hitung ulang statistik dan skor seluruh riwayat dulu')
+    anomalies_parser.set_defaults(handler=cmd_anomalies)
+
+    merchants_parser = subparsers.add_parser('merchants', help='Merchant dengan pengeluaran terbesar')
+    merchants_parser.add_argument('--type', choices=('income', 'expense'), default='expense')
+    merchants_parser.add_argument('--from', dest='start', help='Tanggal awal YYYY-MM-DD')
+    merchants_parser.add_argument('--to', dest='end', help='Tanggal akhir YYYY-MM-DD')
+    merchants_parser.add_argument('--by', choices=('total', 'count'), default='total',
+                                  help='Urutkan menurut total jumlah atau jumlah transaksi')
+    merchants_parser.add_argument('--limit', type=int, default=10)
+    merchants_parser.add_argument('--approx', action='store_true',
+                                  help='Perkiraan satu kali baca dengan memori tetap (Space-Saving)')
+    merchants_parser.add_argument('--capacity', type=int,
+                                  help='Jumlah counter sketch untuk --approx (default 20 x limit)')
+    merchants_parser.set_defaults(handler=cmd_merchants)
+
+    rules_parser = subparsers.add_parser('rules', help='Aturan kategori otomatis')
+    rules_parser.add_argument('action', choices=('list', 'add', 'remove', 'apply', 'test'),
+                              help='apply: terapkan aturan ke riwayat transaksi')
+    rules_parser.add_argument('value', nargs='?', help='ID aturan (remove) atau deskripsi (test)')
+    pattern_group = rules_parser.add_mutually_exclusive_group()
+    pattern_group.add_argument('--keyword', help='add: frasa di deskripsi')
+    pattern_group.add_argument('--regex', help='add: ekspresi reguler untuk deskripsi')
+    rules_parser.add_argument('--category', help='add: nama kategori tujuan')
+    rules_parser.add_argument('--min', dest='min_amount', type=float, help='add: jumlah minimum')
+    rules_parser.add_argument('--max', dest='max_amount', type=float, help='add: jumlah maksimum')
+    rules_parser.add_argument('--priority', type=int, default=0,
+                              help='add: prioritas, lebih besar menang (default 0)')
+    rules_parser.add_argument('--type', choices=('income', 'expense'), default='expense',
+                              help='test: tipe transaksi (default expense)')
+    rules_parser.add_argument('--amount', type=float, default=0.0, help='test: jumlah transaksi')
+    rules_parser.add_argument('--from', dest='start', help='apply: tanggal awal YYYY-MM-DD')
+    rules_parser.add_argument('--to', dest='end', help='apply: tanggal akhir YYYY-MM-DD')
+    rules_parser.add_argument('--dry-run', action='store_true',
+                              help='apply: hanya hitung, jangan ubah transaksi')
+    rules_parser.set_defaults(handler=cmd_rules)
+
+    snapshot_parser = subparsers.add_parser('snapshot', help='Buat/perbarui snapshot kolumnar (mmap)')
+    snapshot_parser.add_argument('--path', help='Folder snapshot (default: <database>.snapshot)')
+    snapshot_parser.add_argument('--summary', action='store_true',
+                                 help='Tampilkan ringkasan per kategori dari snapshot')
+    snapshot_parser.add_argument('--from', dest='start', help='Tanggal awal ringkasan YYYY-MM-DD')
+    snapshot_parser.add_argument('--to', dest='end', help='Tanggal akhir ringkasan YYYY-MM-DD')
+    snapshot_parser.set_defaults(handler=cmd_snapshot)
+
+    stats_parser = subparsers.add_parser('stats', help='Median/p90/p99 jumlah transaksi per kategori')
+    stats_parser.add_argument('--type', choices=('income', 'expense'), default='expense')
+    stats_parser.add_argument('--from', dest='start', help='Bulan awal YYYY-MM')
+    stats_parser.add_argument('--to', dest='end', help='Bulan akhir YYYY-MM')
+    stats_parser.add_argument('--rebuild', action='store_true',
+                              help='Hitung ulang sketch dari seluruh transaksi dulu')
+    stats_parser.set_defaults(handler=cmd_stats)
+
+    balance_parser = subparsers.add_parser('balance', help='Saldo saat ini atau pada tanggal tertentu')
+    balance_parser.add_argument('--as-of', help='Tanggal YYYY-MM-DD (default hari ini)')
+    balance_parser.set_defaults(handler=cmd_balance)
+
+    history_parser = subparsers.add_parser('history', help='Riwayat saldo bulanan/harian')
+    history_parser.add_argument('--daily', action='store_true', help='Seri harian (butuh --from)')
+    history_parser.add_argument('--from', dest='start', help='Awal (YYYY-MM atau YYYY-MM-DD)')
+    history_parser.add_argument('--to', dest='end', help='Akhir (YYYY-MM atau YYYY-MM-DD)')
+    history_parser.set_defaults(handler=cmd_history)
+
+    forecast_parser = subparsers.add_parser('forecast', help='Proyeksi saldo beberapa bulan ke depan')
+    forecast_parser.add_argument('--months', type=int, default=6, choices=range(1, 25),
+                                 metavar='N', help='Jumlah bulan (1-24, default 6)')
+    forecast_parser.set_defaults(handler=cmd_forecast)
+
+    report_parser = subparsers.add_parser('report', help='Laporan tahunan paralel lintas ledger')
+    report_parser.add_argument('--ledgers', help='Daftar ledger dipisah koma (default: semua)')
+    report_parser.add_argument('--years', help='Tahun, misal 2020-2024 atau 2021,2023 (default: semua)')
+    report_parser.add_argument('--workers', type=int, help='Jumlah proses worker (default: jumlah core)')
+    report_parser.set_defaults(handler=cmd_report, needs_db=False)
+
+    ledger_parser = subparsers.add_parser('ledger', help='Kelola daftar ledger')
+    ledger_parser.add_argument('action', choices=('list', 'create', 'remove', 'default'))
+    ledger_parser.add_argument('name', nargs='?', help='Nama ledger')
+    ledger_parser.add_argument('--path', help='Path file database untuk ledger baru')
+    ledger_parser.set_defaults(handler=cmd_ledger, needs_db=False)
+
+    return parser
+
+
+def add_filter_arguments(parser: argparse.ArgumentParser):
+    """Argumen filter transaksi yang dipakai bersama beberapa perintah"""
+    parser.add_argument('--type', choices=('income', 'expense'), help='Tipe transaksi')
+    parser.add_argument('--category', action='append', default=[],
+                        help='Nama kategori (bisa diulang)')
+    parser.add_argument('--from', dest='start_date', help='Tanggal awal YYYY-MM-DD')
+    parser.add_argument('--to', dest='end_date', help='Tanggal akhir YYYY-MM-DD')
+    parser.add_argument('--min', dest='min_amount', type=float, help='Jumlah minimum')
+    parser.add_argument('--max', dest='max_amount', type=float, help='Jumlah maksimum')
+    parser.add_argument('--text', help='Cari teks di deskripsi')
+    parser.add_argument('--tag', action='append', default=[],
+                        help='Punya tag ini (bisa diulang, cukup salah satu)')
+    parser.add_argument('--all-tags', action='store_true', help='Wajib punya semua --tag')
+
+
+def build_query(args: argparse.Namespace, db: Database, **options) -> TransactionQuery:
+    """Menyusun TransactionQuery dari argumen filter"""
+    category_ids = []
+    for name in args.category:
+        category_id = db.get_category_id_by_name(name)
+        if category_id is None:
+            raise KeyError(f"Kategori '{name}' tidak ditemukan.")
+        category_ids.append(category_id)
+
+    tags = parse_tags(','.join(args.tag))
+    return TransactionQuery(
+        type=args.type, category_ids=category_ids,
+        start_date=args.start_date, end_date=args.end_date,
+        min_amount=args.min_amount, max_amount=args.max_amount, text=args.text,
+        tags_any=() if args.all_tags else tags, tags_all=tags if args.all_tags else (),
+        **options
+    )
+
+
+def run(args: argparse.Namespace) -> int:
+    """Menjalankan perintah yang dipilih, mengembalikan exit code"""
+    router = LedgerRouter(in_memory=args.in_memory)
+    try:
+        if not getattr(args, 'needs_db', True):
+            return args.handler(args, router)
+        return args.handler(args, router.get(args.ledger))
+    except (KeyError, ValueError) as e:
+        print(f"❌ {e.args[0] if e.args else e}")
+        return 1
+    finally:
+        router.close_all()
+
+
+# ===== PERINTAH =====
+def cmd_export(args: argparse.Namespace, db: Database) -> int:
+    """Export transaksi secara streaming"""
+    from transfer import export_transactions
+
+    print(f"📤 Export ke {args.path}")
+    count = export_transactions(db, args.path, fmt=args.format,
+                                compress=True if args.gzip else None,
+                                batch_size=args.batch_size, progress=print_progress)
+    print(f"\n✅ {count:,} transaksi berhasil diexport.")
+    return 0
+
+
+def cmd_import(args: argparse.Namespace, db: Database) -> int:
+    """Import transaksi secara streaming"""
+    from transfer import import_transactions
+
+    print(f"📥 Import dari {args.path}")
+    result = import_transactions(db, args.path, fmt=args.format,
+                                 batch_size=args.batch_size, progress=print_progress,
+                                 dedupe=None if args.dedupe == 'off' else args.dedupe)
+    print(f"\n✅ {result.imported:,} transaksi diimport "
+          f"({result.rate:,.0f} baris/detik), {result.skipped:,} baris dilewati.")
+    if result.categorized:
+        print(f"🏷️ {result.categorized:,} transaksi dikategorikan otomatis oleh aturan.")
+    if result.duplicates:
+        handled = {'skip': 'tidak disimpan', 'flag': 'tetap disimpan & ditandai',
+                   'merge': 'digabung ke transaksi asli'}[args.dedupe]
+        print(f"🔁 {result.duplicates:,} duplikat terdeteksi (mode: {args.dedupe}, {handled}).")
+    if result.anomalies:
+        print(f"🚨 {result.anomaly_count:,} pengeluaran dengan jumlah tidak biasa:")
+        print_anomalies(result.anomalies)
+        if result.anomaly_count > len(result.anomalies):
+            print(f"   ... dan {result.anomaly_count - len(result.anomalies):,} lainnya (lihat `anomalies`).")
+    for error in result.errors:
+        print(f"  ❌ {error}")
+    return 0 if result.skipped == 0 else 1
+
+
+def print_anomalies(rows):
+    """Mencetak transaksi tidak biasa beserta jumlah khas kategorinya"""
+    for row in rows:
+        print(f"{row['id']:6d} | {row['date']} | {row['category_name'][:15]:15} | "
+              f"{format_currency(row['amount']):>18} | "
+              f"biasanya ~{format_currency(typical_amount(row['log_mean']))} | skor {row['anomaly_score']:.1f}")
+
+
+def cmd_anomalies(args: argparse.Namespace, db: Database) -> int:
+    """Menampilkan pengeluaran dengan jumlah tidak biasa"""
+    if args.start and not validate_date(args.start):
+        print("❌ Format tanggal tidak valid! Gunakan format YYYY-MM-DD")
+        return 1
+    if args.rebuild:
+        print(f"🔄 {db.rebuild_anomaly_scores():,} transaksi diberi skor ulang.")
+    rows = db.get_anomalies(threshold=args.threshold, start_date=args.start, limit=args.limit)
+    if not rows:
+        print("✅ Tidak ada pengeluaran yang tidak biasa.")
+    print_anomalies(rows)
+    return 0
+
+
+def cmd_merchants(args: argparse.Namespace, db: Database) -> int:
+    """Menampilkan merchant teratas menurut total atau frekuensi"""
+    from merchants import MerchantReport
+
+    for date in (args.start, args.end):
+        if date and not validate_date(date):
+            print("❌ Format tanggal tidak valid! Gunakan format YYYY-MM-DD")
+            return 1
+    start = time.perf_counter()
+    rows = MerchantReport(db).top(args.limit, args.type, args.start, args.end, args.by,
+                                  approximate=args.approx, capacity=args.capacity)
+    elapsed = time.perf_counter() - start
+    if not rows:
+        print("📭 Tidak ada transaksi pada periode ini.")
+        return 0
+    print(f"{'#':>3} {'Merchant':25} {'Transaksi':>10} {'Total':>20}")
+    for rank, row in enumerate(rows, 1):
+        line = f"{rank:3d} {row.merchant[:25]:25} {row.count:>10,} {format_currency(row.total):>20}"
+        if row.error:
+            bound = format_currency(row.error) if args.by == 'total' else f"{row.error:,.0f}"
+            line += f"  (±{bound})"
+        print(line)
+    mode = "perkiraan" if args.approx else "eksak"
+    print(f"\n⏱️  {mode}, {elapsed:.2f} detik")
+    return 0
+
+
+def print_rules(rows):
+    """Mencetak daftar aturan kategori otomatis"""
+    for row in rows:
+        if row['min_amount'] is None and row['max_amount'] is None:
+            amount = '-'
+        else:
+            amount = (f"{format_currency(row['min_amount']) if row['min_amount'] is not None else ''}"
+                      f"..{format_currency(row['max_amount']) if row['max_amount'] is not None else ''}")
+        print(f"{row['id']:4d} | {row['kind']:7} | {(row['pattern'] or '-')[:30]:30} | {amount[:30]:30} | "
+              f"{row['category_name'][:15]:15} | prioritas {row['priority']}")
+
+
+def cmd_rules(args: argparse.Namespace, db: Database) -> int:
+    """Mengelola dan menerapkan aturan kategori otomatis"""
+    import rules
+
+    if args.action == 'list':
+        rows = db.get_category_rules()
+        if not rows:
+            print("📭 Belum ada aturan kategori.")
+        print_rules(rows)
+    elif args.action == 'add':
+        if not args.category:
+            print("❌ rules add butuh --category.")
+            return 1
+        category_id = db.get_category_id_by_name(args.category)
+        if category_id is None:
+            raise KeyError(f"Kategori '{args.category}' tidak ditemukan.")
+        kind = 'keyword' if args.keyword else 'regex' if args.regex else 'amount'
+        rule_id = rules.add_rule(db, kind, args.keyword or args.regex, category_id,
+                                 args.min_amount, args.max_amount, args.priority)
+        print(f"✅ Aturan #{rule_id} ditambahkan.")
+    elif args.action == 'remove':
+        if not args.value or not args.value.isdigit():
+            print("❌ rules remove butuh ID aturan.")
+            return 1
+        if not db.delete_category_rule(int(args.value)):
+            print(f"❌ Aturan {args.value} tidak ditemukan.")
+            return 1
+        print(f"🗑️ Aturan #{args.value} dihapus.")
+    elif args.action == 'test':
+        rule = rules.RuleSet.load(db).match(args.type, args.amount, args.value)
+        if rule is None:
+            print("📭 Tidak ada aturan yang cocok.")
+            return 1
+        print(f"🏷️ {rule.category_name} (aturan #{rule.id}, {rule.kind}"
+              f"{' ' + rule.pattern if rule.pattern else ''})")
+    else:
+        for date in (args.start, args.end):
+            if date and not validate_date(date):
+                print("❌ Format tanggal tidak valid! Gunakan format YYYY-MM-DD")
+                return 1
+        result = rules.recategorize(db, args.start, args.end, dry_run=args.dry_run)
+        rate = result.scanned / result.elapsed if result.elapsed > 0 else 0
+        action = "akan dipindah" if args.dry_run else "dipindah"
+        print(f"🏷️ {result.scanned:,} transaksi diperiksa, {result.matched:,} cocok aturan, "
+              f"{result.changed:,} {action} kategorinya ({rate:,.0f} baris/detik).")
+        if result.changed and not args.dry_run:
+            print("💡 Jalankan `anomalies --rebuild` untuk menghitung ulang skor anomali.")
+    return 0
+
+
+def cmd_reconcile(args: argparse.Namespace, db: Database) -> int:
+    """Rekonsiliasi ledger dengan file mutasi bank secara streaming"""
+    import csv
+    from reconcile import Reconciler, read_statement
+
+    reconciler = Reconciler(db, args.days, args.amount_tolerance, args.type)
+    output = open(args.output, 'w', newline='', encoding='utf-8') if args.output else None
+    writer = csv.writer(output) if output else None
+    if writer:
+        writer.writerow(['status', 'statement_line', 'date', 'type', 'amount', 'description',
+                         'transaction_id', 'ledger_date', 'ledger_amount'])
+    shown = 0
+    try:
+        for entry in reconciler.run(read_statement(args.path, args.format)):
+            line, row = entry.statement, entry.transaction
+            if writer:
+                writer.writerow([entry.status,
+                                 line.line_no if line else '', line.date if line else '',
+                                 line.type if line else row['type'], line.amount if line else '',
+                                 line.description if line else row['description'],
+                                 row['id'] if row else '', row['date'] if row else '',
+                                 row['amount'] if row else ''])
+            if entry.status == 'matched' or shown >= args.limit:
+                continue
+            shown += 1
+            if line:
+                print(f"❓ Tidak ada di ledger  | baris {line.line_no:6d} | {line.date} | "
+                      f"{format_currency(line.amount):>18} | {line.description or '-'}")
+            else:
+                print(f"➕ Tidak ada di mutasi  | ID {row['id']:9d} | {row['date']} | "
+                      f"{format_currency(row['amount']):>18} | {row['description'] or '-'}")
+    finally:
+        if output:
+            output.close()
+
+    summary = reconciler.summary
+    if not summary.statement_lines:
+        print("📭 File mutasi kosong.")
+        return 0
+    print(f"\n🏦 Periode {summary.start_date} s/d {summary.end_date}, "
+          f"{summary.statement_lines:,} baris mutasi")
+    print(f"  ✅ Cocok                : {summary.matched:,}")
+    print(f"  ❓ Belum dicatat        : {summary.missing:,} ({format_currency(summary.missing_amount)})")
+    print(f"  ➕ Tidak ada di mutasi  : {summary.extra:,} ({format_currency(summary.extra_amount)})")
+    return 0 if summary.balanced else 1
+
+
+def cmd_attach(args: argparse.Namespace, db: Database) -> int:
+    """Mengelola lampiran transaksi"""
+    from attachments import AttachmentStore
+
+    store = AttachmentStore(db)
+    if args.action in ('add', 'get', 'remove') and args.id is None:
+        print(f"❌ attach {args.action} butuh ID.")
+        return 1
+    if args.action == 'add':
+        if not args.file:
+            print("❌ attach add butuh path file.")
+            return 1
+        compress = {'auto': None, 'yes': True, 'no': False}[args.compress]
+        attachment_id = store.add(args.id, args.file, compress=compress)
+        attachment = db.get_attachment(attachment_id)
+        print(f"📎 Lampiran #{attachment_id} ditambahkan ke transaksi {args.id} "
+              f"({attachment['size']:,} byte, tersimpan {attachment['stored_size']:,} byte)")
+    elif args.action == 'list':
+        rows = db.get_attachments(args.id)
+        if not rows:
+            print("📭 Tidak ada lampiran.")
+        for row in rows:
+            print(f"{row['id']:6d} | transaksi {row['transaction_id']:6d} | {row['filename'][:30]:30} | "
+                  f"{row['size']:>12,} byte | {row['hash'][:12]}")
+    elif args.action == 'get':
+        destination = args.output or '.'
+        # File tujuan yang disebut eksplisit lewat --output boleh ditimpa
+        overwrite = args.force or (args.output is not None and not os.path.isdir(args.output))
+        written = store.extract(args.id, destination, overwrite=overwrite)
+        print(f"📥 Lampiran #{args.id} disimpan ({written:,} byte)")
+    elif args.action == 'remove':
+        if not store.remove(args.id):
+            print(f"❌ Lampiran {args.id} tidak ditemukan.")
+            return 1
+        print(f"🗑️ Lampiran #{args.id} dilepas (isi file dibuang saat `attach gc`).")
+    else:
+        removed, freed = store.gc()
+        print(f"🧹 {removed:,} file dibuang, {freed:,} byte dibebaskan.")
+    return 0
+
+
+def cmd_sync(args: argparse.Namespace, db: Database) -> int:
+    """Export/apply perubahan untuk sinkronisasi antar perangkat"""
+    import sync
+
+    if args.action in ('export', 'apply') and not args.path:
+        print(f"❌ sync {args.action} butuh path file.")
+        return 1
+    if args.action == 'export':
+        if not args.peer:
+            print("❌ sync export butuh --peer (nama perangkat tujuan).")
+            return 1
+        start = time.perf_counter()
+        count, since, until = sync.export_changes(db, args.path, args.peer, args.since)
+        print(f"📤 {count:,} perubahan (seq {since + 1}-{until}) ditulis ke {args.path} "
+              f"({time.perf_counter() - start:.2f} detik)")
+    elif args.action == 'apply':
+        start = time.perf_counter()
+        result = sync.apply_changes(db, args.path, args.peer)
+        print(f"📥 Dari '{result.peer}': {result.applied:,} diterapkan, "
+              f"{result.skipped:,} sudah ada, {result.conflicts:,} kalah oleh perubahan lokal "
+              f"({time.perf_counter() - start:.2f} detik)")
+    elif args.action == 'peers':
+        peers = db.get_sync_peers()
+        if not peers:
+            print("📭 Belum pernah sinkronisasi dengan perangkat lain.")
+        for peer in peers:
+            print(f"{peer['name'][:20]:20} kirim s/d seq {peer['last_sent_seq']:>8,} | "
+                  f"terima s/d seq {peer['last_received_seq']:>8,} | terakhir {peer['synced_at']}")
+    elif args.action == 'device':
+        db.update_sync_device(args.name, args.reset)
+        device_id, name = db.get_sync_device()
+        print(f"💻 {name} ({device_id}), seq terakhir {db.max_change_seq():,}")
+    else:
+        print(f"🧹 {db.compact_change_log():,} entri change log dibuang.")
+    return 0
+
+
+def cmd_duplicates(args: argparse.Namespace, db: Database) -> int:
+    """Menandai dan menampilkan transaksi duplikat"""
+    if args.scan:
+        print(f"🔍 {db.flag_existing_duplicates():,} duplikat baru ditandai.")
+
+    for row in db.get_flagged_duplicates(args.limit):
+        print(f"{row['id']:6d} (duplikat dari {row['duplicate_of']:6d}) | {row['date']} | "
+              f"{row['category_name']:15} | {format_currency(row['amount']):>18} | {row['description'] or '-'}")
+    return 0
+
+
+def cmd_list(args: argparse.Namespace, db: Database) -> int:
+    """Menampilkan transaksi hasil filter"""
+    query = build_query(args, db, sort=args.sort, descending=not args.asc, limit=args.limit)
+    if args.explain:
+        for detail in db.explain_query(query):
+            print(f"  {detail}")
+        return 0
+
+    for row in db.query_transactions(query):
+        transaction = Transaction.from_db_row(row)
+        print(f"{transaction.id:6d} | {format_date(transaction.date.strftime('%Y-%m-%d')):12} | "
+              f"{transaction.type:7} | {transaction.category_name:15} | "
+              f"{format_currency(transaction.amount):>18} | {transaction.description or '-'}"
+              + (f" [{row['tags']}]" if row['tags'] else ''))
+    return 0
+
+
+def cmd_tag(args: argparse.Namespace, db: Database) -> int:
+    """Memasang, melepas, menghapus, atau menampilkan tag"""
+    if args.action == 'list':
+        for row in db.get_all_tags():
+            print(f"{row['name']:20} {row['usage']:>10,} transaksi")
+        return 0
+
+    names = parse_tags(args.names)
+    if not names:
+        raise ValueError("Nama tag wajib diisi")
+    if args.action == 'delete':
+        for name in names:
+            print(f"{'✅' if db.delete_tag(name) else '❌'} {name}")
+        return 0
+
+    if args.action == 'remove':
+        if not args.ids:
+            raise ValueError("Pilih transaksi dengan --ids")
+        print(f"✅ {db.untag_transactions(args.ids, names):,} tag dilepas.")
+        return 0
+
+    if args.ids:
+        count = db.tag_transactions(args.ids, names)
+    else:
+        query = build_query(args, db, limit=None)
+        if not query.where_clause()[0]:
+            raise ValueError("Pilih transaksi dengan --ids atau minimal satu filter")
+        count = db.tag_matching(query, names)
+    print(f"✅ {count:,} tag dipasang.")
+    return 0
+
+
+def cmd_summary(args: argparse.Namespace, db: Database) -> int:
+    """Menampilkan ringkasan saldo per kategori"""
+    tags = parse_tags(','.join(args.tag))
+    summary = db.get_balance_summary(args.level, tags_any=() if args.all_tags else tags,
+                                     tags_all=tags if args.all_tags else ())
+    for row in summary['by_category']:
+        print(f"{row['type']:7} | {row['category_name']:20} | {format_currency(row['total']):>18}")
+    print(f"\nPemasukan {format_currency(summary['total_income'])} | "
+          f"Pengeluaran {format_currency(summary['total_expense'])} | "
+          f"Saldo {format_currency(summary['balance'])}")
+    return 0
+
+
+def cmd_snapshot(args: argparse.Namespace, db: Database) -> int:
+    """Membuat/memperbarui snapshot kolumnar lalu (opsional) meringkasnya"""
+    from snapshot import ColumnarSnapshot, default_path, write_snapshot
+
+    for date in (args.start, args.end):
+        if date and not validate_date(date):
+            print("❌ Format tanggal tidak valid! Gunakan format YYYY-MM-DD")
+            return 1
+    path = args.path or default_path(db)
+    start = time.perf_counter()
+    written, rebuilt = write_snapshot(db, path)
+    action = "dibangun ulang" if rebuilt else "diperbarui"
+    print(f"🧊 Snapshot {path} {action}: {written:,} baris ditulis "
+          f"({time.perf_counter() - start:.2f} detik)")
+    if not args.summary:
+        return 0
+
+    with ColumnarSnapshot(path) as snapshot:
+        summary = snapshot.summary(args.start, args.end)
+    print(f"\nTotal Pemasukan   : {format_currency(summary['total_income']):>20}")
+    print(f"Total Pengeluaran : {format_currency(summary['total_expense']):>20}")
+    print(f"Saldo             : {format_currency(summary['balance']):>20}")
+    for row in summary['by_category']:
+        print(f"  {row['name'][:20]:20} {row['count']:>10,} {format_currency(row['total']):>20}")
+    return 0
+
+
+def cmd_stats(args: argparse.Namespace, db: Database) -> int:
+    """Menampilkan persentil jumlah transaksi per kategori dari sketch"""
+    from spending_stats import SpendingStats
+
+    if args.rebuild:
+        print(f"🔄 {db.rebuild_amount_sketches():,} bucket sketch dihitung ulang.")
+    rows, total = SpendingStats(db).by_category(args.type, args.start, args.end)
+    if total is None:
+        print("📭 Tidak ada transaksi pada periode ini.")
+        return 0
+    print(f"{'Kategori':20} {'Transaksi':>10} {'Median':>18} {'P90':>18} {'P99':>18}")
+    for stats in rows + [total]:
+        print(f"{stats.category_name[:20]:20} {stats.count:>10,} {format_currency(stats.quantiles[0.5]):>18} "
+              f"{format_currency(stats.quantiles[0.9]):>18} {format_currency(stats.quantiles[0.99]):>18}")
+    return 0
+
+
+def cmd_balance(args: argparse.Namespace, db: Database) -> int:
+    """Menampilkan saldo pada tanggal tertentu"""
+    date = args.as_of or datetime.now().strftime("%Y-%m-%d")
+    if not validate_date(date):
+        print("❌ Format tanggal tidak valid! Gunakan format YYYY-MM-DD")
+        return 1
+    print(f"Saldo pada akhir {format_date(date)}: {format_currency(db.get_balance_as_of(date))}")
+    return 0
+
+
+def cmd_history(args: argparse.Namespace, db: Database) -> int:
+    """Menampilkan riwayat saldo bulanan atau harian"""
+    if args.daily:
+        end = args.end or datetime.now().strftime("%Y-%m-%d")
+        if not (args.start and validate_date(args.start) and validate_date(end)):
+            print("❌ Seri harian butuh --from dan --to dengan format YYYY-MM-DD")
+            return 1
+        for row in db.get_daily_balance_series(args.start, end):
+            print(f"{row['date']} {format_currency(row['net']):>18} {format_currency(row['balance']):>20}")
+        return 0
+
+    for period in (args.start, args.end):
+        if period and not validate_period(period):
+            print("❌ Format tidak valid! Gunakan YYYY-MM atau YYYY-MM-DD")
+            return 1
+    for row in db.get_monthly_balance_series(args.start, args.end):
+        print(f"{row['period']} {format_currency(row['income']):>18} "
+              f"{format_currency(row['expense']):>18} {format_currency(row['balance']):>20}")
+    return 0
+
+
+def cmd_forecast(args: argparse.Namespace, db: Database) -> int:
+    """Menampilkan proyeksi saldo"""
+    from forecast import Forecaster
+
+    for point in Forecaster(db).forecast(args.months):
+        print(f"{point.period} {format_currency(point.income):>18} "
+              f"{format_currency(point.expense):>18} {format_currency(point.balance):>20}")
+    return 0
+
+
+def parse_years(text: str) -> List[int]:
+    """'2020-2024' atau '2021,2023' -> daftar tahun"""
+    years = []
+    for part in text.split(','):
+        if '-' in part:
+            first, last = part.split('-', 1)
+            years.extend(range(int(first), int(last) + 1))
+        else:
+            years.append(int(part))
+    return years
+
+
+def cmd_report(args: argparse.Namespace, router: LedgerRouter) -> int:
+    """Laporan tahunan lintas ledger dan tahun memakai process pool"""
+    from reports import plan_tasks, run_report
+
+    ledgers = args.ledgers.split(',') if args.ledgers else None
+    years = parse_years(args.years) if args.years else None
+    tasks = plan_tasks(router.registry, ledgers, years)
+    if not tasks:
+        print("📭 Tidak ada data untuk dilaporkan.")
+        return 0
+
+    start = time.perf_counter()
+    report = run_report(tasks, args.workers)
+    elapsed = time.perf_counter() - start
+
+    print("\n📅 PER TAHUN")
+    for year, (income, expense) in sorted(report.by_year.items()):
+        print(f"  {year}  {format_currency(income):>20} {format_currency(expense):>20} "
+              f"{format_currency(income - expense):>20}")
+    if len(report.by_ledger) > 1:
+        print("\n📚 PER LEDGER")
+        for name, (income, expense) in sorted(report.by_ledger.items()):
+            print(f"  {name:15} {format_currency(income):>20} {format_currency(expense):>20}")
+    print("\n🏷️  PER KATEGORI")
+    for (type_, name), total in sorted(report.by_category.items(), key=lambda item: (item[0][0], -item[1])):
+        print(f"  {type_:8} {name:20} {format_currency(total):>20}")
+    print(f"\nTotal: {report.count:,} transaksi | saldo {format_currency(report.balance)}")
+
+    # Waktu kerja per ledger dijumlah dari semua worker; dibandingkan dengan
+    # waktu total terlihat seberapa jauh pekerjaan terbagi ke semua core
+    print(f"\n⚙️  {len(tasks)} tugas, {report.workers} worker, {elapsed:.2f} detik")
+    for name, seconds in sorted(report.ledger_seconds.items()):
+        print(f"  {name:15} {seconds:8.2f} detik kerja")
+    if elapsed > 0:
+        print(f"  Total waktu kerja {report.work_seconds:.2f} detik, "
+              f"paralelisme efektif {report.work_seconds / elapsed:.1f}x")
+    return 0
+
+
+def cmd_ledger(args: argparse.Namespace, router: LedgerRouter) -> int:
+    """Menampilkan, membuat, menghapus, atau mengatur default ledger"""
+    registry = router.registry
+    if args.action == 'list':
+        for name in registry.names():
+            default = " (default)" if name == registry.default else ""
+            print(f"{name:20} {registry.get_path(name)}{default}")
+        return 0
+
+    if not args.name:
+        print("❌ Nama ledger wajib diisi.")
+        return 1
+
+    if args.action == 'create':
+        path = registry.create(args.name, args.path)
+        router.get(args.name)  # Membuat file database beserta tabelnya
+        print(f"✅ Ledger '{args.name}' dibuat di {path}")
+    elif args.action == 'remove':
+        registry.remove(args.name)
+        print(f"✅ Ledger '{args.name}' dihapus dari daftar (file database tetap ada).")
+    else:
+        registry.set_default(args.name)
+        print(f"✅ Ledger '{args.name}' dijadikan default.")
+    return 0
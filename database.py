@@ -1,68 +1,171 @@
 """
 Modul untuk operasi database SQLite
 """
+import atexit
+import json
+import os
 import sqlite3
-from datetime import datetime
-from typing import List, Tuple, Optional
+import threading
+import uuid
+from dataclasses import replace
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Set, Tuple, Optional
+
+import anomaly
+from anomaly import AnomalyScorer, RunningStats
+from cache import ReportCache, cached_report
+from migrations import migrate
+from query import TransactionQuery, tag_conditions
+from utils import amount_bucket, merchant_key, transaction_fingerprint
+
+class _LockingConnection(sqlite3.Connection):
+    """Koneksi yang memegang lock selama blok `with` (satu transaksi) berjalan.
+    
+    Dipakai di mode in-memory agar thread persistensi tidak menyalin
+    database di tengah transaksi yang belum di-commit.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lock = threading.RLock()
+    
+    def __enter__(self):
+        self.lock.acquire()
+        return super().__enter__()
+    
+    def __exit__(self, *exc_info):
+        try:
+            return super().__exit__(*exc_info)
+        finally:
+            self.lock.release()
 
 class Database:
-    def __init__(self, db_name: str = "py_money.db"):
+    # Ukuran cache prepared statement per koneksi (default sqlite3 hanya 128)
+    CACHED_STATEMENTS = 256
+    
+    # Batas porsi transaksi bertag untuk memakai probe tag per baris
+    TAG_PROBE_RATIO = 0.01
+    
+    INSERT_TRANSACTION_SQL = '''
+        INSERT INTO transactions (type, amount, category_id, description, date,
+                                  fingerprint, duplicate_of, amount_bucket, uid, merchant,
+                                  anomaly_score)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+    
+    def __init__(self, db_name: str = "py_money.db", in_memory: bool = False,
+                 persist_interval: float = 30.0, cache_size: int = 128):
+        """
+        Jika `in_memory` aktif, isi file database disalin ke koneksi
+        `:memory:` saat dibuka; semua baca/tulis dilayani dari memori dan
+        perubahan ditulis balik ke file oleh thread latar setiap
+        `persist_interval` detik serta saat `close()`/program keluar.
+        
+        Jaminan di mode in-memory: setiap penulisan ke file memakai backup API
+        SQLite dalam satu transaksi, jadi file selalu berisi snapshot utuh
+        (versi lama atau baru, tidak pernah setengah). Jika proses crash,
+        perubahan sejak persist terakhir (maksimal `persist_interval` detik)
+        hilang. File tidak boleh ditulis proses lain selama mode ini aktif,
+        karena persist berikutnya akan menimpanya.
+        
+        Hasil method laporan di-cache (maksimal `cache_size` entri, 0 untuk
+        menonaktifkan) dan otomatis dibuang begitu data berubah, termasuk
+        perubahan dari proses lain (lihat modul cache).
+        """
         self.db_name = db_name
+        self.in_memory = in_memory
+        self.persist_interval = persist_interval
+        self._conn: Optional[sqlite3.Connection] = None
+        self._persisted_changes = 0
+        self._stop_persist = threading.Event()
+        self._persist_thread: Optional[threading.Thread] = None
+        self.report_cache: Optional[ReportCache] = ReportCache(cache_size) if cache_size > 0 else None
         self.init_database()
+        
+        if in_memory:
+            self._persist_thread = threading.Thread(
+                target=self._persist_loop, name=f"persist-{db_name}", daemon=True
+            )
+            self._persist_thread.start()
+            atexit.register(self.close)
+    
+    def get_connection(self) -> sqlite3.Connection:
+        """Mengambil koneksi ke database (dibuka sekali lalu dipakai ulang)"""
+        if self._conn is None:
+            if self.in_memory:
+                self._conn = self._load_into_memory()
+            else:
+                self._conn = sqlite3.connect(self.db_name, cached_statements=self.CACHED_STATEMENTS)
+            self._conn.row_factory = sqlite3.Row  # Mengembalikan hasil sebagai dictionary
+        return self._conn
+    
+    def data_token(self) -> Tuple[int, int]:
+        """Token versi data: berubah jika ada commit dari koneksi lain
+        (PRAGMA data_version) atau penulisan lewat koneksi ini (total_changes)"""
+        conn = self.get_connection()
+        return conn.execute('PRAGMA data_version').fetchone()[0], conn.total_changes
     
-    def get_connection(self):
-        """Membuat koneksi ke database"""
-        conn = sqlite3.connect(self.db_name)
-        conn.row_factory = sqlite3.Row  # Mengembalikan hasil sebagai dictionary
+    def _load_into_memory(self) -> sqlite3.Connection:
+        """Menyalin file database ke koneksi :memory: memakai backup API"""
+        conn = sqlite3.connect(':memory:', factory=_LockingConnection, check_same_thread=False,
+                               cached_statements=self.CACHED_STATEMENTS)
+        if os.path.exists(self.db_name):
+            disk = sqlite3.connect(self.db_name)
+            try:
+                disk.backup(conn)
+            finally:
+                disk.close()
         return conn
     
+    def persist(self) -> bool:
+        """Menulis isi database memori ke file jika ada perubahan (mode in-memory).
+        
+        Mengembalikan True jika file diperbarui.
+        """
+        conn = self._conn
+        if not self.in_memory or conn is None:
+            return False
+        
+        with conn.lock:
+            if conn.in_transaction or conn.total_changes == self._persisted_changes:
+                return False
+            changes = conn.total_changes
+            disk = sqlite3.connect(self.db_name)
+            try:
+                conn.backup(disk)
+            finally:
+                disk.close()
+            self._persisted_changes = changes
+        return True
+    
+    def _persist_loop(self):
+        """Thread latar: persist berkala sampai database ditutup"""
+        while not self._stop_persist.wait(self.persist_interval):
+            try:
+                self.persist()
+            except sqlite3.Error:
+                pass  # Misalnya file sedang dikunci; dicoba lagi di interval berikutnya
+    
+    def close(self):
+        """Menutup koneksi database jika sedang terbuka"""
+        if self._persist_thread is not None:
+            self._stop_persist.set()
+            self._persist_thread.join()
+            self._persist_thread = None
+            atexit.unregister(self.close)
+        if self._conn is not None:
+            self.persist()
+            self._conn.close()
+            self._conn = None
+        if self.report_cache is not None:
+            self.report_cache.clear()  # Token koneksi baru mulai dari awal lagi
+    
     def init_database(self):
-        """Inisialisasi tabel database"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # Tabel kategori
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS categories (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL UNIQUE,
-                    type TEXT NOT NULL CHECK(type IN ('income', 'expense')),
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Tabel transaksi
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS transactions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    type TEXT NOT NULL CHECK(type IN ('income', 'expense')),
-                    amount REAL NOT NULL CHECK(amount >= 0),
-                    category_id INTEGER NOT NULL,
-                    description TEXT,
-                    date TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE RESTRICT
-                )
-            ''')
-            
-            # Insert kategori default jika belum ada
-            default_categories = [
-                ('Gaji', 'income'),
-                ('Investasi', 'income'),
-                ('Hadiah', 'income'),
-                ('Makanan', 'expense'),
-                ('Transportasi', 'expense'),
-                ('Hiburan', 'expense'),
-                ('Tagihan', 'expense'),
-            ]
-            
-            for name, type_ in default_categories:
-                cursor.execute('''
-                    INSERT OR IGNORE INTO categories (name, type) 
-                    VALUES (?, ?)
-                ''', (name, type_))
-            
-            conn.commit()
+        """Memastikan skema database terbaru (lihat modul migrations).
+        
+        Jika skema sudah terbaru, ini hanya membaca PRAGMA user_version.
+        """
+        if migrate(self.get_connection()) and self.in_memory:
+            self._persisted_changes = -1  # Skema baru harus ikut ditulis ke file
     
     # ===== OPERASI KATEGORI =====
     def get_all_categories(self, type_filter: Optional[str] = None) -> List[sqlite3.Row]:
@@ -82,32 +185,113 @@ class Database:
             cursor.execute('SELECT * FROM categories WHERE id = ?', (category_id,))
             return cursor.fetchone()
     
-    def add_category(self, name: str, type_: str) -> int:
-        """Menambah kategori baru"""
+    def add_category(self, name: str, type_: str, parent_id: Optional[int] = None) -> int:
+        """Menambah kategori baru, opsional sebagai subkategori `parent_id`"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute(
-                'INSERT INTO categories (name, type) VALUES (?, ?)',
-                (name, type_)
-            )
+            category_id = self._insert_category(cursor, name, type_, parent_id)
             conn.commit()
-            return cursor.lastrowid
+            return category_id
+    
+    @staticmethod
+    def _insert_category(cursor: sqlite3.Cursor, name: str, type_: str,
+                         parent_id: Optional[int]) -> int:
+        level = 0
+        if parent_id is not None:
+            cursor.execute('SELECT type, level FROM categories WHERE id = ?', (parent_id,))
+            parent = cursor.fetchone()
+            if parent is None:
+                raise ValueError(f"Kategori induk {parent_id} tidak ditemukan")
+            if parent['type'] != type_:
+                raise ValueError("Subkategori harus bertipe sama dengan induknya")
+            level = parent['level'] + 1
+        
+        cursor.execute(
+            'INSERT INTO categories (name, type, parent_id, level) VALUES (?, ?, ?, ?)',
+            (name, type_, parent_id, level)
+        )
+        category_id = cursor.lastrowid
+        
+        # Closure: semua leluhur milik induk ditambah kategori itu sendiri
+        cursor.execute('''
+            INSERT INTO category_closure (ancestor_id, descendant_id, depth, ancestor_level)
+            SELECT ancestor_id, ?, depth + 1, ancestor_level
+            FROM category_closure WHERE descendant_id = ?
+            UNION ALL
+            SELECT ?, ?, 0, ?
+        ''', (category_id, parent_id, category_id, category_id, level))
+        return category_id
     
     def delete_category(self, category_id: int) -> bool:
-        """Menghapus kategori jika tidak digunakan"""
+        """Menghapus kategori jika tidak digunakan dan tidak punya subkategori"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            
-            # Cek apakah kategori digunakan dalam transaksi
-            cursor.execute('SELECT COUNT(*) FROM transactions WHERE category_id = ?', (category_id,))
-            count = cursor.fetchone()[0]
-            
-            if count > 0:
-                return False  # Tidak bisa dihapus karena masih digunakan
-            
-            cursor.execute('DELETE FROM categories WHERE id = ?', (category_id,))
+            deleted = self._remove_category(cursor, category_id)
             conn.commit()
-            return True
+            return deleted
+    
+    @staticmethod
+    def _remove_category(cursor: sqlite3.Cursor, category_id: int) -> bool:
+        # Cek apakah kategori digunakan dalam transaksi
+        cursor.execute('SELECT COUNT(*) FROM transactions WHERE category_id = ?', (category_id,))
+        count = cursor.fetchone()[0]
+        
+        if count > 0:
+            return False  # Tidak bisa dihapus karena masih digunakan
+        
+        cursor.execute('SELECT 1 FROM categories WHERE parent_id = ? LIMIT 1', (category_id,))
+        if cursor.fetchone():
+            return False  # Subkategori harus dihapus lebih dulu
+        
+        cursor.execute('DELETE FROM budgets WHERE category_id = ?', (category_id,))
+        cursor.execute('DELETE FROM category_rules WHERE category_id = ?', (category_id,))
+        cursor.execute('DELETE FROM category_closure WHERE descendant_id = ?', (category_id,))
+        cursor.execute('DELETE FROM categories WHERE id = ?', (category_id,))
+        return True
+    
+    @cached_report
+    def get_category_tree(self, type_filter: Optional[str] = None) -> List[sqlite3.Row]:
+        """Mengambil kategori urut pohon (induk diikuti subkategorinya).
+        
+        Kolom `path` berisi nama lengkap, misalnya "Makanan > Restoran > Kopi".
+        """
+        path_sql = '''
+            (SELECT group_concat(name, {sep}) FROM (
+                SELECT a.name FROM category_closure cc
+                JOIN categories a ON a.id = cc.ancestor_id
+                WHERE cc.descendant_id = c.id
+                ORDER BY cc.ancestor_level))
+        '''
+        query = f'''
+            SELECT c.*, {path_sql.format(sep="' > '")} as path,
+                   {path_sql.format(sep='char(1)')} as sort_key
+            FROM categories c
+        '''
+        params = []
+        if type_filter:
+            query += ' WHERE c.type = ?'
+            params.append(type_filter)
+        query += ' ORDER BY c.type, sort_key'
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return cursor.fetchall()
+    
+    def get_descendant_ids(self, category_id: int) -> List[int]:
+        """ID kategori beserta semua subkategorinya"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT descendant_id FROM category_closure WHERE ancestor_id = ?',
+                           (category_id,))
+            return [row[0] for row in cursor.fetchall()]
+    
+    @cached_report
+    def get_max_category_level(self) -> int:
+        """Level terdalam pohon kategori (0 = semua kategori di level teratas)"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT COALESCE(MAX(level), 0) FROM categories')
+            return cursor.fetchone()[0]
     
     def get_category_id_by_name(self, name: str) -> Optional[int]:
         """Mendapatkan ID kategori berdasarkan nama"""
@@ -123,35 +307,126 @@ class Database:
         """Menambah transaksi baru"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO transactions (type, amount, category_id, description, date)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (type_, amount, category_id, description, date))
+            scorer = self._anomaly_scorer(cursor, category_id)
+            cursor.execute(self.INSERT_TRANSACTION_SQL,
+                           self._scored_values(scorer, (type_, amount, category_id, description, date)))
             conn.commit()
             return cursor.lastrowid
     
+    def add_transactions_bulk(self, rows: Iterable[tuple]) -> int:
+        """Menambah banyak transaksi (type, amount, category_id, description, date
+        [, duplicate_of[, uid]]) dalam satu transaksi database"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            scorer = self._anomaly_scorer(cursor)
+            cursor.executemany(self.INSERT_TRANSACTION_SQL,
+                               (self._scored_values(scorer, row) for row in rows))
+            conn.commit()
+            return cursor.rowcount
+    
+    @staticmethod
+    def _transaction_values(row: tuple) -> tuple:
+        """Melengkapi baris transaksi dengan kolom turunannya (fingerprint,
+        bucket sketch jumlah, uid sinkronisasi, kunci merchant)"""
+        type_, amount, category_id, description, date = row[:5]
+        duplicate_of = row[5] if len(row) > 5 else None
+        uid = row[6] if len(row) > 6 else uuid.uuid4().hex
+        return (type_, amount, category_id, description, date,
+                transaction_fingerprint(date, amount, description, category_id), duplicate_of,
+                amount_bucket(amount), uid, merchant_key(description))
+    
+    def _scored_values(self, scorer: AnomalyScorer, row: tuple) -> tuple:
+        """Nilai insert lengkap: kolom turunan ditambah skor anomali"""
+        values = self._transaction_values(row)
+        return values + (scorer.score(values[2], values[7]),)
+    
+    def _anomaly_scorer(self, cursor: sqlite3.Cursor,
+                        category_id: Optional[int] = None) -> AnomalyScorer:
+        """Memuat statistik anomali (semua kategori atau satu kategori saja)"""
+        query = 'SELECT category_id, count, mean, m2 FROM category_amount_stats'
+        params: tuple = ()
+        if category_id is not None:
+            query += ' WHERE category_id = ?'
+            params = (category_id,)
+        cursor.execute(query, params)
+        return AnomalyScorer({row['category_id']: RunningStats(row['count'], row['mean'], row['m2'])
+                              for row in cursor.fetchall()})
+    
+    def iter_transactions(self, batch_size: int = 1000, after_id: int = 0) -> Iterator[sqlite3.Row]:
+        """Membaca seluruh transaksi (atau hanya yang ID-nya di atas `after_id`)
+        secara bertahap (urut ID) tanpa memuat semuanya ke memori"""
+        return self._iter_rows('''
+            SELECT t.*, c.name as category_name, c.type as category_type
+            FROM transactions t
+            JOIN categories c ON t.category_id = c.id
+            WHERE t.id > ?
+            ORDER BY t.id
+        ''', (after_id,), batch_size)
+    
+    def _iter_rows(self, query: str, params: tuple, batch_size: int) -> Iterator[sqlite3.Row]:
+        """Menjalankan query dan mengembalikan hasilnya per batch `fetchmany`"""
+        cursor = self.get_connection().cursor()
+        try:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cursor.close()
+    
     def get_transactions(self, type_filter: Optional[str] = None, 
                         limit: int = 50) -> List[sqlite3.Row]:
         """Mengambil transaksi dengan join kategori"""
+        return self.query_transactions(TransactionQuery(type=type_filter, limit=limit))
+    
+    def query_transactions(self, query: TransactionQuery) -> List[sqlite3.Row]:
+        """Mengambil transaksi sesuai kombinasi filter, sort, dan limit"""
+        sql, params = self._plan_tag_filter(query).to_sql()
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            query = '''
-                SELECT t.*, c.name as category_name, c.type as category_type
-                FROM transactions t
-                JOIN categories c ON t.category_id = c.id
-            '''
-            
-            params = []
-            if type_filter:
-                query += ' WHERE t.type = ?'
-                params.append(type_filter)
-            
-            query += ' ORDER BY t.date DESC, t.created_at DESC LIMIT ?'
-            params.append(limit)
-            
-            cursor.execute(query, params)
+            cursor.execute(sql, params)
             return cursor.fetchall()
     
+    def explain_query(self, query: TransactionQuery) -> List[str]:
+        """Menampilkan rencana eksekusi SQLite (EXPLAIN QUERY PLAN) sebuah query"""
+        sql, params = self._plan_tag_filter(query).to_sql()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row['detail'] for row in cursor.fetchall()]
+    
+    def _plan_tag_filter(self, query: TransactionQuery) -> TransactionQuery:
+        """Memilih bentuk filter tag (lihat query.tag_conditions).
+        
+        Jika tag yang dicari menempel di lebih dari `TAG_PROBE_RATIO` dari
+        seluruh transaksi dan hasilnya dibatasi, probe per baris lebih murah
+        daripada membangun daftar ID dari index tag.
+        """
+        if query.probe_tags or not (query.tags_any or query.tags_all):
+            return query
+        if query.limit is None and not (query.start_date or query.end_date):
+            return query
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT name, usage FROM tags WHERE name IN (SELECT value FROM json_each(?))',
+                           (json.dumps(sorted(set(query.tags_any) | set(query.tags_all))),))
+            usage = {row['name']: row['usage'] for row in cursor.fetchall()}
+            cursor.execute('SELECT COALESCE(MAX(id), 0) FROM transactions')
+            total = cursor.fetchone()[0]
+        
+        # Perkiraan jumlah transaksi yang lolos filter tag
+        estimates = []
+        if query.tags_any:
+            estimates.append(sum(usage.get(tag, 0) for tag in query.tags_any))
+        if query.tags_all:
+            estimates.append(min(usage.get(tag, 0) for tag in query.tags_all))
+        matched = min(estimates)
+        if matched > total * self.TAG_PROBE_RATIO:
+            return replace(query, probe_tags=True)
+        return query
+    
     def get_transaction(self, transaction_id: int) -> Optional[sqlite3.Row]:
         """Mengambil transaksi berdasarkan ID"""
         with self.get_connection() as conn:
@@ -169,13 +444,31 @@ class Database:
         """Update transaksi"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE transactions 
-                SET amount = ?, category_id = ?, description = ?, date = ?
-                WHERE id = ?
-            ''', (amount, category_id, description, date, transaction_id))
+            updated = self._update_transaction(cursor, transaction_id, amount, category_id,
+                                               description, date)
             conn.commit()
-            return cursor.rowcount > 0
+            return updated
+    
+    def _update_transaction(self, cursor: sqlite3.Cursor, transaction_id: int, amount: float,
+                            category_id: int, description: str, date: str) -> bool:
+        bucket = amount_bucket(amount)
+        # Skor baru dihitung terhadap statistik kategori tanpa transaksi ini sendiri
+        scorer = self._anomaly_scorer(cursor, category_id)
+        cursor.execute('SELECT category_id, amount_bucket FROM transactions WHERE id = ?',
+                       (transaction_id,))
+        old = cursor.fetchone()
+        old_log = anomaly.bucket_log(old['amount_bucket']) if old else None
+        if old_log is not None and old['category_id'] in scorer.stats:
+            scorer.stats[old['category_id']].remove(old_log)
+        cursor.execute('''
+            UPDATE transactions 
+            SET amount = ?, category_id = ?, description = ?, date = ?, fingerprint = ?,
+                amount_bucket = ?, merchant = ?, anomaly_score = ?
+            WHERE id = ?
+        ''', (amount, category_id, description, date,
+              transaction_fingerprint(date, amount, description, category_id),
+              bucket, merchant_key(description), scorer.score(category_id, bucket), transaction_id))
+        return cursor.rowcount > 0
     
     def delete_transaction(self, transaction_id: int) -> bool:
         """Menghapus transaksi"""
@@ -185,9 +478,250 @@ class Database:
             conn.commit()
             return cursor.rowcount > 0
     
+    def max_transaction_id(self) -> int:
+        """ID transaksi terbesar (0 jika belum ada transaksi)"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT COALESCE(MAX(id), 0) FROM transactions')
+            return cursor.fetchone()[0]
+    
+    def transaction_rewrites(self) -> int:
+        """Penghitung edit/hapus transaksi (dinaikkan trigger); jika tidak
+        berubah, transaksi yang sudah ada tidak disentuh sejak terakhir dibaca"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT value FROM data_counters WHERE name = 'transaction_rewrites'")
+            return cursor.fetchone()[0]
+    
+    # ===== DUPLIKAT =====
+    def count_transactions(self) -> int:
+        """Jumlah seluruh transaksi"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT COUNT(*) FROM transactions')
+            return cursor.fetchone()[0]
+    
+    def iter_fingerprints(self, batch_size: int = 10000) -> Iterator[str]:
+        """Membaca semua fingerprint transaksi secara bertahap (langsung dari index)"""
+        cursor = self.get_connection().cursor()
+        try:
+            cursor.execute('SELECT fingerprint FROM transactions WHERE fingerprint IS NOT NULL')
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row[0]
+        finally:
+            cursor.close()
+    
+    def find_by_fingerprint(self, fingerprint: str) -> Optional[sqlite3.Row]:
+        """Mencari transaksi asli (bukan yang ditandai duplikat) dengan fingerprint ini"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM transactions
+                WHERE fingerprint = ? AND duplicate_of IS NULL
+                ORDER BY id LIMIT 1
+            ''', (fingerprint,))
+            return cursor.fetchone()
+    
+    def find_same_entry(self, date: str, amount: float, category_id: int) -> Optional[sqlite3.Row]:
+        """Mencari transaksi asli dengan tanggal, jumlah, dan kategori yang sama
+        (deskripsi diabaikan), memakai index (category_id, date)"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM transactions
+                WHERE category_id = ? AND date = ? AND round(amount, 2) = round(?, 2)
+                  AND duplicate_of IS NULL
+                ORDER BY id LIMIT 1
+            ''', (category_id, date, amount))
+            return cursor.fetchone()
+    
+    def iter_entry_keys(self, batch_size: int = 10000) -> Iterator[tuple]:
+        """Membaca (date, amount, category_id) semua transaksi asli secara bertahap"""
+        cursor = self.get_connection().cursor()
+        try:
+            cursor.execute('''
+                SELECT date, amount, category_id FROM transactions WHERE duplicate_of IS NULL
+            ''')
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield tuple(row)
+        finally:
+            cursor.close()
+    
+    def find_duplicate(self, type_: str, amount: float, category_id: int,
+                       description: Optional[str], date: str) -> Optional[sqlite3.Row]:
+        """Mencari transaksi yang isinya sama dengan data yang akan disimpan"""
+        return self.find_by_fingerprint(transaction_fingerprint(date, amount, description, category_id))
+    
+    def flag_existing_duplicates(self) -> int:
+        """Menandai duplikat di riwayat: setiap transaksi dengan fingerprint yang
+        sama dengan transaksi ber-ID lebih kecil diberi `duplicate_of`.
+        
+        Memakai index fingerprint, jadi biayanya O(n log n), bukan O(n²).
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE transactions
+                SET duplicate_of = (
+                    SELECT MIN(o.id) FROM transactions o WHERE o.fingerprint = transactions.fingerprint
+                )
+                WHERE duplicate_of IS NULL
+                  AND id > (SELECT MIN(o.id) FROM transactions o WHERE o.fingerprint = transactions.fingerprint)
+            ''')
+            conn.commit()
+            return cursor.rowcount
+    
+    def get_flagged_duplicates(self, limit: int = 100) -> List[sqlite3.Row]:
+        """Mengambil transaksi yang ditandai sebagai duplikat"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT t.*, c.name as category_name, c.type as category_type
+                FROM transactions t
+                JOIN categories c ON t.category_id = c.id
+                WHERE t.duplicate_of IS NOT NULL
+                ORDER BY t.id
+                LIMIT ?
+            ''', (limit,))
+            return cursor.fetchall()
+    
+    # ===== TAG =====
+    def get_all_tags(self) -> List[sqlite3.Row]:
+        """Mengambil semua tag beserta jumlah transaksinya"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT id, name, usage FROM tags ORDER BY name')
+            return cursor.fetchall()
+    
+    def get_or_create_tags(self, names: Iterable[str]) -> Dict[str, int]:
+        """Memastikan tag ada, mengembalikan pemetaan nama -> ID"""
+        names = sorted(set(names))
+        if not names:
+            return {}
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany('INSERT OR IGNORE INTO tags (name) VALUES (?)', ((name,) for name in names))
+            cursor.execute('SELECT name, id FROM tags WHERE name IN (SELECT value FROM json_each(?))',
+                           (json.dumps(names),))
+            tag_ids = {row['name']: row['id'] for row in cursor.fetchall()}
+            conn.commit()
+            return tag_ids
+    
+    def get_transaction_tags(self, transaction_id: int) -> List[str]:
+        """Nama tag sebuah transaksi"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT g.name FROM transaction_tags tt
+                JOIN tags g ON g.id = tt.tag_id
+                WHERE tt.transaction_id = ?
+                ORDER BY g.name
+            ''', (transaction_id,))
+            return [row[0] for row in cursor.fetchall()]
+    
+    def tag_transactions(self, transaction_ids: Iterable[int], names: Iterable[str]) -> int:
+        """Menambahkan tag ke banyak transaksi sekaligus, mengembalikan jumlah
+        pasangan (transaksi, tag) baru"""
+        tag_ids = list(self.get_or_create_tags(names).values())
+        if not tag_ids:
+            return 0
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(
+                'INSERT OR IGNORE INTO transaction_tags (transaction_id, tag_id) VALUES (?, ?)',
+                ((transaction_id, tag_id) for transaction_id in transaction_ids for tag_id in tag_ids)
+            )
+            conn.commit()
+            return cursor.rowcount
+    
+    def tag_matching(self, query: TransactionQuery, names: Iterable[str]) -> int:
+        """Menambahkan tag ke semua transaksi yang cocok dengan filter `query`
+        dalam satu statement INSERT ... SELECT (limit/sort diabaikan)"""
+        tag_ids = list(self.get_or_create_tags(names).values())
+        if not tag_ids:
+            return 0
+        where, params = query.where_clause()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR IGNORE INTO transaction_tags (transaction_id, tag_id)
+                SELECT t.id, j.value FROM transactions t, json_each(?) j
+            ''' + where, [json.dumps(tag_ids)] + params)
+            conn.commit()
+            return cursor.rowcount
+    
+    def untag_transactions(self, transaction_ids: Iterable[int], names: Iterable[str]) -> int:
+        """Melepas tag dari banyak transaksi sekaligus"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany('''
+                DELETE FROM transaction_tags
+                WHERE transaction_id = ? AND tag_id IN (
+                    SELECT id FROM tags WHERE name IN (SELECT value FROM json_each(?))
+                )
+            ''', ((transaction_id, json.dumps(sorted(set(names)))) for transaction_id in transaction_ids))
+            conn.commit()
+            return cursor.rowcount
+    
+    def delete_tag(self, name: str) -> bool:
+        """Menghapus tag beserta semua penandaannya"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT id FROM tags WHERE name = ?', (name,))
+            row = cursor.fetchone()
+            if row is None:
+                return False
+            cursor.execute('DELETE FROM transaction_tags WHERE tag_id = ?', (row[0],))
+            cursor.execute('DELETE FROM tags WHERE id = ?', (row[0],))
+            conn.commit()
+            return True
+    
+    @cached_report
+    def get_tag_totals(self) -> List[sqlite3.Row]:
+        """Total pemasukan, pengeluaran, dan jumlah transaksi per tag"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT g.name,
+                       COALESCE(SUM(CASE WHEN t.type = 'income' THEN t.amount END), 0) as income,
+                       COALESCE(SUM(CASE WHEN t.type = 'expense' THEN t.amount END), 0) as expense,
+                       COUNT(t.id) as count
+                FROM tags g
+                LEFT JOIN transaction_tags tt ON tt.tag_id = g.id
+                LEFT JOIN transactions t ON t.id = tt.transaction_id
+                GROUP BY g.id
+                ORDER BY expense + income DESC
+            ''')
+            return cursor.fetchall()
+    
     # ===== STATISTIK DAN LAPORAN =====
-    def get_balance_summary(self) -> dict:
-        """Menghitung ringkasan saldo"""
+    @cached_report
+    def get_balance_summary(self, level: Optional[int] = None, tags_any: Iterable[str] = (),
+                            tags_all: Iterable[str] = ()) -> dict:
+        """Menghitung ringkasan saldo.
+        
+        `level` menentukan rincian per kategori: total subkategori digulung
+        ke leluhurnya di level tersebut (0 = kategori teratas). Tanpa
+        `level`, setiap kategori dilaporkan sendiri. `tags_any`/`tags_all`
+        membatasi ringkasan ke transaksi dengan salah satu/semua tag itu.
+        """
+        conditions, tag_params = tag_conditions(tuple(tags_any), tuple(tags_all))
+        where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+        if conditions:
+            # Dengan filter tag, total per kategori dihitung dari transaksi
+            # yang lolos filter (lewat index tag), bukan dari agregat bulanan
+            source = ('(SELECT category_id, SUM(amount) as total FROM transactions t'
+                      + where + ' GROUP BY category_id)')
+        else:
+            source = 'category_monthly_totals'
         with self.get_connection() as conn:
             cursor = conn.cursor()
             
@@ -196,21 +730,29 @@ class Database:
                 SELECT 
                     SUM(CASE WHEN type = 'income' THEN amount ELSE 0 END) as total_income,
                     SUM(CASE WHEN type = 'expense' THEN amount ELSE 0 END) as total_expense
-                FROM transactions
-            ''')
+                FROM transactions t
+            ''' + where, tag_params)
             totals = cursor.fetchone()
             
-            # Ringkasan per kategori
-            cursor.execute('''
-                SELECT 
-                    c.type,
-                    c.name as category_name,
-                    SUM(t.amount) as total
-                FROM transactions t
-                JOIN categories c ON t.category_id = c.id
-                GROUP BY c.type, c.id
-                ORDER BY c.type DESC, total DESC
-            ''')
+            # Ringkasan per kategori. Closure table memetakan tiap kategori ke
+            # leluhurnya di level yang diminta; kategori yang lebih dangkal
+            # dari `level` dipetakan ke dirinya.
+            cursor.execute(f'''
+                SELECT
+                    a.type,
+                    a.id as category_id,
+                    a.name as category_name,
+                    a.level,
+                    SUM(m.total) as total
+                FROM {source} m
+                JOIN categories d ON d.id = m.category_id
+                JOIN category_closure cc
+                    ON cc.descendant_id = m.category_id
+                   AND cc.ancestor_level = COALESCE(MIN(?, d.level), d.level)
+                JOIN categories a ON a.id = cc.ancestor_id
+                GROUP BY a.id
+                ORDER BY a.type DESC, total DESC
+            ''', tag_params + [level])
             by_category = cursor.fetchall()
             
             return {
@@ -231,4 +773,718 @@ class Database:
                 WHERE t.date BETWEEN ? AND ?
                 ORDER BY t.date DESC
             ''', (start_date, end_date))
-            return cursor.fetchall()
\ No newline at end of file
+            return cursor.fetchall()
+    
+    def iter_transactions_by_date_range(self, start_date: str, end_date: str,
+                                        type_: Optional[str] = None,
+                                        batch_size: int = 1000) -> Iterator[sqlite3.Row]:
+        """Seperti get_transactions_by_date_range, tetapi urut tanggal naik
+        (lalu ID) dan dibaca bertahap lewat index date"""
+        query = '''
+            SELECT t.*, c.name as category_name, c.type as category_type
+            FROM transactions t
+            JOIN categories c ON t.category_id = c.id
+            WHERE t.date BETWEEN ? AND ?
+        '''
+        params: tuple = (start_date, end_date)
+        if type_:
+            query += ' AND t.type = ?'
+            params += (type_,)
+        return self._iter_rows(query + ' ORDER BY t.date, t.id', params, batch_size)
+    
+    # ===== RIWAYAT SALDO =====
+    # Agregat bulanan (category_monthly_totals) berfungsi sebagai checkpoint
+    # saldo: saldo pada tanggal X = jumlah net semua bulan sebelum bulan X
+    # (dari agregat) + transaksi bulan X sampai tanggal X (lewat index date).
+    @cached_report
+    def get_balance_as_of(self, date: str) -> float:
+        """Menghitung saldo pada akhir tanggal tertentu (YYYY-MM-DD)"""
+        month_start = date[:7] + '-01'
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT COALESCE(SUM(CASE WHEN c.type = 'income' THEN m.total ELSE -m.total END), 0)
+                FROM category_monthly_totals m
+                JOIN categories c ON c.id = m.category_id
+                WHERE m.period < ?
+            ''', (date[:7],))
+            checkpoint = cursor.fetchone()[0]
+            
+            cursor.execute('''
+                SELECT COALESCE(SUM(CASE WHEN type = 'income' THEN amount ELSE -amount END), 0)
+                FROM transactions
+                WHERE date >= ? AND date <= ?
+            ''', (month_start, date))
+            return checkpoint + cursor.fetchone()[0]
+    
+    @cached_report
+    def get_monthly_balance_series(self, start_period: Optional[str] = None,
+                                   end_period: Optional[str] = None) -> List[sqlite3.Row]:
+        """Saldo akhir tiap bulan (period, income, expense, net, balance).
+        
+        Dihitung dengan window function di atas agregat bulanan, sehingga
+        biayanya sebanding dengan jumlah bulan, bukan jumlah transaksi.
+        Batas boleh YYYY-MM atau YYYY-MM-DD (dipotong ke bulannya).
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM (
+                    SELECT period, income, expense, income - expense as net,
+                           SUM(income - expense) OVER (ORDER BY period) as balance
+                    FROM (
+                        SELECT m.period,
+                               SUM(CASE WHEN c.type = 'income' THEN m.total ELSE 0 END) as income,
+                               SUM(CASE WHEN c.type = 'expense' THEN m.total ELSE 0 END) as expense
+                        FROM category_monthly_totals m
+                        JOIN categories c ON c.id = m.category_id
+                        WHERE m.period <= ?
+                        GROUP BY m.period
+                    )
+                )
+                WHERE period >= ?
+                ORDER BY period
+            ''', ((end_period or '9999-12')[:7], (start_period or '')[:7]))
+            return cursor.fetchall()
+    
+    @cached_report
+    def get_daily_balance_series(self, start_date: str, end_date: str) -> List[sqlite3.Row]:
+        """Saldo akhir setiap hari dalam rentang tanggal (date, net, balance).
+        
+        Saldo awal diambil dari checkpoint bulanan, lalu hanya transaksi di
+        dalam rentang yang dijumlahkan dengan window function.
+        """
+        day_before = (datetime.strptime(start_date, "%Y-%m-%d") - timedelta(days=1)).strftime("%Y-%m-%d")
+        opening = self.get_balance_as_of(day_before)
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                WITH RECURSIVE days(day) AS (
+                    SELECT ?
+                    UNION ALL
+                    SELECT date(day, '+1 day') FROM days WHERE day < ?
+                ),
+                daily AS (
+                    SELECT date, SUM(CASE WHEN type = 'income' THEN amount ELSE -amount END) as net
+                    FROM transactions
+                    WHERE date >= ? AND date <= ?
+                    GROUP BY date
+                )
+                SELECT d.day as date, COALESCE(daily.net, 0) as net,
+                       ? + SUM(COALESCE(daily.net, 0)) OVER (ORDER BY d.day) as balance
+                FROM days d
+                LEFT JOIN daily ON daily.date = d.day
+                ORDER BY d.day
+            ''', (start_date, end_date, start_date, end_date, opening))
+            return cursor.fetchall()
+    
+    # ===== STATISTIK PENGELUARAN =====
+    @cached_report
+    def get_amount_histogram(self, type_: str = 'expense', start_period: Optional[str] = None,
+                             end_period: Optional[str] = None,
+                             category_id: Optional[int] = None) -> List[sqlite3.Row]:
+        """Histogram bucket jumlah (category_id, bucket, count) per kategori,
+        digabung untuk semua bulan dalam rentang periode YYYY-MM"""
+        query = '''
+            SELECT s.category_id, s.bucket, SUM(s.count) as count
+            FROM amount_sketches s
+            JOIN categories c ON c.id = s.category_id
+            WHERE c.type = ? AND s.period >= ? AND s.period <= ?
+        '''
+        params = [type_, start_period or '', end_period or '9999-12']
+        if category_id is not None:
+            query += ' AND s.category_id = ?'
+            params.append(category_id)
+        query += ' GROUP BY s.category_id, s.bucket ORDER BY s.category_id, s.bucket'
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return cursor.fetchall()
+    
+    def rebuild_amount_sketches(self) -> int:
+        """Menghitung ulang bucket dan histogram dari seluruh transaksi dalam
+        satu kali baca, mengembalikan jumlah baris histogram"""
+        with self.get_connection() as conn:
+            conn.create_function('pm_amount_bucket', 1, amount_bucket, deterministic=True)
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE transactions SET amount_bucket = pm_amount_bucket(amount)
+                WHERE amount_bucket IS NOT pm_amount_bucket(amount)
+            ''')
+            cursor.execute('DELETE FROM amount_sketches')
+            cursor.execute('''
+                INSERT INTO amount_sketches (category_id, period, bucket, count)
+                SELECT category_id, substr(date, 1, 7), amount_bucket, COUNT(*)
+                FROM transactions
+                GROUP BY category_id, substr(date, 1, 7), amount_bucket
+            ''')
+            conn.commit()
+            return cursor.rowcount
+    
+    # ===== ANOMALI =====
+    @cached_report
+    def get_anomalies(self, type_: str = 'expense', threshold: float = anomaly.THRESHOLD,
+                      start_date: Optional[str] = None, min_id: Optional[int] = None,
+                      limit: Optional[int] = 50) -> List[sqlite3.Row]:
+        """Transaksi dengan skor anomali minimal `threshold`, terbaru dulu.
+        
+        `min_id` membatasi ke transaksi dengan ID tersebut ke atas (misalnya
+        hasil satu kali import). `log_mean` adalah rata-rata log jumlah
+        kategorinya saat ini, lihat `anomaly.typical_amount`.
+        """
+        where, params = self._anomaly_filter(type_, threshold, start_date, min_id)
+        query = f'''
+            SELECT t.id, t.date, t.amount, t.description, t.category_id, t.anomaly_score,
+                   c.name as category_name, s.mean as log_mean
+            FROM transactions t
+            JOIN categories c ON c.id = t.category_id
+            JOIN category_amount_stats s ON s.category_id = t.category_id
+            WHERE {where}
+            ORDER BY t.date DESC, t.id DESC
+        '''
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(limit)
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return cursor.fetchall()
+    
+    @cached_report
+    def count_anomalies(self, type_: str = 'expense', threshold: float = anomaly.THRESHOLD,
+                        start_date: Optional[str] = None, min_id: Optional[int] = None) -> int:
+        """Jumlah transaksi yang akan dikembalikan `get_anomalies` tanpa limit"""
+        where, params = self._anomaly_filter(type_, threshold, start_date, min_id)
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT COUNT(*) FROM transactions t
+                JOIN categories c ON c.id = t.category_id
+                JOIN category_amount_stats s ON s.category_id = t.category_id
+                WHERE {where}
+            ''', params)
+            return cursor.fetchone()[0]
+    
+    @staticmethod
+    def _anomaly_filter(type_: str, threshold: float, start_date: Optional[str],
+                        min_id: Optional[int]) -> Tuple[str, list]:
+        where = 't.type = ? AND t.anomaly_score >= ?'
+        params: list = [type_, threshold]
+        if start_date:
+            where += ' AND t.date >= ?'
+            params.append(start_date)
+        if min_id is not None:
+            where += ' AND t.id >= ?'
+            params.append(min_id)
+        return where, params
+    
+    def rebuild_anomaly_scores(self) -> int:
+        """Menghitung ulang statistik dan skor anomali seluruh riwayat dalam
+        satu kali baca, mengembalikan jumlah transaksi yang diberi skor"""
+        with self.get_connection() as conn:
+            scored = anomaly.backfill(conn.cursor())
+            conn.commit()
+            return scored
+    
+    # ===== ATURAN KATEGORI =====
+    def get_category_rules(self) -> List[sqlite3.Row]:
+        """Semua aturan kategori otomatis beserta nama dan tipe kategorinya"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT r.*, c.name as category_name, c.type as category_type
+                FROM category_rules r
+                JOIN categories c ON c.id = r.category_id
+                ORDER BY r.priority DESC, r.id
+            ''')
+            return cursor.fetchall()
+    
+    def add_category_rule(self, kind: str, pattern: Optional[str], category_id: int,
+                          min_amount: Optional[float] = None, max_amount: Optional[float] = None,
+                          priority: int = 0) -> int:
+        """Menambah aturan kategori otomatis (validasi pola ada di modul rules)"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO category_rules (kind, pattern, min_amount, max_amount, category_id, priority)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (kind, pattern, min_amount, max_amount, category_id, priority))
+            conn.commit()
+            return cursor.lastrowid
+    
+    def delete_category_rule(self, rule_id: int) -> bool:
+        """Menghapus aturan kategori otomatis"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM category_rules WHERE id = ?', (rule_id,))
+            conn.commit()
+            return cursor.rowcount > 0
+    
+    def iter_categorization_rows(self, start_date: Optional[str] = None,
+                                 end_date: Optional[str] = None,
+                                 batch_size: int = 10000) -> Iterator[sqlite3.Row]:
+        """(id, type, amount, category_id, description) transaksi dalam rentang
+        tanggal, dibaca bertahap untuk kategorisasi ulang"""
+        return self._iter_rows('''
+            SELECT id, type, amount, category_id, description FROM transactions
+            WHERE date BETWEEN ? AND ?
+        ''', (start_date or '0000-01-01', end_date or '9999-12-31'), batch_size)
+    
+    def recategorize_transactions(self, assignments: Iterable[Tuple[int, int]]) -> int:
+        """Memindahkan banyak transaksi (id, category_id baru) sekaligus.
+        
+        Pasangan dimasukkan ke tabel sementara lalu diterapkan dengan satu
+        UPDATE; trigger agregat (total bulanan, sketch, statistik anomali,
+        change log) tetap berjalan per baris. Skor anomali lama dibiarkan,
+        hitung ulang dengan `rebuild_anomaly_scores` bila perlu.
+        """
+        with self.get_connection() as conn:
+            conn.create_function('pm_fingerprint', 4, transaction_fingerprint, deterministic=True)
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TEMP TABLE IF NOT EXISTS recategorize (
+                    id INTEGER PRIMARY KEY,
+                    category_id INTEGER NOT NULL
+                )
+            ''')
+            cursor.execute('DELETE FROM temp.recategorize')
+            cursor.executemany('INSERT OR REPLACE INTO temp.recategorize (id, category_id) VALUES (?, ?)',
+                               assignments)
+            # Nilai SET dihitung dari baris lama, jadi subquery ditulis dua kali
+            cursor.execute('''
+                UPDATE transactions
+                SET category_id = (SELECT r.category_id FROM temp.recategorize r
+                                   WHERE r.id = transactions.id),
+                    fingerprint = pm_fingerprint(date, amount, description,
+                                                 (SELECT r.category_id FROM temp.recategorize r
+                                                  WHERE r.id = transactions.id))
+                WHERE id IN (SELECT id FROM temp.recategorize)
+            ''')
+            changed = cursor.rowcount
+            cursor.execute('DELETE FROM temp.recategorize')
+            conn.commit()
+            return changed
+    
+    # ===== MERCHANT =====
+    MERCHANT_ORDER = {'total': 'total', 'count': 'count'}
+    
+    @cached_report
+    def get_top_merchants(self, type_: str = 'expense', start_date: Optional[str] = None,
+                          end_date: Optional[str] = None, order_by: str = 'total',
+                          limit: int = 10) -> List[sqlite3.Row]:
+        """Merchant dengan total (atau jumlah transaksi) terbesar dalam rentang
+        tanggal, dihitung eksak dari index covering idx_transactions_merchant"""
+        order = self.MERCHANT_ORDER[order_by]
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT merchant, SUM(amount) as total, COUNT(*) as count
+                FROM transactions
+                WHERE type = ? AND date BETWEEN ? AND ? AND merchant IS NOT NULL
+                GROUP BY merchant
+                ORDER BY {order} DESC, merchant
+                LIMIT ?
+            ''', (type_, start_date or '0000-01-01', end_date or '9999-12-31', limit))
+            return cursor.fetchall()
+    
+    def iter_merchant_amounts(self, type_: str = 'expense', start_date: Optional[str] = None,
+                              end_date: Optional[str] = None,
+                              batch_size: int = 10000) -> Iterator[sqlite3.Row]:
+        """(merchant, amount) transaksi dalam rentang tanggal, dibaca bertahap"""
+        return self._iter_rows('''
+            SELECT merchant, amount FROM transactions
+            WHERE type = ? AND date BETWEEN ? AND ? AND merchant IS NOT NULL
+        ''', (type_, start_date or '0000-01-01', end_date or '9999-12-31'), batch_size)
+    
+    # ===== OPERASI BUDGET =====
+    def set_budget(self, category_id: int, amount: float, alert_threshold: float = 0.8) -> None:
+        """Mengatur (atau mengganti) budget bulanan sebuah kategori"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO budgets (category_id, amount, alert_threshold)
+                VALUES (?, ?, ?)
+                ON CONFLICT (category_id) DO UPDATE
+                SET amount = excluded.amount, alert_threshold = excluded.alert_threshold
+            ''', (category_id, amount, alert_threshold))
+            conn.commit()
+    
+    def delete_budget(self, category_id: int) -> bool:
+        """Menghapus budget sebuah kategori"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM budgets WHERE category_id = ?', (category_id,))
+            conn.commit()
+            return cursor.rowcount > 0
+    
+    def get_budget_status(self, period: Optional[str] = None,
+                          category_id: Optional[int] = None) -> List[sqlite3.Row]:
+        """Mengambil status budget untuk periode YYYY-MM (default bulan ini).
+        
+        Pemakaian diambil dari agregat bulanan dan mencakup subkategori
+        (lewat closure table), jadi biayanya hanya sebanding dengan jumlah
+        budget, bukan jumlah transaksi. Dengan `category_id`, yang diambil
+        adalah budget kategori tersebut dan semua leluhurnya.
+        """
+        return self._get_budget_status(period or datetime.now().strftime("%Y-%m"), category_id)
+    
+    @cached_report
+    def _get_budget_status(self, period: str, category_id: Optional[int]) -> List[sqlite3.Row]:
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            query = '''
+                SELECT b.category_id, c.name as category_name, b.amount as budget,
+                       b.alert_threshold, ? as period,
+                       COALESCE((
+                           SELECT SUM(m.total)
+                           FROM category_closure cc
+                           JOIN category_monthly_totals m
+                               ON m.category_id = cc.descendant_id AND m.period = ?
+                           WHERE cc.ancestor_id = b.category_id
+                       ), 0) as spent
+                FROM budgets b
+                JOIN categories c ON c.id = b.category_id
+            '''
+            params = [period, period]
+            if category_id is not None:
+                query += '''
+                    WHERE b.category_id IN (
+                        SELECT ancestor_id FROM category_closure WHERE descendant_id = ?
+                    )
+                '''
+                params.append(category_id)
+            query += ' ORDER BY c.name'
+            cursor.execute(query, params)
+            return cursor.fetchall()
+    
+    # ===== MODEL PROYEKSI =====
+    def get_forecast_models(self) -> List[sqlite3.Row]:
+        """Mengambil semua model proyeksi beserta tipe kategorinya"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT f.*, c.type as category_type, c.name as category_name
+                FROM forecast_models f
+                JOIN categories c ON c.id = f.category_id
+            ''')
+            return cursor.fetchall()
+    
+    def get_categories_needing_forecast(self, fitted_through: str) -> List[int]:
+        """ID kategori yang modelnya belum ada, basi, atau belum mencakup
+        bulan `fitted_through`"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT c.id FROM categories c
+                LEFT JOIN forecast_models f ON f.category_id = c.id
+                WHERE f.category_id IS NULL OR f.stale = 1 OR f.fitted_through != ?
+            ''', (fitted_through,))
+            return [row[0] for row in cursor.fetchall()]
+    
+    def get_category_monthly_totals(self, category_id: int,
+                                    end_period: Optional[str] = None) -> List[sqlite3.Row]:
+        """Total bulanan (period, total, count) sebuah kategori, urut periode"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT period, total, count FROM category_monthly_totals
+                WHERE category_id = ? AND period <= ?
+                ORDER BY period
+            ''', (category_id, end_period or '9999-12'))
+            return cursor.fetchall()
+    
+    def save_forecast_models(self, models: Iterable[Tuple[int, float, float, str, str]]):
+        """Menyimpan model (category_id, intercept, slope, seasonal_json, fitted_through)"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany('''
+                INSERT INTO forecast_models (category_id, intercept, slope, seasonal, fitted_through, stale)
+                VALUES (?, ?, ?, ?, ?, 0)
+                ON CONFLICT (category_id) DO UPDATE
+                SET intercept = excluded.intercept, slope = excluded.slope,
+                    seasonal = excluded.seasonal, fitted_through = excluded.fitted_through,
+                    stale = 0, fitted_at = CURRENT_TIMESTAMP
+            ''', models)
+            conn.commit()
+    
+    # ===== SINKRONISASI =====
+    def get_sync_device(self) -> Tuple[str, str]:
+        """(device_id, nama perangkat) database ini"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT key, value FROM sync_state WHERE key IN ('device_id', 'device_name')")
+            state = dict(cursor.fetchall())
+            return state['device_id'], state['device_name']
+    
+    def update_sync_device(self, name: Optional[str] = None, reset: bool = False):
+        """Mengganti nama perangkat dan/atau membuat device_id baru (`reset`),
+        misalnya setelah file database disalin ke perangkat lain; perubahan
+        lama tetap tercatat dengan ID lamanya"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            if reset:
+                cursor.execute("UPDATE sync_state SET value = ? WHERE key = 'device_id'",
+                               (uuid.uuid4().hex,))
+            if name:
+                cursor.execute("UPDATE sync_state SET value = ? WHERE key = 'device_name'", (name,))
+            conn.commit()
+    
+    def get_sync_peers(self) -> List[sqlite3.Row]:
+        """Semua perangkat yang pernah diajak sinkronisasi"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM sync_peers ORDER BY name')
+            return cursor.fetchall()
+    
+    def get_sync_peer(self, name: Optional[str] = None,
+                      device_id: Optional[str] = None) -> Optional[sqlite3.Row]:
+        """Mencari perangkat berdasarkan nama atau device_id"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM sync_peers WHERE name = ? OR device_id = ?',
+                           (name, device_id))
+            return cursor.fetchone()
+    
+    def save_sync_peer(self, name: str, device_id: Optional[str] = None,
+                       last_sent_seq: int = 0, last_received_seq: int = 0):
+        """Mencatat perangkat dan posisi sinkronisasinya (posisi tidak pernah mundur)"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO sync_peers (name, device_id, last_sent_seq, last_received_seq, synced_at)
+                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT (name) DO UPDATE
+                SET device_id = COALESCE(excluded.device_id, device_id),
+                    last_sent_seq = MAX(last_sent_seq, excluded.last_sent_seq),
+                    last_received_seq = MAX(last_received_seq, excluded.last_received_seq),
+                    synced_at = CURRENT_TIMESTAMP
+            ''', (name, device_id, last_sent_seq, last_received_seq))
+            conn.commit()
+    
+    def max_change_seq(self) -> int:
+        """Nomor urut terakhir di change log (0 jika kosong)"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'")
+            row = cursor.fetchone()
+            return row[0] if row else 0
+    
+    def iter_changes(self, since: int, until: int, exclude_origin: Optional[str] = None,
+                     batch_size: int = 1000) -> Iterator[sqlite3.Row]:
+        """Perubahan terakhir per baris dengan seq di (since, until], beserta
+        isi barisnya saat ini.
+        
+        Perubahan yang berasal dari `exclude_origin` dilewati (perangkat itu
+        sudah memilikinya). Urutan aman untuk diterapkan: kategori baru
+        (induk lebih dulu), lalu transaksi, lalu kategori yang dihapus.
+        """
+        return self._iter_rows('''
+            WITH latest AS (
+                SELECT MAX(seq) as seq FROM change_log
+                WHERE seq > ? AND seq <= ?
+                GROUP BY table_name, uid
+            )
+            SELECT l.seq, l.table_name, l.uid, l.op, l.changed_at, l.origin,
+                   c.type as category_type, p.name as parent_name,
+                   t.type, t.amount, t.description, t.date, tc.name as category_name
+            FROM latest
+            JOIN change_log l ON l.seq = latest.seq
+            LEFT JOIN categories c ON l.table_name = 'categories' AND c.name = l.uid
+            LEFT JOIN categories p ON p.id = c.parent_id
+            LEFT JOIN transactions t ON l.table_name = 'transactions' AND t.uid = l.uid
+            LEFT JOIN categories tc ON tc.id = t.category_id
+            WHERE l.origin IS NOT ?
+            ORDER BY CASE
+                         WHEN l.table_name = 'transactions' THEN 1
+                         WHEN l.op = 'upsert' THEN 0
+                         ELSE 2
+                     END, c.level, l.seq
+        ''', (since, until, exclude_origin), batch_size)
+    
+    def apply_changes(self, changes: Iterable[dict]) -> Dict[str, int]:
+        """Menerapkan perubahan dari perangkat lain dalam satu transaksi database.
+        
+        Setiap perubahan berisi table, uid, op, changed_at, origin, dan data
+        (lihat modul sync). Konflik diselesaikan last-writer-wins: perubahan
+        dilewati jika perubahan lokal terakhir untuk baris yang sama lebih
+        baru (changed_at, lalu origin sebagai penentu seri). Perubahan yang
+        diterapkan dicatat di change log dengan changed_at dan origin aslinya
+        agar bisa diteruskan ke perangkat lain.
+        """
+        counts = {'applied': 0, 'skipped': 0, 'conflicts': 0}
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            # Selama key ini ada, trigger change log tidak mencatat perubahan
+            cursor.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES ('applying', '1')")
+            for change in changes:
+                counts[self._apply_change(cursor, change)] += 1
+            cursor.execute("DELETE FROM sync_state WHERE key = 'applying'")
+            conn.commit()
+        return counts
+    
+    def _apply_change(self, cursor: sqlite3.Cursor, change: dict) -> str:
+        table, uid, data = change['table'], change['uid'], change.get('data') or {}
+        if table == 'categories' and change['op'] == 'upsert':
+            # Kategori bawaan dibuat di setiap perangkat dengan origin masing-masing;
+            # nama dan tipe yang sama berarti isinya sudah sama, bukan konflik
+            cursor.execute('SELECT type FROM categories WHERE name = ?', (uid,))
+            existing = cursor.fetchone()
+            if existing is not None:
+                return 'skipped' if existing['type'] == data['type'] else 'conflicts'
+        
+        cursor.execute('''
+            SELECT changed_at, origin FROM change_log
+            WHERE table_name = ? AND uid = ? ORDER BY seq DESC LIMIT 1
+        ''', (table, uid))
+        local = cursor.fetchone()
+        if local is not None:
+            local_key = (local['changed_at'], local['origin'])
+            remote_key = (change['changed_at'], change['origin'])
+            if local_key == remote_key:
+                return 'skipped'  # Sudah pernah diterapkan
+            if local_key > remote_key:
+                return 'conflicts'  # Versi lokal lebih baru
+        
+        if table == 'categories':
+            cursor.execute('SELECT id FROM categories WHERE name = ?', (uid,))
+            existing = cursor.fetchone()
+            if change['op'] == 'delete':
+                if existing and not self._remove_category(cursor, existing['id']):
+                    return 'conflicts'  # Masih dipakai di perangkat ini
+            else:
+                cursor.execute('SELECT id FROM categories WHERE name = ? AND type = ?',
+                               (data.get('parent'), data['type']))
+                parent = cursor.fetchone()
+                self._insert_category(cursor, uid, data['type'], parent['id'] if parent else None)
+        elif change['op'] == 'delete':
+            cursor.execute('DELETE FROM transactions WHERE uid = ?', (uid,))
+        else:
+            cursor.execute('SELECT id, type FROM categories WHERE name = ?', (data['category'],))
+            category = cursor.fetchone()
+            if category is None:
+                category_id = self._insert_category(cursor, data['category'], data['type'], None)
+            elif category['type'] != data['type']:
+                return 'conflicts'  # Nama kategori sama, tipe berbeda
+            else:
+                category_id = category['id']
+            cursor.execute('SELECT id FROM transactions WHERE uid = ?', (uid,))
+            existing = cursor.fetchone()
+            if existing:
+                self._update_transaction(cursor, existing['id'], data['amount'], category_id,
+                                         data['description'], data['date'])
+            else:
+                scorer = self._anomaly_scorer(cursor, category_id)
+                cursor.execute(self.INSERT_TRANSACTION_SQL, self._scored_values(
+                    scorer, (data['type'], data['amount'], category_id, data['description'],
+                             data['date'], None, uid)))
+        
+        cursor.execute('''
+            INSERT INTO change_log (table_name, uid, op, changed_at, origin)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (table, uid, change['op'], change['changed_at'], change['origin']))
+        return 'applied'
+    
+    def compact_change_log(self) -> int:
+        """Membuang entri change log yang sudah tergantikan entri lebih baru
+        untuk baris yang sama; mengembalikan jumlah entri yang dibuang.
+        
+        Entri terakhir tiap baris selalu disimpan, termasuk tanda hapus:
+        tanpanya perubahan lama yang datang belakangan dari perangkat mana
+        pun akan menghidupkan lagi baris yang sudah dihapus.
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                DELETE FROM change_log
+                WHERE seq < (SELECT MAX(l.seq) FROM change_log l
+                             WHERE l.table_name = change_log.table_name AND l.uid = change_log.uid)
+            ''')
+            removed = cursor.rowcount
+            conn.commit()
+            return removed
+    
+    # ===== LAMPIRAN =====
+    def get_attachment_blob(self, content_hash: str) -> Optional[sqlite3.Row]:
+        """Metadata blob lampiran berdasarkan hash isinya"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM attachment_blobs WHERE hash = ?', (content_hash,))
+            return cursor.fetchone()
+    
+    def add_attachment(self, transaction_id: int, content_hash: str, size: int, stored_size: int,
+                       compression: str, filename: str, mime_type: Optional[str] = None) -> int:
+        """Mencatat lampiran sebuah transaksi (blob dibuat jika belum ada)"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT 1 FROM transactions WHERE id = ?', (transaction_id,))
+            if cursor.fetchone() is None:
+                raise ValueError(f"Transaksi {transaction_id} tidak ditemukan")
+            cursor.execute('''
+                INSERT OR IGNORE INTO attachment_blobs (hash, size, stored_size, compression)
+                VALUES (?, ?, ?, ?)
+            ''', (content_hash, size, stored_size, compression))
+            cursor.execute('''
+                INSERT INTO attachments (transaction_id, hash, filename, mime_type)
+                VALUES (?, ?, ?, ?)
+            ''', (transaction_id, content_hash, filename, mime_type))
+            conn.commit()
+            return cursor.lastrowid
+    
+    def get_attachments(self, transaction_id: Optional[int] = None) -> List[sqlite3.Row]:
+        """Lampiran sebuah transaksi (atau semua lampiran) beserta ukuran blob-nya"""
+        query = '''
+            SELECT a.*, b.size, b.stored_size, b.compression
+            FROM attachments a
+            JOIN attachment_blobs b ON b.hash = a.hash
+        '''
+        params: tuple = ()
+        if transaction_id is not None:
+            query += ' WHERE a.transaction_id = ?'
+            params = (transaction_id,)
+        query += ' ORDER BY a.transaction_id, a.id'
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return cursor.fetchall()
+    
+    def get_attachment(self, attachment_id: int) -> Optional[sqlite3.Row]:
+        """Satu lampiran beserta metadata blob-nya"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT a.*, b.size, b.stored_size, b.compression
+                FROM attachments a
+                JOIN attachment_blobs b ON b.hash = a.hash
+                WHERE a.id = ?
+            ''', (attachment_id,))
+            return cursor.fetchone()
+    
+    def delete_attachment(self, attachment_id: int) -> bool:
+        """Menghapus lampiran; blob yang tidak dipakai lagi dibuang oleh gc"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM attachments WHERE id = ?', (attachment_id,))
+            conn.commit()
+            return cursor.rowcount > 0
+    
+    def delete_unreferenced_blobs(self) -> List[sqlite3.Row]:
+        """Menghapus metadata blob yang tidak dipakai lampiran mana pun,
+        mengembalikan (hash, stored_size) blob tersebut"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT hash, stored_size FROM attachment_blobs b
+                WHERE NOT EXISTS (SELECT 1 FROM attachments a WHERE a.hash = b.hash)
+            ''')
+            blobs = cursor.fetchall()
+            cursor.executemany('DELETE FROM attachment_blobs WHERE hash = ?',
+                               [(blob['hash'],) for blob in blobs])
+            conn.commit()
+            return blobs
+    
+    def get_attachment_blob_hashes(self) -> Set[str]:
+        """Hash semua blob yang tercatat"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT hash FROM attachment_blobs')
+            return {row[0] for row in cursor.fetchall()}
@@ -0,0 +1,149 @@
+"""
+Deteksi transaksi duplikat
+
+Setiap transaksi punya `fingerprint`: hash dari tanggal, jumlah, deskripsi
+yang dinormalisasi, dan kategori. Kolom ini di-index sehingga cek duplikat
+cukup satu lookup index per baris. Mode merge memakai kunci tanpa deskripsi
+(tanggal, jumlah, kategori), karena deskripsi yang berbeda justru yang ingin
+digabungkan. Untuk import massal, `Deduplicator` memakai Bloom filter di
+memori yang bisa membesar sebagai saringan awal: baris yang pasti baru
+(mayoritas) tidak perlu menyentuh database sama sekali, dan duplikat di
+dalam batch yang belum disimpan dicek lewat dict di memori.
+"""
+import math
+from typing import Dict, Iterable, List, Optional
+
+from database import Database
+from utils import transaction_fingerprint
+
+DEDUPE_MODES = ('skip', 'flag', 'merge')
+
+
+class BloomFilter:
+    """Bloom filter sederhana untuk fingerprint (string hex hasil hash)"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        capacity = max(capacity, 1)
+        self.capacity = capacity
+        self.count = 0
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, fingerprint: str) -> Iterable[int]:
+        # Fingerprint sudah berupa hash, jadi cukup dipecah menjadi dua
+        # bilangan untuk double hashing
+        value = int(fingerprint, 16)
+        h1 = value & 0xFFFFFFFF
+        h2 = (value >> 32) | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, fingerprint: str):
+        for pos in self._positions(fingerprint):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, fingerprint: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(fingerprint))
+
+
+class ScalableBloomFilter:
+    """Bloom filter berlapis: saat lapisan terakhir penuh, ditambah lapisan
+    baru dua kali lebih besar dengan error rate setengahnya, sehingga
+    false positive total tetap di bawah `error_rate` berapa pun isinya"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.error_rate = error_rate
+        self.layers: List[BloomFilter] = [BloomFilter(capacity, error_rate / 2)]
+
+    def add(self, fingerprint: str):
+        layer = self.layers[-1]
+        if layer.count >= layer.capacity:
+            layer = BloomFilter(layer.capacity * 2, self.error_rate / 2 ** (len(self.layers) + 1))
+            self.layers.append(layer)
+        layer.add(fingerprint)
+
+    def __contains__(self, fingerprint: str) -> bool:
+        return any(fingerprint in layer for layer in self.layers)
+
+
+class Deduplicator:
+    """Memeriksa baris import terhadap isi ledger dan baris sebelumnya.
+
+    Mode:
+    - skip  : baris duplikat tidak disimpan
+    - flag  : baris tetap disimpan dengan `duplicate_of` menunjuk transaksi asli
+    - merge : baris dengan tanggal, jumlah, dan kategori yang sama (deskripsi
+              boleh berbeda) tidak disimpan, tetapi deskripsi transaksi asli
+              diganti dengan deskripsi baru jika lebih lengkap (lebih panjang)
+    """
+
+    def __init__(self, db: Database, mode: str = 'flag', expected_rows: int = 0):
+        if mode not in DEDUPE_MODES:
+            raise ValueError(f"Mode dedupe tidak dikenal: {mode}")
+        self.db = db
+        self.mode = mode
+        self.bloom = ScalableBloomFilter(db.count_transactions() + max(expected_rows, 100_000))
+        self.pending: Dict[str, int] = {}  # fingerprint -> posisi di batch yang belum disimpan
+        if mode == 'merge':
+            for date, amount, category_id in db.iter_entry_keys():
+                self.bloom.add(self._merge_key(date, amount, category_id))
+        else:
+            for fingerprint in db.iter_fingerprints():
+                self.bloom.add(fingerprint)
+        self.duplicates = 0
+
+    @staticmethod
+    def _merge_key(date: str, amount: float, category_id: int) -> str:
+        return transaction_fingerprint(date, amount, None, category_id)
+
+    def flushed(self):
+        """Dipanggil setelah batch tertunda disimpan ke database"""
+        self.pending.clear()
+
+    def check(self, row: tuple, batch: List[tuple], flush) -> Optional[tuple]:
+        """Memeriksa satu baris (type, amount, category_id, description, date).
+
+        Mengembalikan baris yang perlu ditambahkan ke `batch` (dengan
+        tambahan kolom `duplicate_of`) atau None jika baris tidak perlu
+        disimpan. Duplikat dari baris di `batch` dicek di memori; `flush`
+        hanya dipanggil pada mode flag, yang butuh ID transaksi asli.
+        """
+        type_, amount, category_id, description, date = row
+        if self.mode == 'merge':
+            fingerprint = self._merge_key(date, amount, category_id)
+        else:
+            fingerprint = transaction_fingerprint(date, amount, description, category_id)
+        if fingerprint not in self.bloom:
+            self.bloom.add(fingerprint)
+            return self._accept(row, fingerprint, batch)
+
+        position = self.pending.get(fingerprint)
+        if position is not None and self.mode != 'flag':
+            # Asli masih di batch tertunda: cukup ditangani di memori
+            self.duplicates += 1
+            pending = batch[position]
+            if self.mode == 'merge' and len(description or '') > len(pending[3] or ''):
+                batch[position] = pending[:3] + (description,) + pending[4:]
+            return None
+        if position is not None:
+            flush()
+
+        if self.mode == 'merge':
+            original = self.db.find_same_entry(date, amount, category_id)
+        else:
+            original = self.db.find_by_fingerprint(fingerprint)
+        if original is None:  # False positive Bloom filter
+            return self._accept(row, fingerprint, batch)
+
+        self.duplicates += 1
+        if self.mode == 'flag':
+            return row + (original['id'],)
+        if self.mode == 'merge' and len(description or '') > len(original['description'] or ''):
+            self.db.update_transaction(original['id'], original['amount'], original['category_id'],
+                                       description, original['date'])
+        return None
+
+    def _accept(self, row: tuple, fingerprint: str, batch: List[tuple]) -> tuple:
+        self.pending[fingerprint] = len(batch)
+        return row + (None,)
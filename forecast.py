@@ -0,0 +1,139 @@
+"""
+Proyeksi arus kas (cash-flow forecast) per kategori
+
+Model tiap kategori dilatih dari agregat bulanan (`category_monthly_totals`),
+bukan dari baris transaksi: tren linear atas maksimal 36 bulan terakhir yang
+sudah lengkap, ditambah indeks musiman per bulan kalender jika data sudah
+mencakup minimal dua tahun. Parameter model disimpan di tabel
+`forecast_models`; trigger menandai model basi saat agregat kategorinya
+berubah, sehingga refresh hanya melatih ulang kategori yang terdampak.
+"""
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+
+from database import Database
+
+HISTORY_MONTHS = 36  # Panjang jendela data untuk tren
+SEASONAL_MIN_MONTHS = 24  # Minimal data agar pola musiman dipakai
+
+
+@dataclass
+class ForecastPoint:
+    """Proyeksi satu bulan"""
+    period: str  # 'YYYY-MM'
+    income: float
+    expense: float
+    balance: float  # Saldo proyeksi di akhir bulan
+
+    @property
+    def net(self) -> float:
+        return self.income - self.expense
+
+
+def period_index(period: str) -> int:
+    """'YYYY-MM' -> nomor bulan berurutan"""
+    return int(period[:4]) * 12 + int(period[5:7]) - 1
+
+
+def index_period(index: int) -> str:
+    """Nomor bulan berurutan -> 'YYYY-MM'"""
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def fit_series(totals: Sequence[Tuple[str, float]], end_period: str) -> Tuple[float, float, List[float]]:
+    """Melatih model tren + musiman dari total bulanan sampai `end_period`.
+
+    Mengembalikan (intercept, slope, seasonal): intercept adalah nilai tren
+    pada `end_period`, slope perubahan per bulan, dan seasonal 12 koreksi
+    aditif per bulan kalender (Januari = indeks 0).
+    """
+    seasonal = [0.0] * 12
+    if not totals:
+        return 0.0, 0.0, seasonal
+
+    end = period_index(end_period)
+    start = max(period_index(totals[0][0]), end - HISTORY_MONTHS + 1)
+    n = end - start + 1
+    if n <= 0:
+        return 0.0, 0.0, seasonal
+
+    values = [0.0] * n  # Bulan tanpa transaksi dihitung nol
+    for period, total in totals:
+        i = period_index(period) - start
+        if 0 <= i < n:
+            values[i] = total
+
+    # Regresi linear dengan x relatif terhadap end_period (x = 0 di akhir)
+    xs = [i - (n - 1) for i in range(n)]
+    mean_x = sum(xs) / n
+    mean_y = sum(values) / n
+    sxx = sum((x - mean_x) ** 2 for x in xs)
+    slope = (sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, values)) / sxx) if sxx else 0.0
+    intercept = mean_y - slope * mean_x
+
+    if n >= SEASONAL_MIN_MONTHS:
+        sums = [0.0] * 12
+        counts = [0] * 12
+        for i, (x, y) in enumerate(zip(xs, values)):
+            month = (start + i) % 12
+            sums[month] += y - (intercept + slope * x)
+            counts[month] += 1
+        seasonal = [s / c if c else 0.0 for s, c in zip(sums, counts)]
+        offset = sum(seasonal) / 12
+        seasonal = [s - offset for s in seasonal]
+
+    return intercept, slope, seasonal
+
+
+class Forecaster:
+    """Menghitung proyeksi saldo memakai model yang di-cache di database"""
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    @staticmethod
+    def last_complete_period(today: Optional[datetime] = None) -> str:
+        """Bulan terakhir yang sudah lengkap (bulan lalu)"""
+        today = today or datetime.now()
+        return index_period(period_index(today.strftime("%Y-%m")) - 1)
+
+    def refresh(self, fitted_through: Optional[str] = None) -> int:
+        """Melatih ulang model kategori yang basi, mengembalikan jumlahnya"""
+        fitted_through = fitted_through or self.last_complete_period()
+        models = []
+        for category_id in self.db.get_categories_needing_forecast(fitted_through):
+            totals = [(row['period'], row['total'])
+                      for row in self.db.get_category_monthly_totals(category_id, fitted_through)]
+            intercept, slope, seasonal = fit_series(totals, fitted_through)
+            models.append((category_id, intercept, slope, json.dumps(seasonal), fitted_through))
+
+        if models:
+            self.db.save_forecast_models(models)
+        return len(models)
+
+    def forecast(self, months: int = 6, today: Optional[datetime] = None) -> List[ForecastPoint]:
+        """Proyeksi pemasukan, pengeluaran, dan saldo untuk `months` bulan ke depan.
+
+        Saldo awal adalah saldo aktual hari ini; proyeksi dimulai bulan depan.
+        """
+        today = today or datetime.now()
+        fitted_through = self.last_complete_period(today)
+        self.refresh(fitted_through)
+
+        models = [(row['category_type'], row['intercept'], row['slope'], json.loads(row['seasonal']))
+                  for row in self.db.get_forecast_models()]
+        balance = self.db.get_balance_as_of(today.strftime("%Y-%m-%d"))
+        base = period_index(fitted_through)
+
+        points = []
+        for h in range(2, months + 2):  # h = 1 adalah bulan berjalan
+            index = base + h
+            totals = {'income': 0.0, 'expense': 0.0}
+            for category_type, intercept, slope, seasonal in models:
+                predicted = intercept + slope * h + seasonal[index % 12]
+                totals[category_type] += max(predicted, 0.0)
+            balance += totals['income'] - totals['expense']
+            points.append(ForecastPoint(index_period(index), totals['income'], totals['expense'], balance))
+        return points
@@ -0,0 +1,130 @@
+"""
+Modul pengelolaan banyak ledger (buku kas)
+
+Setiap ledger disimpan di file SQLite terpisah. `LedgerRegistry` mencatat
+pemetaan nama ledger ke file database di `ledgers.json`, sedangkan
+`LedgerRouter` membuka `Database` sesuai permintaan dan hanya menyimpan
+sejumlah koneksi terakhir yang dipakai (LRU), sehingga ratusan ledger bisa
+dikelola tanpa membuka semuanya sekaligus.
+"""
+import json
+import os
+import re
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from database import Database
+
+LEDGER_NAME_PATTERN = re.compile(r'^[\w-]{1,64}$')
+
+
+class LedgerRegistry:
+    """Daftar ledger: nama -> file database SQLite"""
+
+    DEFAULT_LEDGER = 'utama'
+    DEFAULT_DB = 'py_money.db'
+
+    def __init__(self, path: str = 'ledgers.json', ledger_dir: str = 'ledgers'):
+        self.path = path
+        self.ledger_dir = ledger_dir
+        self.ledgers: Dict[str, str] = {self.DEFAULT_LEDGER: self.DEFAULT_DB}
+        self.default = self.DEFAULT_LEDGER
+        self.load()
+
+    def load(self):
+        """Membaca registry dari file (jika ada)"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8') as f:
+            data = json.load(f)
+        self.ledgers = dict(data.get('ledgers', {})) or self.ledgers
+        self.default = data.get('default', self.default)
+
+    def save(self):
+        """Menyimpan registry ke file secara atomik"""
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'default': self.default, 'ledgers': self.ledgers}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def names(self) -> List[str]:
+        """Nama semua ledger, urut abjad"""
+        return sorted(self.ledgers)
+
+    def get_path(self, name: Optional[str] = None) -> str:
+        """Mendapatkan path database ledger (default jika nama kosong)"""
+        name = name or self.default
+        if name not in self.ledgers:
+            raise KeyError(f"Ledger '{name}' tidak ditemukan")
+        return self.ledgers[name]
+
+    def create(self, name: str, path: Optional[str] = None) -> str:
+        """Mendaftarkan ledger baru, mengembalikan path database-nya"""
+        if not LEDGER_NAME_PATTERN.match(name):
+            raise ValueError("Nama ledger hanya boleh huruf, angka, '_' dan '-'")
+        if name in self.ledgers:
+            raise ValueError(f"Ledger '{name}' sudah ada")
+
+        if path is None:
+            os.makedirs(self.ledger_dir, exist_ok=True)
+            path = os.path.join(self.ledger_dir, f"{name}.db")
+        self.ledgers[name] = path
+        self.save()
+        return path
+
+    def remove(self, name: str):
+        """Menghapus ledger dari registry (file database tidak dihapus)"""
+        if name == self.default:
+            raise ValueError("Ledger default tidak bisa dihapus")
+        if self.ledgers.pop(name, None) is None:
+            raise KeyError(f"Ledger '{name}' tidak ditemukan")
+        self.save()
+
+    def set_default(self, name: str):
+        """Mengatur ledger default"""
+        self.get_path(name)
+        self.default = name
+        self.save()
+
+
+class LedgerRouter:
+    """Membuka `Database` per ledger dengan batas jumlah koneksi terbuka (LRU)"""
+
+    def __init__(self, registry: Optional[LedgerRegistry] = None, max_open: int = 8,
+                 in_memory: bool = False):
+        self.registry = registry or LedgerRegistry()
+        self.max_open = max_open
+        self.in_memory = in_memory  # Buka ledger dalam mode in-memory (lihat Database)
+        self._open: 'OrderedDict[str, Database]' = OrderedDict()
+
+    def get(self, name: Optional[str] = None) -> Database:
+        """Mengambil Database untuk ledger, membukanya bila belum terbuka"""
+        name = name or self.registry.default
+        db = self._open.get(name)
+        if db is not None:
+            self._open.move_to_end(name)
+            return db
+
+        db = Database(self.registry.get_path(name), in_memory=self.in_memory)
+        self._open[name] = db
+        while len(self._open) > self.max_open:
+            _, evicted = self._open.popitem(last=False)
+            evicted.close()
+        return db
+
+    def close(self, name: str):
+        """Menutup koneksi sebuah ledger jika sedang terbuka"""
+        db = self._open.pop(name, None)
+        if db is not None:
+            db.close()
+
+    def close_all(self):
+        """Menutup semua koneksi yang terbuka"""
+        while self._open:
+            _, db = self._open.popitem()
+            db.close()
+
+    @property
+    def open_ledgers(self) -> List[str]:
+        """Nama ledger yang sedang terbuka, dari yang paling lama tidak dipakai"""
+        return list(self._open)
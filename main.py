@@ -2,34 +2,43 @@
 Py-Money - Aplikasi Pencatat Keuangan Berbasis CLI
 Entry point utama program
 """
+import os
 import sys
 import sqlite3  # DITAMBAHKAN untuk handle exception
 from datetime import datetime
+from typing import Optional
 
 # Import modul internal
+from anomaly import typical_amount
 from database import Database
-from models import Category, Transaction
+from ledger import LedgerRouter
+from models import Category, Transaction, BudgetStatus
+from rules import RuleSet, add_rule
 from utils import (
     clear_screen, print_header, format_currency, 
     format_date, validate_date, validate_amount,
-    get_input, confirm_action
+    get_input, confirm_action, format_category_name, parse_tags
 )
 
 class PyMoneyApp:
     """Aplikasi utama Py-Money"""
     
-    def __init__(self):
-        self.db = Database()
+    def __init__(self, ledger: Optional[str] = None, router: Optional[LedgerRouter] = None):
+        self.router = router or LedgerRouter()
+        self.ledger = ledger or self.router.registry.default
+        self.db: Optional[Database] = None
         self.running = True
     
     def run(self):
         """Menjalankan aplikasi"""
         self.show_welcome()
+        # Database baru dibuka setelah welcome screen tampil
+        self.switch_ledger(self.ledger)
         
         while self.running:
             clear_screen()
             self.show_main_menu()
-            choice = input("\nPilih menu [1-4, x]: ").strip().lower()
+            choice = input("\nPilih menu [1-6, x]: ").strip().lower()
             
             if choice == '1':
                 self.income_menu()
@@ -39,9 +48,14 @@ class PyMoneyApp:
                 self.category_menu()
             elif choice == '4':
                 self.balance_menu()
+            elif choice == '5':
+                self.budget_menu()
+            elif choice == '6':
+                self.ledger_menu()
             elif choice == 'x':
                 if confirm_action("Keluar dari program?"):
                     self.running = False
+                    self.router.close_all()
                     print("\n👋 Terima kasih telah menggunakan Py-Money!")
             else:
                 print("❌ Pilihan tidak valid!")
@@ -68,11 +82,14 @@ class PyMoneyApp:
     def show_main_menu(self):
         """Menampilkan menu utama"""
         print_header("PY-MONEY - MENU UTAMA")
+        print(f"\n📚 Ledger aktif: {self.ledger}")
         print("\n📋 Pilihan Menu:")
         print("1. 💰 Pemasukan")
         print("2. 💸 Pengeluaran")
         print("3. 🏷️  Kategori")
         print("4. 📊 Balance & Ringkasan")
+        print("5. 🎯 Budget Bulanan")
+        print("6. 📚 Ledger")
         print("\nx. 🚪 Keluar Program")
         print("\n" + "=" * 60)
     
@@ -156,18 +173,9 @@ class PyMoneyApp:
         for i, cat in enumerate(categories, 1):
             print(f"{i}. {cat['name']}")
         
-        # Input kategori
-        while True:
-            try:
-                cat_idx = int(input(f"\nPilih kategori [1-{len(categories)}]: "))
-                if 1 <= cat_idx <= len(categories):
-                    category_id = categories[cat_idx-1]['id']
-                    category_name = categories[cat_idx-1]['name']
-                    break
-                else:
-                    print("❌ Pilihan tidak valid!")
-            except ValueError:
-                print("❌ Masukkan angka yang valid!")
+        # Input kategori (Enter = otomatis dari deskripsi jika ada aturan)
+        rules = RuleSet.load(self.db)
+        category = self._choose_category(categories, allow_auto=len(rules) > 0)
         
         # Input jumlah
         while True:
@@ -179,6 +187,9 @@ class PyMoneyApp:
         
         # Input deskripsi
         description = input("\n📝 Deskripsi (opsional): ").strip() or None
+        if category is None:
+            category = self._auto_category(categories, rules, 'income', amount, description)
+        category_id, category_name = category['id'], category['name']
         
         # Input tanggal
         today = datetime.now().strftime("%Y-%m-%d")
@@ -191,6 +202,9 @@ class PyMoneyApp:
                 break
             print("❌ Format tanggal tidak valid! Gunakan format YYYY-MM-DD")
         
+        # Input tag (opsional)
+        tags = parse_tags(input("\n🔖 Tag, pisahkan dengan koma (opsional): "))
+        
         # Konfirmasi
         print("\n" + "=" * 60)
         print("📋 Ringkasan Pemasukan:")
@@ -198,8 +212,13 @@ class PyMoneyApp:
         print(f"Jumlah     : {format_currency(amount)}")
         print(f"Deskripsi  : {description or '-'}")
         print(f"Tanggal    : {format_date(date_str)}")
+        print(f"Tag        : {', '.join(tags) or '-'}")
         print("=" * 60)
         
+        duplicate = self.db.find_duplicate('income', amount, category_id, description, date_str)
+        if duplicate:
+            print(f"⚠️  Transaksi yang sama sudah tercatat (ID: {duplicate['id']}).")
+        
         if confirm_action("\nSimpan pemasukan ini?"):
             transaction_id = self.db.add_transaction(
                 type_='income',
@@ -208,12 +227,41 @@ class PyMoneyApp:
                 description=description,
                 date=date_str
             )
+            if tags:
+                self.db.tag_transactions([transaction_id], tags)
             print(f"\n✅ Pemasukan berhasil ditambahkan! (ID: {transaction_id})")
         else:
             print("\n❌ Pemasukan dibatalkan.")
         
         input("\nTekan Enter untuk melanjutkan...")
     
+    def _choose_category(self, categories, allow_auto: bool = False):
+        """Memilih kategori dari daftar bernomor; None jika user memilih otomatis"""
+        hint = ", Enter = otomatis dari deskripsi" if allow_auto else ""
+        while True:
+            choice = input(f"\nPilih kategori [1-{len(categories)}{hint}]: ").strip()
+            if not choice and allow_auto:
+                return None
+            try:
+                cat_idx = int(choice)
+                if 1 <= cat_idx <= len(categories):
+                    return categories[cat_idx-1]
+                else:
+                    print("❌ Pilihan tidak valid!")
+            except ValueError:
+                print("❌ Masukkan angka yang valid!")
+    
+    def _auto_category(self, categories, rules: RuleSet, type_: str, amount: float,
+                       description: Optional[str]):
+        """Kategori dari aturan kategori otomatis, atau pilih manual jika tidak ada yang cocok"""
+        category_id = rules.categorize(type_, amount, description)
+        for category in categories:
+            if category['id'] == category_id:
+                print(f"🏷️  Kategori otomatis: {category['name']}")
+                return category
+        print("\n❓ Tidak ada aturan yang cocok, pilih kategori secara manual.")
+        return self._choose_category(categories)
+    
     def delete_income(self):
         """Menghapus pemasukan"""
         clear_screen()
@@ -260,7 +308,7 @@ class PyMoneyApp:
                 print("📋 Detail Pemasukan:")
                 print(f"ID         : {transaction['id']}")
                 print(f"Tanggal    : {format_date(transaction['date'])}")
-                print(f"Kategori   : {transaction.get('category_name', 'Unknown')}")
+                print(f"Kategori   : {transaction['category_name']}")
                 print(f"Jumlah     : {format_currency(transaction['amount'])}")
                 print(f"Deskripsi  : {transaction['description'] or '-'}")
                 print("=" * 60)
@@ -287,10 +335,11 @@ class PyMoneyApp:
             print("1. 📜 List Pengeluaran")
             print("2. ➕ Tambah Pengeluaran")
             print("3. 🗑️  Hapus Pengeluaran")
+            print("4. 🏦 Rekonsiliasi Mutasi Bank")
             print("\nq. ↩️  Kembali ke Menu Utama")
             print("=" * 60)
             
-            choice = input("\nPilih [1-3, q]: ").strip().lower()
+            choice = input("\nPilih [1-4, q]: ").strip().lower()
             
             if choice == '1':
                 self.list_expense()
@@ -298,6 +347,8 @@ class PyMoneyApp:
                 self.add_expense()
             elif choice == '3':
                 self.delete_expense()
+            elif choice == '4':
+                self.reconcile_statement()
             elif choice == 'q':
                 break
             else:
@@ -357,18 +408,9 @@ class PyMoneyApp:
         for i, cat in enumerate(categories, 1):
             print(f"{i}. {cat['name']}")
         
-        # Input kategori
-        while True:
-            try:
-                cat_idx = int(input(f"\nPilih kategori [1-{len(categories)}]: "))
-                if 1 <= cat_idx <= len(categories):
-                    category_id = categories[cat_idx-1]['id']
-                    category_name = categories[cat_idx-1]['name']
-                    break
-                else:
-                    print("❌ Pilihan tidak valid!")
-            except ValueError:
-                print("❌ Masukkan angka yang valid!")
+        # Input kategori (Enter = otomatis dari deskripsi jika ada aturan)
+        rules = RuleSet.load(self.db)
+        category = self._choose_category(categories, allow_auto=len(rules) > 0)
         
         # Input jumlah
         while True:
@@ -380,6 +422,9 @@ class PyMoneyApp:
         
         # Input deskripsi
         description = input("\n📝 Deskripsi (opsional): ").strip() or None
+        if category is None:
+            category = self._auto_category(categories, rules, 'expense', amount, description)
+        category_id, category_name = category['id'], category['name']
         
         # Input tanggal
         today = datetime.now().strftime("%Y-%m-%d")
@@ -392,6 +437,9 @@ class PyMoneyApp:
                 break
             print("❌ Format tanggal tidak valid! Gunakan format YYYY-MM-DD")
         
+        # Input tag (opsional)
+        tags = parse_tags(input("\n🔖 Tag, pisahkan dengan koma (opsional): "))
+        
         # Konfirmasi
         print("\n" + "=" * 60)
         print("📋 Ringkasan Pengeluaran:")
@@ -399,8 +447,13 @@ class PyMoneyApp:
         print(f"Jumlah     : {format_currency(amount)}")
         print(f"Deskripsi  : {description or '-'}")
         print(f"Tanggal    : {format_date(date_str)}")
+        print(f"Tag        : {', '.join(tags) or '-'}")
         print("=" * 60)
         
+        duplicate = self.db.find_duplicate('expense', amount, category_id, description, date_str)
+        if duplicate:
+            print(f"⚠️  Transaksi yang sama sudah tercatat (ID: {duplicate['id']}).")
+        
         if confirm_action("\nSimpan pengeluaran ini?"):
             transaction_id = self.db.add_transaction(
                 type_='expense',
@@ -409,7 +462,11 @@ class PyMoneyApp:
                 description=description,
                 date=date_str
             )
+            if tags:
+                self.db.tag_transactions([transaction_id], tags)
             print(f"\n✅ Pengeluaran berhasil ditambahkan! (ID: {transaction_id})")
+            self.show_anomaly_alert(transaction_id)
+            self.show_budget_alert(category_id, date_str[:7])
         else:
             print("\n❌ Pengeluaran dibatalkan.")
         
@@ -461,7 +518,7 @@ class PyMoneyApp:
                 print("📋 Detail Pengeluaran:")
                 print(f"ID         : {transaction['id']}")
                 print(f"Tanggal    : {format_date(transaction['date'])}")
-                print(f"Kategori   : {transaction.get('category_name', 'Unknown')}")
+                print(f"Kategori   : {transaction['category_name']}")
                 print(f"Jumlah     : {format_currency(transaction['amount'])}")
                 print(f"Deskripsi  : {transaction['description'] or '-'}")
                 print("=" * 60)
@@ -478,6 +535,52 @@ class PyMoneyApp:
         
         input("\nTekan Enter untuk melanjutkan...")
     
+    def reconcile_statement(self):
+        """Mencocokkan ledger dengan file mutasi bank (CSV/JSONL urut tanggal)"""
+        from reconcile import Reconciler, read_statement
+        
+        clear_screen()
+        print_header("🏦 REKONSILIASI MUTASI BANK")
+        
+        path = input("\n📄 File mutasi (.csv/.jsonl, urut tanggal): ").strip()
+        if not os.path.exists(path):
+            print("❌ File tidak ditemukan!")
+            input("\nTekan Enter untuk melanjutkan...")
+            return
+        days_str = input("📅 Toleransi tanggal (hari) [3]: ").strip()
+        days = int(days_str) if days_str.isdigit() else 3
+        
+        reconciler = Reconciler(self.db, date_tolerance=days)
+        shown = 0
+        print()
+        try:
+            for entry in reconciler.run(read_statement(path)):
+                if entry.status == 'matched' or shown >= 30:
+                    continue
+                shown += 1
+                if entry.statement:
+                    line = entry.statement
+                    print(f"❓ Belum dicatat   | {format_date(line.date):12} | "
+                          f"{format_currency(line.amount):>16} | {line.description or '-'}")
+                else:
+                    row = entry.transaction
+                    print(f"➕ Tidak di mutasi | {format_date(row['date']):12} | "
+                          f"{format_currency(row['amount']):>16} | {row['description'] or '-'} (ID {row['id']})")
+        except ValueError as e:
+            print(f"❌ {e}")
+            input("\nTekan Enter untuk melanjutkan...")
+            return
+        
+        summary = reconciler.summary
+        print("\n" + "=" * 60)
+        print(f"Cocok              : {summary.matched:,}")
+        print(f"Belum dicatat      : {summary.missing:,} ({format_currency(summary.missing_amount)})")
+        print(f"Tidak ada di mutasi: {summary.extra:,} ({format_currency(summary.extra_amount)})")
+        if summary.balanced:
+            print("✅ Ledger sesuai dengan mutasi bank.")
+        
+        input("\nTekan Enter untuk melanjutkan...")
+    
     def edit_transaction(self, transaction_id: int, expected_type: str):
         """Edit transaksi (pemasukan/pengeluaran)"""
         transaction = self.db.get_transaction(transaction_id)
@@ -499,7 +602,7 @@ class PyMoneyApp:
         # Tampilkan data saat ini
         print("\n📋 Data Saat Ini:")
         print(f"1. Tanggal     : {format_date(transaction['date'])}")
-        print(f"2. Kategori    : {transaction.get('category_name', 'Unknown')}")
+        print(f"2. Kategori    : {transaction['category_name']}")
         print(f"3. Jumlah      : {format_currency(transaction['amount'])}")
         print(f"4. Deskripsi   : {transaction['description'] or '-'}")
         print("\n" + "=" * 60)
@@ -551,7 +654,7 @@ class PyMoneyApp:
         print("📋 Ringkasan Perubahan:")
         print(f"Tanggal     : {format_date(current_date)} → {format_date(new_date)}")
         category_name = next((cat['name'] for cat in categories if cat['id'] == category_id), "Unknown")
-        print(f"Kategori    : {transaction.get('category_name', 'Unknown')} → {category_name}")
+        print(f"Kategori    : {transaction['category_name']} → {category_name}")
         print(f"Jumlah      : {format_currency(current_amount)} → {format_currency(new_amount)}")
         print(f"Deskripsi   : {current_desc or '-'} → {new_desc or '-'}")
         print("=" * 60)
@@ -582,10 +685,12 @@ class PyMoneyApp:
             print("1. 📜 List Kategori")
             print("2. ➕ Tambah Kategori")
             print("3. 🗑️  Hapus Kategori")
+            print("4. 🔖 Ringkasan Tag")
+            print("5. 🤖 Aturan Kategori Otomatis")
             print("\nq. ↩️  Kembali ke Menu Utama")
             print("=" * 60)
             
-            choice = input("\nPilih [1-3, q]: ").strip().lower()
+            choice = input("\nPilih [1-5, q]: ").strip().lower()
             
             if choice == '1':
                 self.list_categories()
@@ -593,6 +698,10 @@ class PyMoneyApp:
                 self.add_category()
             elif choice == '3':
                 self.delete_category()
+            elif choice == '4':
+                self.tag_summary()
+            elif choice == '5':
+                self.category_rules()
             elif choice == 'q':
                 break
             else:
@@ -604,7 +713,7 @@ class PyMoneyApp:
         clear_screen()
         print_header("📜 DAFTAR KATEGORI")
         
-        categories = self.db.get_all_categories()
+        categories = self.db.get_category_tree()
         
         if not categories:
             print("\n📭 Tidak ada kategori.")
@@ -617,11 +726,11 @@ class PyMoneyApp:
             
             print("\n💰 PEMASUKAN:")
             for cat in income_categories:
-                print(f"{cat['id']:3d} | {'Pemasukan':12} | {cat['name']}")
+                print(f"{cat['id']:3d} | {'Pemasukan':12} | {format_category_name(cat)}")
             
             print("\n💸 PENGELUARAN:")
             for cat in expense_categories:
-                print(f"{cat['id']:3d} | {'Pengeluaran':12} | {cat['name']}")
+                print(f"{cat['id']:3d} | {'Pengeluaran':12} | {format_category_name(cat)}")
             
             print(f"\n📊 Total: {len(categories)} kategori "
                   f"({len(income_categories)} pemasukan, {len(expense_categories)} pengeluaran)")
@@ -656,17 +765,35 @@ class PyMoneyApp:
             else:
                 print("❌ Pilihan tidak valid!")
         
+        # Input kategori induk (opsional)
+        parents = self.db.get_category_tree(type_filter=type_)
+        parent = None
+        if parents:
+            print("\n📂 Kategori Induk:")
+            for i, cat in enumerate(parents, 1):
+                print(f"{i:2d}. {format_category_name(cat)}")
+            
+            while True:
+                parent_choice = input(f"\nPilih induk [1-{len(parents)}, Enter untuk kategori utama]: ").strip()
+                if not parent_choice:
+                    break
+                if parent_choice.isdigit() and 1 <= int(parent_choice) <= len(parents):
+                    parent = parents[int(parent_choice)-1]
+                    break
+                print("❌ Pilihan tidak valid!")
+        
         # Konfirmasi
         type_name = "Pemasukan" if type_ == 'income' else "Pengeluaran"
         print("\n" + "=" * 60)
         print("📋 Ringkasan Kategori:")
         print(f"Nama   : {name}")
         print(f"Tipe   : {type_name}")
+        print(f"Induk  : {parent['path'] if parent else '-'}")
         print("=" * 60)
         
         if confirm_action("\nSimpan kategori ini?"):
             try:
-                category_id = self.db.add_category(name, type_)
+                category_id = self.db.add_category(name, type_, parent['id'] if parent else None)
                 print(f"\n✅ Kategori berhasil ditambahkan! (ID: {category_id})")
             except sqlite3.IntegrityError:  # DIPERBAIKI: menggunakan sqlite3.IntegrityError
                 print("❌ Kategori dengan nama tersebut sudah ada!")
@@ -680,7 +807,7 @@ class PyMoneyApp:
         clear_screen()
         print_header("🗑️  HAPUS KATEGORI")
         
-        categories = self.db.get_all_categories()
+        categories = self.db.get_category_tree()
         
         if not categories:
             print("\n📭 Tidak ada kategori.")
@@ -692,7 +819,7 @@ class PyMoneyApp:
         print("-" * 40)
         for cat in categories:
             type_name = "Pemasukan" if cat['type'] == 'income' else "Pengeluaran"
-            print(f"{cat['id']:3d} | {type_name:12} | {cat['name']}")
+            print(f"{cat['id']:3d} | {type_name:12} | {format_category_name(cat)}")
         
         print("=" * 60)
         
@@ -723,7 +850,8 @@ class PyMoneyApp:
                     if self.db.delete_category(category_id):
                         print("✅ Kategori berhasil dihapus!")
                     else:
-                        print("❌ Gagal menghapus kategori! Kategori masih digunakan dalam transaksi.")
+                        print("❌ Gagal menghapus kategori! Kategori masih digunakan dalam transaksi "
+                              "atau masih punya subkategori.")
                 else:
                     print("❌ Penghapusan dibatalkan.")
                 
@@ -731,13 +859,143 @@ class PyMoneyApp:
         
         input("\nTekan Enter untuk melanjutkan...")
     
+    def tag_summary(self):
+        """Menampilkan total pemasukan dan pengeluaran per tag"""
+        clear_screen()
+        print_header("🔖 RINGKASAN TAG")
+        
+        tags = self.db.get_tag_totals()
+        if not tags:
+            print("\n📭 Belum ada tag. Tag bisa diisi saat menambah transaksi.")
+        else:
+            print(f"\n{'Tag':20} {'Transaksi':>9} {'Pemasukan':>18} {'Pengeluaran':>18}")
+            print("-" * 68)
+            for row in tags:
+                print(f"{row['name']:20} {row['count']:>9,} {format_currency(row['income']):>18} "
+                      f"{format_currency(row['expense']):>18}")
+        
+        input("\nTekan Enter untuk melanjutkan...")
+    
+    def category_rules(self):
+        """Melihat, menambah, dan menghapus aturan kategori otomatis"""
+        while True:
+            clear_screen()
+            print_header("🤖 ATURAN KATEGORI OTOMATIS")
+            
+            rules = self.db.get_category_rules()
+            if not rules:
+                print("\n📭 Belum ada aturan. Tambahkan aturan dulu agar transaksi tanpa")
+                print("   kategori bisa dikategorikan otomatis berdasarkan deskripsi dan jumlahnya.")
+            else:
+                print(f"\n{'ID':>4} | {'Jenis':7} | {'Pola':25} | {'Jumlah':31} | Kategori")
+                print("-" * 84)
+                for rule in rules:
+                    low = format_currency(rule['min_amount']) if rule['min_amount'] is not None else ''
+                    high = format_currency(rule['max_amount']) if rule['max_amount'] is not None else ''
+                    amount = f"{low}..{high}" if low or high else '-'
+                    print(f"{rule['id']:4d} | {rule['kind']:7} | {(rule['pattern'] or '-')[:25]:25} | "
+                          f"{amount[:31]:31} | {rule['category_name']}")
+            
+            print("\n1. ➕ Tambah Aturan")
+            print("2. 🗑️  Hapus Aturan")
+            print("\nq. ↩️  Kembali")
+            choice = input("\nPilih [1-2, q]: ").strip().lower()
+            
+            if choice == '1':
+                self.add_category_rule()
+            elif choice == '2':
+                rule_id = input("\nID aturan yang akan dihapus: ").strip()
+                if rule_id.isdigit() and self.db.delete_category_rule(int(rule_id)):
+                    print("✅ Aturan berhasil dihapus!")
+                else:
+                    print("❌ ID tidak ditemukan!")
+                input("\nTekan Enter untuk melanjutkan...")
+            elif choice == 'q':
+                break
+    
+    def add_category_rule(self):
+        """Menambah satu aturan kategori otomatis"""
+        print("\n📋 Jenis Aturan:")
+        print("1. 🔤 Keyword (frasa di deskripsi)")
+        print("2. 🧩 Regex (ekspresi reguler)")
+        print("3. 💰 Rentang jumlah saja")
+        kind = {'1': 'keyword', '2': 'regex', '3': 'amount'}.get(input("\nPilih jenis [1-3]: ").strip())
+        if kind is None:
+            print("❌ Pilihan tidak valid!")
+            input("\nTekan Enter untuk melanjutkan...")
+            return
+        
+        pattern = input("\n🔤 Pola: ").strip() if kind != 'amount' else None
+        min_amount = validate_amount(input("\n💰 Jumlah minimum (opsional): Rp").strip())
+        max_amount = validate_amount(input("💰 Jumlah maksimum (opsional): Rp").strip())
+        
+        categories = self.db.get_all_categories()
+        print("\n🏷️  Kategori tujuan:")
+        for i, cat in enumerate(categories, 1):
+            type_name = "Pemasukan" if cat['type'] == 'income' else "Pengeluaran"
+            print(f"{i}. {cat['name']} ({type_name})")
+        category = self._choose_category(categories)
+        
+        try:
+            rule_id = add_rule(self.db, kind, pattern, category['id'], min_amount, max_amount)
+            print(f"\n✅ Aturan berhasil ditambahkan! (ID: {rule_id})")
+        except ValueError as e:
+            print(f"\n❌ {e}")
+        input("\nTekan Enter untuk melanjutkan...")
+    
     # ===== BALANCE MENU =====
     def balance_menu(self):
-        """Menu untuk melihat balance dan ringkasan"""
+        """Menu untuk melihat balance, ringkasan, dan riwayat saldo"""
+        while True:
+            clear_screen()
+            print_header("📊 MENU BALANCE & RINGKASAN")
+            print("\n📋 Pilihan:")
+            print("1. 📊 Ringkasan Keuangan")
+            print("2. 📅 Saldo per Tanggal")
+            print("3. 📈 Riwayat Saldo")
+            print("4. 🔮 Proyeksi Saldo")
+            print("5. 📐 Statistik Pengeluaran")
+            print("6. 🚨 Pengeluaran Tidak Biasa")
+            print("7. 🏪 Merchant Teratas")
+            print("\nq. ↩️  Kembali ke Menu Utama")
+            print("=" * 60)
+            
+            choice = input("\nPilih [1-7, q]: ").strip().lower()
+            
+            if choice == '1':
+                self.balance_summary()
+            elif choice == '2':
+                self.balance_as_of()
+            elif choice == '3':
+                self.balance_history()
+            elif choice == '4':
+                self.balance_forecast()
+            elif choice == '5':
+                self.spending_statistics()
+            elif choice == '6':
+                self.unusual_expenses()
+            elif choice == '7':
+                self.top_merchants()
+            elif choice == 'q':
+                break
+            else:
+                print("❌ Pilihan tidak valid!")
+                input("Tekan Enter untuk melanjutkan...")
+    
+    def balance_summary(self):
+        """Menampilkan ringkasan saldo dan per kategori"""
         clear_screen()
         print_header("📊 BALANCE & RINGKASAN")
         
-        summary = self.db.get_balance_summary()
+        # Tingkat rincian kategori (hanya ditanya jika ada subkategori)
+        level = None
+        max_level = self.db.get_max_category_level()
+        if max_level > 0:
+            level_str = input(f"Level kategori [0-{max_level}, Enter untuk rincian penuh]: ").strip()
+            if level_str.isdigit():
+                level = min(int(level_str), max_level)
+        
+        summary = self.db.get_balance_summary(level)
         
         # Ringkasan utama
         print("\n💰 RINGKASAN KEUANGAN")
@@ -781,13 +1039,397 @@ class PyMoneyApp:
                 print("  (Tidak ada data pengeluaran)")
         
         print("\n" + "=" * 60)
-        input("\nTekan Enter untuk kembali ke menu utama...")
+        input("\nTekan Enter untuk melanjutkan...")
+    
+    def balance_as_of(self):
+        """Menampilkan saldo pada tanggal tertentu"""
+        clear_screen()
+        print_header("📅 SALDO PER TANGGAL")
+        
+        today = datetime.now().strftime("%Y-%m-%d")
+        while True:
+            date_str = input(f"\n📅 Tanggal (YYYY-MM-DD) [{today}]: ").strip() or today
+            if validate_date(date_str):
+                break
+            print("❌ Format tanggal tidak valid! Gunakan format YYYY-MM-DD")
+        
+        balance = self.db.get_balance_as_of(date_str)
+        print(f"\nSaldo pada akhir {format_date(date_str)}: {format_currency(balance)}")
+        input("\nTekan Enter untuk melanjutkan...")
+    
+    def balance_history(self):
+        """Menampilkan riwayat saldo bulanan atau harian"""
+        clear_screen()
+        print_header("📈 RIWAYAT SALDO")
+        
+        print("\n1. Bulanan")
+        print("2. Harian")
+        mode = input("\nPilih [1-2]: ").strip()
+        
+        if mode == '2':
+            end = datetime.now()
+            default_start = end.replace(day=1).strftime("%Y-%m-%d")
+            start_date = input(f"\n📅 Dari tanggal [{default_start}]: ").strip() or default_start
+            end_date = input(f"📅 Sampai tanggal [{end.strftime('%Y-%m-%d')}]: ").strip() or end.strftime("%Y-%m-%d")
+            if not (validate_date(start_date) and validate_date(end_date)) or start_date > end_date:
+                print("❌ Rentang tanggal tidak valid!")
+                input("\nTekan Enter untuk melanjutkan...")
+                return
+            
+            print(f"\n{'Tanggal':12} {'Perubahan':>18} {'Saldo':>18}")
+            print("-" * 50)
+            for row in self.db.get_daily_balance_series(start_date, end_date):
+                print(f"{format_date(row['date']):12} {format_currency(row['net']):>18} "
+                      f"{format_currency(row['balance']):>18}")
+        else:
+            rows = self.db.get_monthly_balance_series()
+            if not rows:
+                print("\n📭 Belum ada transaksi.")
+            else:
+                print(f"\n{'Bulan':8} {'Pemasukan':>16} {'Pengeluaran':>16} {'Saldo':>18}")
+                print("-" * 60)
+                for row in rows:
+                    print(f"{row['period']:8} {format_currency(row['income']):>16} "
+                          f"{format_currency(row['expense']):>16} {format_currency(row['balance']):>18}")
+        
+        input("\nTekan Enter untuk melanjutkan...")
+    
+    def balance_forecast(self):
+        """Menampilkan proyeksi saldo beberapa bulan ke depan"""
+        from forecast import Forecaster
+        
+        clear_screen()
+        print_header("🔮 PROYEKSI SALDO")
+        
+        months_str = input("\nJumlah bulan ke depan (3-12) [6]: ").strip() or "6"
+        months = int(months_str) if months_str.isdigit() else 6
+        months = min(max(months, 3), 12)
+        
+        points = Forecaster(self.db).forecast(months)
+        print(f"\n{'Bulan':8} {'Pemasukan':>16} {'Pengeluaran':>16} {'Saldo':>18}")
+        print("-" * 60)
+        for point in points:
+            warning = " ⚠️" if point.balance < 0 else ""
+            print(f"{point.period:8} {format_currency(point.income):>16} "
+                  f"{format_currency(point.expense):>16} {format_currency(point.balance):>18}{warning}")
+        print("\n* Proyeksi berdasarkan tren & pola musiman total bulanan tiap kategori.")
+        
+        input("\nTekan Enter untuk melanjutkan...")
+    
+    def spending_statistics(self):
+        """Menampilkan median, p90, dan p99 pengeluaran per kategori"""
+        from spending_stats import SpendingStats, distribution
+        
+        clear_screen()
+        print_header("📐 STATISTIK PENGELUARAN")
+        
+        this_month = datetime.now().strftime("%Y-%m")
+        start = input(f"\n📅 Dari bulan (YYYY-MM) [{this_month}, 'semua' untuk semua data]: ").strip()
+        if start.lower() == 'semua':
+            start, end = None, None
+        else:
+            start = start or this_month
+            end = input(f"📅 Sampai bulan (YYYY-MM) [{start}]: ").strip() or start
+            if not (validate_date(start + '-01') and validate_date(end + '-01')) or start > end:
+                print("❌ Format bulan tidak valid! Gunakan format YYYY-MM")
+                input("\nTekan Enter untuk melanjutkan...")
+                return
+        
+        rows, total = SpendingStats(self.db).by_category('expense', start, end)
+        if total is None:
+            print("\n📭 Tidak ada pengeluaran pada periode ini.")
+            input("\nTekan Enter untuk melanjutkan...")
+            return
+        
+        print(f"\n{'Kategori':15} {'Transaksi':>9} {'Median':>15} {'P90':>15} {'P99':>15}")
+        print("-" * 72)
+        for stats in rows + [total]:
+            if stats is total:
+                print("-" * 72)
+            print(f"{stats.category_name[:15]:15} {stats.count:>9,} "
+                  f"{format_currency(stats.quantiles[0.5]):>15} {format_currency(stats.quantiles[0.9]):>15} "
+                  f"{format_currency(stats.quantiles[0.99]):>15}")
+        
+        # Sebaran jumlah pengeluaran (skala logaritmik)
+        print("\n📊 SEBARAN JUMLAH PENGELUARAN")
+        histogram = distribution(total.sketch)
+        peak = max(count for _, _, count in histogram) or 1
+        for low, high, count in histogram:
+            bar = "█" * round(count / peak * 30)
+            print(f"  {format_currency(low):>15} - {format_currency(high):>15} {count:>9,} {bar}")
+        print("\n(Estimasi dari sketch, galat relatif maksimal ±1%)")
+        
+        input("\nTekan Enter untuk melanjutkan...")
+    
+    def unusual_expenses(self):
+        """Menampilkan pengeluaran yang jumlahnya jauh di atas kebiasaan kategorinya"""
+        clear_screen()
+        print_header("🚨 PENGELUARAN TIDAK BIASA")
+        
+        rows = self.db.get_anomalies(limit=30)
+        if not rows:
+            print("\n✅ Tidak ada pengeluaran yang tidak biasa.")
+        else:
+            print(f"\n{'ID':>6} {'Tanggal':12} {'Kategori':15} {'Jumlah':>18} {'Biasanya':>18}")
+            print("-" * 72)
+            for row in rows:
+                print(f"{row['id']:6d} {format_date(row['date']):12} {row['category_name'][:15]:15} "
+                      f"{format_currency(row['amount']):>18} "
+                      f"{format_currency(typical_amount(row['log_mean'])):>18}")
+                if row['description']:
+                    print(f"{'':7}📝 {row['description']}")
+        
+        input("\nTekan Enter untuk melanjutkan...")
+    
+    def top_merchants(self):
+        """Menampilkan merchant dengan pengeluaran terbesar pada satu periode"""
+        from merchants import MerchantReport
+        
+        clear_screen()
+        print_header("🏪 MERCHANT TERATAS")
+        
+        period = input("Periode [YYYY-MM atau YYYY, Enter untuk semua]: ").strip()
+        start_date = end_date = None
+        if period:
+            try:
+                if len(period) == 4:
+                    datetime.strptime(period, "%Y")
+                    start_date, end_date = f"{period}-01-01", f"{period}-12-31"
+                else:
+                    datetime.strptime(period, "%Y-%m")
+                    start_date, end_date = f"{period}-01", f"{period}-31"
+            except ValueError:
+                print("❌ Format periode tidak valid!")
+                input("\nTekan Enter untuk melanjutkan...")
+                return
+        
+        by = 'count' if input("Urutkan menurut [1] total atau [2] frekuensi (default 1): ").strip() == '2' else 'total'
+        rows = MerchantReport(self.db).top(10, 'expense', start_date, end_date, by)
+        if not rows:
+            print("\n📭 Tidak ada pengeluaran pada periode ini.")
+        else:
+            print(f"\n{'#':>3} {'Merchant':25} {'Transaksi':>10} {'Total':>20}")
+            print("-" * 61)
+            for rank, row in enumerate(rows, 1):
+                print(f"{rank:3d} {row.merchant[:25]:25} {row.count:>10,} "
+                      f"{format_currency(row.total):>20}")
+        
+        input("\nTekan Enter untuk melanjutkan...")
+    
+    # ===== BUDGET MENU =====
+    def budget_menu(self):
+        """Menu untuk mengelola budget bulanan"""
+        while True:
+            clear_screen()
+            print_header("🎯 MENU BUDGET")
+            print("\n📋 Pilihan:")
+            print("1. 📊 Status Budget")
+            print("2. ✏️  Atur Budget")
+            print("3. 🗑️  Hapus Budget")
+            print("\nq. ↩️  Kembali ke Menu Utama")
+            print("=" * 60)
+            
+            choice = input("\nPilih [1-3, q]: ").strip().lower()
+            
+            if choice == '1':
+                self.budget_status()
+            elif choice == '2':
+                self.set_budget()
+            elif choice == '3':
+                self.delete_budget()
+            elif choice == 'q':
+                break
+            else:
+                print("❌ Pilihan tidak valid!")
+                input("Tekan Enter untuk melanjutkan...")
+    
+    def budget_status(self):
+        """Menampilkan status budget bulan ini"""
+        clear_screen()
+        period = datetime.now().strftime("%Y-%m")
+        print_header(f"📊 STATUS BUDGET ({period})")
+        
+        statuses = [BudgetStatus.from_db_row(row) for row in self.db.get_budget_status(period)]
+        
+        if not statuses:
+            print("\n📭 Belum ada budget. Atur budget terlebih dahulu.")
+        else:
+            print(f"\n{'Kategori':15} {'Budget':>15} {'Terpakai':>15} {'Sisa':>15}")
+            print("-" * 70)
+            for status in statuses:
+                bar = "█" * min(int(status.usage * 20), 20)  # 5% per karakter
+                if status.is_over:
+                    flag = "⛔"
+                elif status.is_alert:
+                    flag = "⚠️"
+                else:
+                    flag = "✅"
+                print(f"{status.category_name:15} {format_currency(status.budget):>15} "
+                      f"{format_currency(status.spent):>15} {format_currency(status.remaining):>15}")
+                print(f"  {bar:20} {status.usage * 100:5.1f}% {flag}")
+        
+        input("\nTekan Enter untuk melanjutkan...")
+    
+    def set_budget(self):
+        """Mengatur budget bulanan sebuah kategori pengeluaran"""
+        clear_screen()
+        print_header("✏️  ATUR BUDGET")
+        
+        categories = self.db.get_all_categories(type_filter='expense')
+        if not categories:
+            print("\n❌ Tidak ada kategori pengeluaran.")
+            input("\nTekan Enter untuk melanjutkan...")
+            return
+        
+        print("\n🏷️  Kategori Pengeluaran yang tersedia:")
+        for i, cat in enumerate(categories, 1):
+            print(f"{i}. {cat['name']}")
+        
+        while True:
+            try:
+                cat_idx = int(input(f"\nPilih kategori [1-{len(categories)}]: "))
+                if 1 <= cat_idx <= len(categories):
+                    category = categories[cat_idx-1]
+                    break
+                else:
+                    print("❌ Pilihan tidak valid!")
+            except ValueError:
+                print("❌ Masukkan angka yang valid!")
+        
+        while True:
+            amount = validate_amount(input("\n💰 Budget per bulan: Rp").strip())
+            if amount is not None:
+                break
+            print("❌ Jumlah tidak valid! Masukkan angka positif.")
+        
+        while True:
+            threshold_str = input("\n⚠️  Peringatan saat terpakai (%) [80]: ").strip() or "80"
+            threshold = validate_amount(threshold_str)
+            if threshold is not None and threshold <= 100:
+                break
+            print("❌ Persentase tidak valid! Masukkan angka 1-100.")
+        
+        self.db.set_budget(category['id'], amount, threshold / 100)
+        print(f"\n✅ Budget {category['name']} diatur ke {format_currency(amount)} per bulan.")
+        input("\nTekan Enter untuk melanjutkan...")
+    
+    def delete_budget(self):
+        """Menghapus budget sebuah kategori"""
+        clear_screen()
+        print_header("🗑️  HAPUS BUDGET")
+        
+        statuses = [BudgetStatus.from_db_row(row) for row in self.db.get_budget_status()]
+        if not statuses:
+            print("\n📭 Belum ada budget.")
+            input("\nTekan Enter untuk melanjutkan...")
+            return
+        
+        print("\nID  | Kategori        | Budget")
+        print("-" * 40)
+        for status in statuses:
+            print(f"{status.category_id:3d} | {status.category_name:15} | {format_currency(status.budget)}")
+        
+        choice = input("\nMasukkan ID kategori (atau 'b' untuk batal): ").strip().lower()
+        if choice.isdigit() and confirm_action("Yakin ingin menghapus budget ini?"):
+            if self.db.delete_budget(int(choice)):
+                print("✅ Budget berhasil dihapus!")
+            else:
+                print("❌ Budget tidak ditemukan!")
+        
+        input("\nTekan Enter untuk melanjutkan...")
+    
+    def show_budget_alert(self, category_id: int, period: str):
+        """Menampilkan peringatan jika pengeluaran mendekati/melewati budget"""
+        # Budget kategori ini dan budget kategori induknya
+        for row in self.db.get_budget_status(period, category_id=category_id):
+            status = BudgetStatus.from_db_row(row)
+            if status.is_over:
+                print(f"⛔ Budget {status.category_name} ({period}) terlampaui! "
+                      f"Terpakai {format_currency(status.spent)} dari {format_currency(status.budget)}.")
+            elif status.is_alert:
+                print(f"⚠️  Budget {status.category_name} ({period}) sudah terpakai {status.usage * 100:.0f}%. "
+                      f"Sisa {format_currency(status.remaining)}.")
+    
+    def show_anomaly_alert(self, transaction_id: int):
+        """Menampilkan peringatan jika jumlah pengeluaran jauh di atas kebiasaan kategorinya"""
+        for row in self.db.get_anomalies(min_id=transaction_id, limit=1):
+            print(f"🚨 Jumlah ini tidak biasa untuk {row['category_name']}: biasanya sekitar "
+                  f"{format_currency(typical_amount(row['log_mean']))}. Cek lagi apakah tertagih dua kali.")
+    
+    # ===== LEDGER MENU =====
+    def ledger_menu(self):
+        """Menu untuk memilih dan membuat ledger"""
+        registry = self.router.registry
+        while True:
+            clear_screen()
+            print_header("📚 MENU LEDGER")
+            
+            names = registry.names()
+            print("\n📜 Daftar Ledger:")
+            for i, name in enumerate(names, 1):
+                marker = ">" if name == self.ledger else " "
+                default = " (default)" if name == registry.default else ""
+                print(f"{marker}{i:3d}. {name:20} {registry.get_path(name)}{default}")
+            
+            print("\n📋 Pilihan:")
+            print("[nomor]. 🔀 Pindah ke ledger")
+            print("n. ➕ Buat Ledger Baru")
+            print("d. ⭐ Jadikan ledger aktif sebagai default")
+            print("\nq. ↩️  Kembali ke Menu Utama")
+            print("=" * 60)
+            
+            choice = input("\nPilih [nomor, n, d, q]: ").strip().lower()
+            
+            if choice.isdigit() and 1 <= int(choice) <= len(names):
+                self.switch_ledger(names[int(choice)-1])
+            elif choice == 'n':
+                self.create_ledger()
+            elif choice == 'd':
+                registry.set_default(self.ledger)
+                print(f"✅ Ledger '{self.ledger}' dijadikan default.")
+                input("Tekan Enter untuk melanjutkan...")
+            elif choice == 'q':
+                break
+            else:
+                print("❌ Pilihan tidak valid!")
+                input("Tekan Enter untuk melanjutkan...")
+    
+    def switch_ledger(self, name: str):
+        """Mengganti ledger aktif"""
+        self.db = self.router.get(name)
+        self.ledger = name
+    
+    def create_ledger(self):
+        """Membuat ledger baru dan langsung memakainya"""
+        name = input("\n📚 Nama ledger baru: ").strip()
+        try:
+            path = self.router.registry.create(name)
+        except ValueError as e:
+            print(f"❌ {e}")
+        else:
+            self.switch_ledger(name)
+            print(f"✅ Ledger '{name}' dibuat di {path} dan sekarang aktif.")
+        input("Tekan Enter untuk melanjutkan...")
 
 
-def main():
+def main(argv=None):
     """Fungsi utama untuk menjalankan aplikasi"""
+    argv = sys.argv[1:] if argv is None else argv
+    ledger = None
+    in_memory = False
+    if argv:
+        # Parser CLI (dan argparse) hanya dimuat jika ada argumen
+        from cli import build_parser
+        
+        args = build_parser().parse_args(argv)
+        ledger = args.ledger
+        in_memory = args.in_memory
+    
     try:
-        app = PyMoneyApp()
+        if argv and args.command:
+            from cli import run
+            sys.exit(run(args))
+        app = PyMoneyApp(ledger=ledger, router=LedgerRouter(in_memory=in_memory))
         app.run()
     except KeyboardInterrupt:
         print("\n\n👋 Program dihentikan oleh user.")
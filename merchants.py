@@ -0,0 +1,126 @@
+"""
+Laporan merchant teratas: ke mana sebenarnya uang pergi
+
+Setiap transaksi punya kunci merchant ternormalisasi (`utils.merchant_key`,
+kolom `transactions.merchant`) sehingga "QRIS INDOMARET 1234" dan
+"Indomaret 88" dihitung sebagai merchant yang sama.
+
+Dua mode:
+- eksak     : GROUP BY di SQLite lewat index covering (type, date,
+              merchant, amount); memori sebanding jumlah merchant berbeda.
+- perkiraan : satu kali baca dengan sketch Space-Saving berkapasitas tetap
+              `capacity`. Setiap merchant yang bobotnya di atas
+              total/capacity pasti muncul, dan estimasinya paling banyak
+              kelebihan sebesar `error` (<= total/capacity). Memori tetap
+              berapa pun jumlah transaksi dan merchant-nya, cocok untuk
+              ledger yang sangat besar atau aliran data di luar database.
+"""
+import heapq
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from database import Database
+
+ORDER_BY = ('total', 'count')
+
+
+@dataclass
+class MerchantTotal:
+    """Satu baris laporan merchant"""
+    merchant: str
+    total: float
+    count: int
+    error: float = 0.0  # Batas kelebihan estimasi nilai pengurut (mode perkiraan)
+
+
+class SpaceSaving:
+    """Sketch heavy hitter Space-Saving (Metwally dkk.) dengan bobot.
+
+    Menyimpan paling banyak `capacity` counter. Key baru saat penuh
+    menggantikan counter terkecil dan mewarisi nilainya sebagai batas galat.
+    Counter terkecil dicari lewat min-heap yang diperbarui secara malas:
+    entri heap boleh lebih kecil dari nilai counter sebenarnya (counter
+    hanya bertambah) dan baru dibetulkan saat muncul di puncak heap.
+    """
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError("Kapasitas sketch minimal 1")
+        self.capacity = capacity
+        self.counts: Dict[str, float] = {}
+        self.errors: Dict[str, float] = {}
+        self.total = 0.0
+        self._heap: List[Tuple[float, str]] = []
+
+    def add(self, key: str, weight: float = 1.0) -> Optional[str]:
+        """Menambah bobot sebuah key, mengembalikan key yang tergusur (jika ada)"""
+        self.total += weight
+        counts = self.counts
+        if key in counts:
+            counts[key] += weight
+            return None
+        if len(counts) < self.capacity:
+            counts[key] = weight
+            self.errors[key] = 0.0
+            heapq.heappush(self._heap, (weight, key))
+            return None
+
+        heap = self._heap
+        while heap[0][0] != counts[heap[0][1]]:
+            heapq.heapreplace(heap, (counts[heap[0][1]], heap[0][1]))
+        minimum, evicted = heap[0]
+        heapq.heapreplace(heap, (minimum + weight, key))
+        del counts[evicted], self.errors[evicted]
+        counts[key] = minimum + weight
+        self.errors[key] = minimum
+        return evicted
+
+    def top(self, n: int) -> List[Tuple[str, float, float]]:
+        """n key terbesar sebagai (key, estimasi, batas galat), seri diurutkan per key"""
+        ranked = sorted(self.counts.items(), key=lambda item: (-item[1], item[0]))
+        return [(key, count, self.errors[key]) for key, count in ranked[:n]]
+
+
+class MerchantReport:
+    """Merchant teratas per total pengeluaran atau frekuensi"""
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    def top(self, n: int = 10, type_: str = 'expense', start_date: Optional[str] = None,
+            end_date: Optional[str] = None, order_by: str = 'total', approximate: bool = False,
+            capacity: Optional[int] = None) -> List[MerchantTotal]:
+        """`n` merchant teratas dalam rentang tanggal (inklusif).
+
+        `capacity` (mode perkiraan) default 20 x n, minimal 200.
+        """
+        if order_by not in ORDER_BY:
+            raise ValueError(f"Urutan tidak dikenal: {order_by}")
+        if not approximate:
+            return [MerchantTotal(row['merchant'], row['total'], row['count'])
+                    for row in self.db.get_top_merchants(type_, start_date, end_date, order_by, n)]
+        rows = ((row[0], row[1]) for row in self.db.iter_merchant_amounts(type_, start_date, end_date))
+        return approximate_top(rows, n, order_by, capacity or max(20 * n, 200))
+
+
+def approximate_top(rows: Iterable[Tuple[str, float]], n: int, order_by: str = 'total',
+                    capacity: int = 200) -> List[MerchantTotal]:
+    """Merchant teratas dari aliran (merchant, amount) dalam satu kali baca.
+
+    Nilai pengurut (total atau count) adalah estimasi Space-Saving; nilai
+    lainnya dihitung sejak merchant terakhir kali masuk sketch, jadi bisa
+    lebih kecil dari sebenarnya.
+    """
+    sketch = SpaceSaving(capacity)
+    other: Dict[str, float] = {}
+    by_total = order_by == 'total'
+    for merchant, amount in rows:
+        evicted = sketch.add(merchant, amount if by_total else 1.0)
+        if evicted is not None:
+            del other[evicted]
+        other[merchant] = other.get(merchant, 0.0) + (1.0 if by_total else amount)
+    if by_total:
+        return [MerchantTotal(merchant, total, int(other[merchant]), error)
+                for merchant, total, error in sketch.top(n)]
+    return [MerchantTotal(merchant, other[merchant], int(count), error)
+            for merchant, count, error in sketch.top(n)]
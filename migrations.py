@@ -0,0 +1,682 @@
+"""
+Migrasi skema database py-money
+
+Versi skema disimpan di `PRAGMA user_version`. Saat database dibuka,
+`migrate()` hanya membaca versi tersebut; jika sudah terbaru tidak ada DDL
+maupun seeding yang dijalankan. Jika belum, migrasi yang tertinggal
+dijalankan berurutan, masing-masing dalam transaksinya sendiri.
+
+Menambah perubahan skema: tulis fungsi baru dengan decorator `@migration`
+dan nomor versi berikutnya. Jangan mengubah migrasi yang sudah dirilis.
+"""
+import hashlib
+import socket
+import sqlite3
+from typing import Callable, List, NamedTuple
+
+import anomaly
+from utils import SKETCH_ZERO_BUCKET, amount_bucket, merchant_key, transaction_fingerprint
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable[[sqlite3.Cursor], None]
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, description: str):
+    """Decorator untuk mendaftarkan fungsi migrasi"""
+    def register(func: Callable[[sqlite3.Cursor], None]):
+        if MIGRATIONS and MIGRATIONS[-1].version != version - 1:
+            raise ValueError(f"Versi migrasi harus berurutan (dapat {version})")
+        MIGRATIONS.append(Migration(version, description, func))
+        return func
+    return register
+
+
+def get_version(conn: sqlite3.Connection) -> int:
+    """Membaca versi skema database"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def latest_version() -> int:
+    """Versi skema terbaru yang dikenal aplikasi"""
+    return MIGRATIONS[-1].version if MIGRATIONS else 0
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Menjalankan migrasi yang belum diterapkan, mengembalikan jumlahnya"""
+    target = latest_version()
+    if get_version(conn) >= target:
+        return 0  # Jalur cepat: skema sudah terbaru
+
+    applied = 0
+    for step in MIGRATIONS:
+        # BEGIN IMMEDIATE mengunci database, lalu versi dicek ulang agar dua
+        # proses yang start bersamaan tidak menjalankan migrasi yang sama
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if get_version(conn) >= step.version:
+                conn.rollback()
+                continue
+            step.apply(conn.cursor())
+            conn.execute(f'PRAGMA user_version = {step.version:d}')
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        applied += 1
+    return applied
+
+
+# ===== DAFTAR MIGRASI =====
+# Semua DDL memakai IF NOT EXISTS agar database lama (sebelum ada
+# user_version) bisa dimigrasikan tanpa error.
+
+@migration(1, "Tabel kategori dan transaksi, kategori default")
+def _initial_schema(cursor: sqlite3.Cursor):
+    # Tabel kategori
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS categories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            type TEXT NOT NULL CHECK(type IN ('income', 'expense')),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Tabel transaksi
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            type TEXT NOT NULL CHECK(type IN ('income', 'expense')),
+            amount REAL NOT NULL CHECK(amount >= 0),
+            category_id INTEGER NOT NULL,
+            description TEXT,
+            date TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE RESTRICT
+        )
+    ''')
+
+    # Insert kategori default jika belum ada
+    default_categories = [
+        ('Gaji', 'income'),
+        ('Investasi', 'income'),
+        ('Hadiah', 'income'),
+        ('Makanan', 'expense'),
+        ('Transportasi', 'expense'),
+        ('Hiburan', 'expense'),
+        ('Tagihan', 'expense'),
+    ]
+    cursor.executemany(
+        'INSERT OR IGNORE INTO categories (name, type) VALUES (?, ?)',
+        default_categories
+    )
+
+
+@migration(2, "Budget bulanan dan agregat bulanan per kategori")
+def _budgets(cursor: sqlite3.Cursor):
+    # Tabel budget bulanan per kategori pengeluaran
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS budgets (
+            category_id INTEGER PRIMARY KEY,
+            amount REAL NOT NULL CHECK(amount > 0),
+            alert_threshold REAL NOT NULL DEFAULT 0.8
+                CHECK(alert_threshold > 0 AND alert_threshold <= 1),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE CASCADE
+        )
+    ''')
+
+    # Agregat bulanan per kategori, dijaga oleh trigger pada setiap
+    # penulisan transaksi sehingga tidak perlu scan tabel transaksi
+    cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'category_monthly_totals'"
+    )
+    totals_exist = cursor.fetchone() is not None
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS category_monthly_totals (
+            category_id INTEGER NOT NULL,
+            period TEXT NOT NULL,
+            total REAL NOT NULL DEFAULT 0,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (category_id, period)
+        ) WITHOUT ROWID
+    ''')
+    if not totals_exist:
+        # Isi awal dari data lama (hanya sekali saat tabel dibuat)
+        cursor.execute('''
+            INSERT INTO category_monthly_totals (category_id, period, total, count)
+            SELECT category_id, substr(date, 1, 7), SUM(amount), COUNT(*)
+            FROM transactions
+            GROUP BY category_id, substr(date, 1, 7)
+        ''')
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_monthly_totals_insert
+        AFTER INSERT ON transactions
+        BEGIN
+            INSERT INTO category_monthly_totals (category_id, period, total, count)
+            VALUES (NEW.category_id, substr(NEW.date, 1, 7), NEW.amount, 1)
+            ON CONFLICT (category_id, period) DO UPDATE
+            SET total = total + excluded.total, count = count + 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_monthly_totals_delete
+        AFTER DELETE ON transactions
+        BEGIN
+            UPDATE category_monthly_totals
+            SET total = total - OLD.amount, count = count - 1
+            WHERE category_id = OLD.category_id AND period = substr(OLD.date, 1, 7);
+            DELETE FROM category_monthly_totals
+            WHERE category_id = OLD.category_id AND period = substr(OLD.date, 1, 7)
+              AND count <= 0;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_monthly_totals_update
+        AFTER UPDATE OF amount, category_id, date ON transactions
+        BEGIN
+            UPDATE category_monthly_totals
+            SET total = total - OLD.amount, count = count - 1
+            WHERE category_id = OLD.category_id AND period = substr(OLD.date, 1, 7);
+            DELETE FROM category_monthly_totals
+            WHERE category_id = OLD.category_id AND period = substr(OLD.date, 1, 7)
+              AND count <= 0;
+            INSERT INTO category_monthly_totals (category_id, period, total, count)
+            VALUES (NEW.category_id, substr(NEW.date, 1, 7), NEW.amount, 1)
+            ON CONFLICT (category_id, period) DO UPDATE
+            SET total = total + excluded.total, count = count + 1;
+        END
+    ''')
+
+
+@migration(3, "Index filter dan sort transaksi")
+def _transaction_indexes(cursor: sqlite3.Cursor):
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions(date)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_type_date ON transactions(type, date)')
+    cursor.execute(
+        'CREATE INDEX IF NOT EXISTS idx_transactions_category_date ON transactions(category_id, date)'
+    )
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_amount ON transactions(amount)')
+
+
+@migration(4, "Cache parameter model proyeksi per kategori")
+def _forecast_models(cursor: sqlite3.Cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS forecast_models (
+            category_id INTEGER PRIMARY KEY,
+            intercept REAL NOT NULL,
+            slope REAL NOT NULL,
+            seasonal TEXT NOT NULL,
+            fitted_through TEXT NOT NULL,
+            stale INTEGER NOT NULL DEFAULT 0,
+            fitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Model hanya ditandai basi saat agregat bulanan kategorinya berubah;
+    # refit dilakukan nanti, hanya untuk kategori yang basi
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_forecast_stale_insert
+        AFTER INSERT ON category_monthly_totals
+        BEGIN
+            UPDATE forecast_models SET stale = 1 WHERE category_id = NEW.category_id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_forecast_stale_update
+        AFTER UPDATE ON category_monthly_totals
+        BEGIN
+            UPDATE forecast_models SET stale = 1 WHERE category_id = NEW.category_id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_forecast_stale_delete
+        AFTER DELETE ON category_monthly_totals
+        BEGIN
+            UPDATE forecast_models SET stale = 1 WHERE category_id = OLD.category_id;
+        END
+    ''')
+
+
+def _add_column(cursor: sqlite3.Cursor, table: str, column: str, definition: str):
+    """ALTER TABLE ADD COLUMN yang aman dijalankan ulang"""
+    cursor.execute(f'PRAGMA table_info({table})')
+    if column not in {row[1] for row in cursor.fetchall()}:
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+
+@migration(5, "Fingerprint transaksi untuk deteksi duplikat")
+def _transaction_fingerprints(cursor: sqlite3.Cursor):
+    _add_column(cursor, 'transactions', 'fingerprint', 'TEXT')
+    _add_column(cursor, 'transactions', 'duplicate_of', 'INTEGER')
+
+    # Isi fingerprint transaksi lama memakai fungsi Python yang sama
+    cursor.connection.create_function('pm_fingerprint', 4, transaction_fingerprint, deterministic=True)
+    cursor.execute('''
+        UPDATE transactions
+        SET fingerprint = pm_fingerprint(date, amount, description, category_id)
+        WHERE fingerprint IS NULL
+    ''')
+    cursor.execute(
+        'CREATE INDEX IF NOT EXISTS idx_transactions_fingerprint ON transactions(fingerprint)'
+    )
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transactions_duplicate_of
+        ON transactions(duplicate_of) WHERE duplicate_of IS NOT NULL
+    ''')
+
+
+@migration(6, "Kategori bertingkat (parent) dengan closure table")
+def _category_hierarchy(cursor: sqlite3.Cursor):
+    _add_column(cursor, 'categories', 'parent_id', 'INTEGER REFERENCES categories(id)')
+    _add_column(cursor, 'categories', 'level', 'INTEGER NOT NULL DEFAULT 0')
+
+    # Satu baris untuk setiap pasangan (leluhur, keturunan), termasuk
+    # kategori itu sendiri (depth 0). Rollup ke level mana pun cukup satu
+    # join lewat index, tanpa menelusuri pohon secara rekursif.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS category_closure (
+            ancestor_id INTEGER NOT NULL,
+            descendant_id INTEGER NOT NULL,
+            depth INTEGER NOT NULL,
+            ancestor_level INTEGER NOT NULL,
+            PRIMARY KEY (ancestor_id, descendant_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_category_closure_descendant
+        ON category_closure(descendant_id, ancestor_level, ancestor_id)
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_categories_parent ON categories(parent_id)')
+
+    # Kategori lama semuanya berada di level teratas
+    cursor.execute('''
+        INSERT OR IGNORE INTO category_closure (ancestor_id, descendant_id, depth, ancestor_level)
+        SELECT id, id, 0, 0 FROM categories
+    ''')
+
+
+@migration(7, "Tag transaksi (many-to-many)")
+def _transaction_tags(cursor: sqlite3.Cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tags (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            usage INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Tabel penghubung tanpa rowid: primary key (transaction_id, tag_id)
+    # melayani "tag milik transaksi X", index (tag_id, transaction_id)
+    # melayani "transaksi dengan tag Y"; keduanya covering index
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transaction_tags (
+            transaction_id INTEGER NOT NULL,
+            tag_id INTEGER NOT NULL,
+            PRIMARY KEY (transaction_id, tag_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transaction_tags_tag
+        ON transaction_tags(tag_id, transaction_id)
+    ''')
+
+    # Jumlah pemakaian tag dijaga trigger, dipakai untuk memilih bentuk
+    # query filter tag tanpa menghitung ulang index
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_tag_usage_insert
+        AFTER INSERT ON transaction_tags
+        BEGIN
+            UPDATE tags SET usage = usage + 1 WHERE id = NEW.tag_id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_tag_usage_delete
+        AFTER DELETE ON transaction_tags
+        BEGIN
+            UPDATE tags SET usage = usage - 1 WHERE id = OLD.tag_id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_transaction_tags_delete
+        AFTER DELETE ON transactions
+        BEGIN
+            DELETE FROM transaction_tags WHERE transaction_id = OLD.id;
+        END
+    ''')
+
+
+@migration(8, "Sketch kuantil jumlah transaksi per kategori per bulan")
+def _amount_sketches(cursor: sqlite3.Cursor):
+    # Nomor bucket dihitung di Python saat insert/update (seperti fingerprint),
+    # lalu trigger menjaga histogram per (kategori, bulan, bucket)
+    _add_column(cursor, 'transactions', 'amount_bucket', 'INTEGER')
+    cursor.connection.create_function('pm_amount_bucket', 1, amount_bucket, deterministic=True)
+    cursor.execute('''
+        UPDATE transactions SET amount_bucket = pm_amount_bucket(amount)
+        WHERE amount_bucket IS NULL
+    ''')
+
+    cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'amount_sketches'"
+    )
+    sketches_exist = cursor.fetchone() is not None
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS amount_sketches (
+            category_id INTEGER NOT NULL,
+            period TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (category_id, period, bucket)
+        ) WITHOUT ROWID
+    ''')
+    if not sketches_exist:
+        cursor.execute('''
+            INSERT INTO amount_sketches (category_id, period, bucket, count)
+            SELECT category_id, substr(date, 1, 7), amount_bucket, COUNT(*)
+            FROM transactions
+            GROUP BY category_id, substr(date, 1, 7), amount_bucket
+        ''')
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_amount_sketches_insert
+        AFTER INSERT ON transactions
+        WHEN NEW.amount_bucket IS NOT NULL
+        BEGIN
+            INSERT INTO amount_sketches (category_id, period, bucket, count)
+            VALUES (NEW.category_id, substr(NEW.date, 1, 7), NEW.amount_bucket, 1)
+            ON CONFLICT (category_id, period, bucket) DO UPDATE SET count = count + 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_amount_sketches_delete
+        AFTER DELETE ON transactions
+        WHEN OLD.amount_bucket IS NOT NULL
+        BEGIN
+            UPDATE amount_sketches SET count = count - 1
+            WHERE category_id = OLD.category_id AND period = substr(OLD.date, 1, 7)
+              AND bucket = OLD.amount_bucket;
+            DELETE FROM amount_sketches
+            WHERE category_id = OLD.category_id AND period = substr(OLD.date, 1, 7)
+              AND bucket = OLD.amount_bucket AND count <= 0;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_amount_sketches_update
+        AFTER UPDATE OF amount, category_id, date, amount_bucket ON transactions
+        BEGIN
+            UPDATE amount_sketches SET count = count - 1
+            WHERE OLD.amount_bucket IS NOT NULL
+              AND category_id = OLD.category_id AND period = substr(OLD.date, 1, 7)
+              AND bucket = OLD.amount_bucket;
+            DELETE FROM amount_sketches
+            WHERE OLD.amount_bucket IS NOT NULL
+              AND category_id = OLD.category_id AND period = substr(OLD.date, 1, 7)
+              AND bucket = OLD.amount_bucket AND count <= 0;
+            INSERT INTO amount_sketches (category_id, period, bucket, count)
+            SELECT NEW.category_id, substr(NEW.date, 1, 7), NEW.amount_bucket, 1
+            WHERE NEW.amount_bucket IS NOT NULL
+            ON CONFLICT (category_id, period, bucket) DO UPDATE SET count = count + 1;
+        END
+    ''')
+
+
+@migration(9, "Statistik berjalan jumlah transaksi per kategori untuk deteksi anomali")
+def _anomaly_stats(cursor: sqlite3.Cursor):
+    # Welford atas log(jumlah) = amount_bucket * BUCKET_LOG (lihat anomaly.py).
+    # Skor transaksi baru dihitung di Python sebelum insert, trigger hanya
+    # menjaga statistiknya
+    _add_column(cursor, 'transactions', 'anomaly_score', 'REAL')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS category_amount_stats (
+            category_id INTEGER PRIMARY KEY,
+            count INTEGER NOT NULL,
+            mean REAL NOT NULL,
+            m2 REAL NOT NULL
+        )
+    ''')
+    anomaly.backfill(cursor)
+
+    add_new = f'''
+            INSERT INTO category_amount_stats (category_id, count, mean, m2)
+            SELECT NEW.category_id, 1, NEW.amount_bucket * {anomaly.BUCKET_LOG!r}, 0
+            WHERE NEW.amount_bucket IS NOT NULL AND NEW.amount_bucket != {SKETCH_ZERO_BUCKET}
+            ON CONFLICT (category_id) DO UPDATE SET
+                count = count + 1,
+                mean = mean + (excluded.mean - mean) / (count + 1),
+                m2 = m2 + (excluded.mean - mean) * (excluded.mean - mean - (excluded.mean - mean) / (count + 1));
+    '''
+    x = f'(OLD.amount_bucket * {anomaly.BUCKET_LOG!r})'
+    remove_old = f'''
+            UPDATE category_amount_stats SET
+                count = count - 1,
+                mean = CASE WHEN count > 1 THEN (count * mean - {x}) / (count - 1) ELSE 0 END,
+                m2 = CASE WHEN count > 1
+                          THEN MAX(m2 - ({x} - (count * mean - {x}) / (count - 1)) * ({x} - mean), 0)
+                          ELSE 0 END
+            WHERE category_id = OLD.category_id
+              AND OLD.amount_bucket IS NOT NULL AND OLD.amount_bucket != {SKETCH_ZERO_BUCKET};
+            DELETE FROM category_amount_stats WHERE category_id = OLD.category_id AND count <= 0;
+    '''
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_amount_stats_insert
+        AFTER INSERT ON transactions
+        BEGIN{add_new}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_amount_stats_delete
+        AFTER DELETE ON transactions
+        BEGIN{remove_old}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_amount_stats_update
+        AFTER UPDATE OF category_id, amount_bucket ON transactions
+        BEGIN{remove_old}{add_new}
+        END
+    ''')
+
+
+@migration(10, "Penghitung edit/hapus transaksi untuk snapshot inkremental")
+def _data_counters(cursor: sqlite3.Cursor):
+    # Insert tidak dihitung: transaksi baru cukup ditambahkan di akhir snapshot
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS data_counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO data_counters (name, value) VALUES ('transaction_rewrites', 0)")
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_transaction_rewrites_update
+        AFTER UPDATE OF type, amount, category_id, description, date ON transactions
+        BEGIN
+            UPDATE data_counters SET value = value + 1 WHERE name = 'transaction_rewrites';
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_transaction_rewrites_delete
+        AFTER DELETE ON transactions
+        BEGIN
+            UPDATE data_counters SET value = value + 1 WHERE name = 'transaction_rewrites';
+        END
+    ''')
+
+
+def _legacy_uid(transaction_id: int, created_at: str, fingerprint: str) -> str:
+    """UID transaksi lama, deterministik agar salinan file database yang sama
+    (cara sinkronisasi sebelumnya) menghasilkan UID yang sama di tiap perangkat"""
+    return hashlib.sha1(f"{transaction_id}|{created_at}|{fingerprint}".encode('utf-8')).hexdigest()[:32]
+
+
+@migration(11, "Change log untuk sinkronisasi antar perangkat")
+def _change_log(cursor: sqlite3.Cursor):
+    # Transaksi diidentifikasi lintas perangkat lewat uid; kategori lewat
+    # namanya (unik dan tidak bisa diganti di aplikasi)
+    _add_column(cursor, 'transactions', 'uid', 'TEXT')
+    cursor.connection.create_function('pm_legacy_uid', 3, _legacy_uid, deterministic=True)
+    cursor.execute('''
+        UPDATE transactions SET uid = pm_legacy_uid(id, created_at, fingerprint)
+        WHERE uid IS NULL
+    ''')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_uid ON transactions(uid)')
+
+    # Identitas perangkat ini; key 'applying' hanya ada selama perubahan dari
+    # perangkat lain diterapkan, agar trigger tidak mencatatnya sebagai
+    # perubahan lokal
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_state (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+    ''')
+    cursor.execute(
+        "INSERT OR IGNORE INTO sync_state (key, value) VALUES ('device_id', lower(hex(randomblob(16))))"
+    )
+    cursor.execute("INSERT OR IGNORE INTO sync_state (key, value) VALUES ('device_name', ?)",
+                   (socket.gethostname() or 'perangkat',))
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_peers (
+            name TEXT PRIMARY KEY,
+            device_id TEXT UNIQUE,
+            last_sent_seq INTEGER NOT NULL DEFAULT 0,
+            last_received_seq INTEGER NOT NULL DEFAULT 0,
+            synced_at TIMESTAMP
+        )
+    ''')
+
+    cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'change_log'"
+    )
+    log_exists = cursor.fetchone() is not None
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            uid TEXT NOT NULL,
+            op TEXT NOT NULL CHECK(op IN ('upsert', 'delete')),
+            changed_at TEXT NOT NULL,
+            origin TEXT NOT NULL
+        )
+    ''')
+    cursor.execute(
+        'CREATE INDEX IF NOT EXISTS idx_change_log_uid ON change_log(table_name, uid, seq)'
+    )
+    if not log_exists:
+        # Seluruh isi ledger saat ini menjadi perubahan awal; induk kategori
+        # lebih dulu dari subkategorinya
+        cursor.execute('''
+            INSERT INTO change_log (table_name, uid, op, changed_at, origin)
+            SELECT 'categories', name, 'upsert', COALESCE(created_at, CURRENT_TIMESTAMP),
+                   (SELECT value FROM sync_state WHERE key = 'device_id')
+            FROM categories ORDER BY level, id
+        ''')
+        cursor.execute('''
+            INSERT INTO change_log (table_name, uid, op, changed_at, origin)
+            SELECT 'transactions', uid, 'upsert', COALESCE(created_at, CURRENT_TIMESTAMP),
+                   (SELECT value FROM sync_state WHERE key = 'device_id')
+            FROM transactions ORDER BY id
+        ''')
+
+    log_sql = '''
+            INSERT INTO change_log (table_name, uid, op, changed_at, origin)
+            SELECT '{table}', {uid}, '{op}', strftime('%Y-%m-%d %H:%M:%f', 'now'),
+                   (SELECT value FROM sync_state WHERE key = 'device_id');
+    '''
+    for table, event, columns, uid, op in (
+        ('transactions', 'INSERT', '', 'NEW.uid', 'upsert'),
+        ('transactions', 'UPDATE', ' OF type, amount, category_id, description, date, uid',
+         'NEW.uid', 'upsert'),
+        ('transactions', 'DELETE', '', 'OLD.uid', 'delete'),
+        ('categories', 'INSERT', '', 'NEW.name', 'upsert'),
+        ('categories', 'UPDATE', ' OF name, type, parent_id', 'NEW.name', 'upsert'),
+        ('categories', 'DELETE', '', 'OLD.name', 'delete'),
+    ):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_change_log_{table}_{event.lower()}
+            AFTER {event}{columns} ON {table}
+            WHEN NOT EXISTS (SELECT 1 FROM sync_state WHERE key = 'applying')
+            BEGIN{log_sql.format(table=table, uid=uid, op=op)}
+            END
+        ''')
+
+
+@migration(12, "Lampiran transaksi (struk) dengan penyimpanan berbasis hash isi")
+def _attachments(cursor: sqlite3.Cursor):
+    # Isi file disimpan di folder samping database (lihat modul attachments),
+    # di sini hanya metadata; satu blob bisa dipakai banyak lampiran
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS attachment_blobs (
+            hash TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            stored_size INTEGER NOT NULL,
+            compression TEXT NOT NULL CHECK(compression IN ('none', 'zlib')),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS attachments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            transaction_id INTEGER NOT NULL REFERENCES transactions(id),
+            hash TEXT NOT NULL REFERENCES attachment_blobs(hash),
+            filename TEXT NOT NULL,
+            mime_type TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute(
+        'CREATE INDEX IF NOT EXISTS idx_attachments_transaction ON attachments(transaction_id)'
+    )
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_attachments_hash ON attachments(hash)')
+
+    # Lampiran ikut terhapus bersama transaksinya; blob-nya dibuang oleh gc
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_attachments_transaction_delete
+        AFTER DELETE ON transactions
+        BEGIN
+            DELETE FROM attachments WHERE transaction_id = OLD.id;
+        END
+    ''')
+
+
+@migration(13, "Kunci merchant ternormalisasi untuk laporan merchant teratas")
+def _merchants(cursor: sqlite3.Cursor):
+    _add_column(cursor, 'transactions', 'merchant', 'TEXT')
+    cursor.connection.create_function('pm_merchant_key', 1, merchant_key, deterministic=True)
+    cursor.execute('UPDATE transactions SET merchant = pm_merchant_key(description)')
+    # Index covering untuk total per merchant dalam rentang tanggal: laporan
+    # cukup membaca index, tidak menyentuh baris tabel
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transactions_merchant
+        ON transactions(type, date, merchant, amount)
+    ''')
+
+
+@migration(14, "Aturan kategori otomatis")
+def _category_rules(cursor: sqlite3.Cursor):
+    # keyword: frasa utuh di deskripsi, regex: ekspresi reguler Python,
+    # amount: hanya rentang jumlah (pattern kosong)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS category_rules (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL CHECK(kind IN ('keyword', 'regex', 'amount')),
+            pattern TEXT,
+            min_amount REAL,
+            max_amount REAL,
+            category_id INTEGER NOT NULL REFERENCES categories(id),
+            priority INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute(
+        'CREATE INDEX IF NOT EXISTS idx_category_rules_category ON category_rules(category_id)'
+    )
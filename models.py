@@ -12,6 +12,8 @@ class Category:
     name: str
     type: str  # 'income' atau 'expense'
     created_at: datetime
+    parent_id: Optional[int] = None
+    level: int = 0  # 0 = kategori teratas
     
     @classmethod
     def from_db_row(cls, row):
@@ -20,7 +22,9 @@ class Category:
             id=row['id'],
             name=row['name'],
             type=row['type'],
-            created_at=datetime.fromisoformat(row['created_at'])
+            created_at=datetime.fromisoformat(row['created_at']),
+            parent_id=row['parent_id'],
+            level=row['level']
         )
     
     def __str__(self):
@@ -46,7 +50,7 @@ class Transaction:
             type=row['type'],
             amount=row['amount'],
             category_id=row['category_id'],
-            category_name=row.get('category_name', 'Unknown'),
+            category_name=row['category_name'] if 'category_name' in row.keys() else 'Unknown',
             description=row['description'],
             date=datetime.fromisoformat(row['date']),
             created_at=datetime.fromisoformat(row['created_at'])
@@ -57,4 +61,43 @@ class Transaction:
                 f"{'Pemasukan' if self.type == 'income' else 'Pengeluaran':12} | "
                 f"{self.category_name:15} | "
                 f"Rp{self.amount:>12,.2f} | "
-                f"{self.description or '-'}")
\ No newline at end of file
+                f"{self.description or '-'}")
+
+@dataclass
+class BudgetStatus:
+    """Model untuk status budget bulanan sebuah kategori"""
+    category_id: int
+    category_name: str
+    budget: float
+    spent: float
+    alert_threshold: float
+    period: str  # 'YYYY-MM'
+    
+    @classmethod
+    def from_db_row(cls, row):
+        """Membuat objek BudgetStatus dari row database"""
+        return cls(
+            category_id=row['category_id'],
+            category_name=row['category_name'],
+            budget=row['budget'],
+            spent=row['spent'],
+            alert_threshold=row['alert_threshold'],
+            period=row['period']
+        )
+    
+    @property
+    def remaining(self) -> float:
+        return self.budget - self.spent
+    
+    @property
+    def usage(self) -> float:
+        """Rasio pemakaian budget (1.0 = 100%)"""
+        return self.spent / self.budget if self.budget > 0 else 0
+    
+    @property
+    def is_over(self) -> bool:
+        return self.spent > self.budget
+    
+    @property
+    def is_alert(self) -> bool:
+        return self.usage >= self.alert_threshold
@@ -0,0 +1,130 @@
+"""
+Query builder untuk mencari transaksi dengan filter yang bisa dikombinasikan
+
+SQL yang dihasilkan selalu memakai parameter dan bentuknya hanya bergantung
+pada filter mana yang dipakai (bukan nilainya). Himpunan kategori dan tag
+dikirim sebagai satu parameter JSON lewat `json_each`, sehingga jumlahnya
+tidak mengubah teks SQL dan prepared statement bisa dipakai ulang dari
+cache koneksi.
+"""
+import json
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple
+
+# Kolom sort yang diizinkan -> ekspresi ORDER BY (dengan tie-breaker ID)
+SORT_COLUMNS = {
+    'date': 't.date {dir}, t.id {dir}',
+    'amount': 't.amount {dir}, t.id {dir}',
+    'id': 't.id {dir}',
+}
+
+# Filter tag dalam dua bentuk:
+# - daftar ID dari index (tag_id, transaction_id), cocok untuk tag yang jarang
+#   dan agregasi penuh;
+# - probe per baris lewat primary key (transaction_id, tag_id), cocok untuk
+#   tag yang umum ketika hasil dibatasi LIMIT atau rentang tanggal, karena
+#   SQLite bisa tetap menelusuri index date dan berhenti lebih awal.
+TAG_IDS_SQL = "SELECT id FROM tags WHERE name IN (SELECT value FROM json_each(?))"
+TAG_ANY_SQL = (
+    't.id IN (SELECT tt.transaction_id FROM transaction_tags tt '
+    f'WHERE tt.tag_id IN ({TAG_IDS_SQL}))'
+)
+TAG_ALL_SQL = (
+    't.id IN (SELECT tt.transaction_id FROM transaction_tags tt '
+    f'WHERE tt.tag_id IN ({TAG_IDS_SQL}) '
+    'GROUP BY tt.transaction_id HAVING COUNT(*) = ?)'
+)
+TAG_ANY_PROBE_SQL = (
+    'EXISTS (SELECT 1 FROM transaction_tags tt '
+    f'WHERE tt.transaction_id = t.id AND tt.tag_id IN ({TAG_IDS_SQL}))'
+)
+TAG_ALL_PROBE_SQL = (
+    '(SELECT COUNT(*) FROM transaction_tags tt '
+    f'WHERE tt.transaction_id = t.id AND tt.tag_id IN ({TAG_IDS_SQL})) = ?'
+)
+
+
+def tag_conditions(tags_any: Sequence[str] = (), tags_all: Sequence[str] = (),
+                   probe: bool = False) -> Tuple[List[str], List]:
+    """Kondisi WHERE (atas alias `t`) untuk filter tag OR (`tags_any`) dan AND (`tags_all`)"""
+    conditions = []
+    params: List = []
+    if tags_any:
+        conditions.append(TAG_ANY_PROBE_SQL if probe else TAG_ANY_SQL)
+        params.append(json.dumps(sorted(set(tags_any))))
+    if tags_all:
+        unique = sorted(set(tags_all))
+        conditions.append(TAG_ALL_PROBE_SQL if probe else TAG_ALL_SQL)
+        params += [json.dumps(unique), len(unique)]
+    return conditions, params
+
+
+@dataclass
+class TransactionQuery:
+    """Kriteria pencarian transaksi. Semua filter opsional dan digabung dengan AND."""
+    type: Optional[str] = None  # 'income' atau 'expense'
+    category_ids: Sequence[int] = field(default_factory=tuple)
+    start_date: Optional[str] = None  # YYYY-MM-DD, inklusif
+    end_date: Optional[str] = None  # YYYY-MM-DD, inklusif
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+    text: Optional[str] = None  # Dicari di deskripsi (tidak case-sensitive)
+    tags_any: Sequence[str] = field(default_factory=tuple)  # Punya minimal satu tag ini
+    tags_all: Sequence[str] = field(default_factory=tuple)  # Punya semua tag ini
+    probe_tags: bool = False  # Bentuk filter tag, lihat tag_conditions()
+    sort: str = 'date'
+    descending: bool = True
+    limit: Optional[int] = 50
+    offset: int = 0
+
+    def where_clause(self) -> Tuple[str, List]:
+        """Menyusun klausa WHERE beserta parameternya"""
+        conditions = []
+        params: List = []
+
+        if self.type:
+            conditions.append('t.type = ?')
+            params.append(self.type)
+        if self.category_ids:
+            conditions.append('t.category_id IN (SELECT value FROM json_each(?))')
+            params.append(json.dumps([int(cid) for cid in self.category_ids]))
+        if self.start_date:
+            conditions.append('t.date >= ?')
+            params.append(self.start_date)
+        if self.end_date:
+            conditions.append('t.date <= ?')
+            params.append(self.end_date)
+        if self.min_amount is not None:
+            conditions.append('t.amount >= ?')
+            params.append(self.min_amount)
+        if self.max_amount is not None:
+            conditions.append('t.amount <= ?')
+            params.append(self.max_amount)
+        if self.text:
+            escaped = self.text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            conditions.append("t.description LIKE ? ESCAPE '\\'")
+            params.append(f'%{escaped}%')
+        tag_sql, tag_params = tag_conditions(self.tags_any, self.tags_all, self.probe_tags)
+        conditions += tag_sql
+        params += tag_params
+
+        if not conditions:
+            return '', params
+        return ' WHERE ' + ' AND '.join(conditions), params
+
+    def to_sql(self) -> Tuple[str, List]:
+        """Menyusun query SELECT lengkap beserta parameternya"""
+        if self.sort not in SORT_COLUMNS:
+            raise ValueError(f"Kolom sort tidak dikenal: {self.sort}")
+
+        where, params = self.where_clause()
+        sql = ('SELECT t.*, c.name as category_name, c.type as category_type, '
+               "(SELECT group_concat(g.name, ',') FROM transaction_tags tt "
+               'JOIN tags g ON g.id = tt.tag_id WHERE tt.transaction_id = t.id) as tags '
+               'FROM transactions t JOIN categories c ON t.category_id = c.id'
+               + where
+               + ' ORDER BY ' + SORT_COLUMNS[self.sort].format(dir='DESC' if self.descending else 'ASC'))
+        if self.limit is not None:
+            sql += ' LIMIT ? OFFSET ?'
+            params += [self.limit, self.offset]
+        return sql, params
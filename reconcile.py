@@ -0,0 +1,246 @@
+"""
+Rekonsiliasi ledger dengan file mutasi rekening bank
+
+Mutasi bank (CSV/JSONL, opsional .gz, lihat `transfer.read_records`) dan
+transaksi ledger dibaca sebagai dua aliran yang sama-sama urut tanggal,
+lalu dicocokkan dalam satu kali merge: kandidat pasangan sebuah baris
+mutasi hanya transaksi ledger dalam jendela ±`date_tolerance` hari. Hanya
+jendela itu yang disimpan di memori, jadi waktu proses linear dan memori
+konstan berapa pun panjang mutasinya. Pencocokan bersifat greedy: baris
+mutasi diproses urut, masing-masing mengambil transaksi ledger terdekat
+(selisih hari lalu selisih jumlah) yang belum terpakai. Di dalam jendela,
+transaksi dikelompokkan per (tipe, bucket jumlah) sehingga mencari kandidat
+tidak perlu memeriksa seluruh isi jendela.
+
+Kolom mutasi: `date` (YYYY-MM-DD atau DD/MM/YYYY), `description`, dan
+salah satu dari `amount` + `type` (income/expense), `amount` bertanda
+(negatif = pengeluaran), atau `debit`/`credit`.
+"""
+import sqlite3
+from collections import deque
+from dataclasses import dataclass
+from datetime import date as Date, datetime, timedelta
+from itertools import chain
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from database import Database
+from transfer import read_records
+from utils import validate_date
+
+STATUSES = ('matched', 'missing', 'extra')
+
+
+@dataclass
+class StatementLine:
+    """Satu baris mutasi bank"""
+    line_no: int
+    date: str  # YYYY-MM-DD
+    type: str  # 'income' atau 'expense'
+    amount: float  # Selalu positif
+    description: Optional[str] = None
+
+
+def _parse_number(value) -> Optional[float]:
+    text = str(value if value is not None else '').strip().replace(' ', '').replace(',', '.')
+    return float(text) if text else None
+
+
+def parse_statement_line(line_no: int, record: dict) -> StatementLine:
+    """Mengubah satu record mutasi menjadi StatementLine"""
+    date = (record.get('date') or '').strip()
+    if not validate_date(date):
+        try:
+            date = datetime.strptime(date, "%d/%m/%Y").strftime("%Y-%m-%d")
+        except ValueError:
+            raise ValueError(f"Baris {line_no}: tanggal tidak valid: {date!r}") from None
+
+    try:
+        type_ = (record.get('type') or '').strip().lower()
+        amount = _parse_number(record.get('amount'))
+        if not type_ and amount is None:
+            debit, credit = _parse_number(record.get('debit')), _parse_number(record.get('credit'))
+            type_, amount = ('expense', debit) if debit else ('income', credit)
+        elif not type_:
+            type_ = 'expense' if amount < 0 else 'income'
+    except (TypeError, ValueError):
+        raise ValueError(f"Baris {line_no}: jumlah tidak valid") from None
+    if type_ not in ('income', 'expense') or not amount:
+        raise ValueError(f"Baris {line_no}: jumlah atau tipe tidak valid")
+
+    description = (record.get('description') or '').strip() or None
+    return StatementLine(line_no, date, type_, abs(amount), description)
+
+
+def read_statement(path: str, fmt: Optional[str] = None) -> Iterator[StatementLine]:
+    """Membaca mutasi baris demi baris; mutasi harus urut tanggal naik"""
+    previous = ''
+    for line_no, record in read_records(path, fmt):
+        line = parse_statement_line(line_no, record)
+        if line.date < previous:
+            raise ValueError(f"Baris {line_no}: mutasi harus urut tanggal naik "
+                             f"({line.date} setelah {previous})")
+        previous = line.date
+        yield line
+
+
+@dataclass
+class ReconcileEntry:
+    """Hasil untuk satu baris mutasi atau satu transaksi ledger.
+
+    - matched : ada di mutasi dan di ledger
+    - missing : ada di mutasi, belum dicatat di ledger
+    - extra   : ada di ledger, tidak ada di mutasi
+    """
+    status: str
+    statement: Optional[StatementLine] = None
+    transaction: Optional[sqlite3.Row] = None
+
+
+@dataclass
+class ReconcileSummary:
+    """Rekap hasil rekonsiliasi, diperbarui selama hasil dibaca"""
+    matched: int = 0
+    missing: int = 0
+    extra: int = 0
+    missing_amount: float = 0.0
+    extra_amount: float = 0.0
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    statement_lines: int = 0
+
+    @property
+    def balanced(self) -> bool:
+        return self.missing == 0 and self.extra == 0
+
+
+def _shift(date: str, days: int) -> str:
+    return (Date.fromisoformat(date) + timedelta(days=days)).isoformat()
+
+
+class _Window:
+    """Transaksi ledger dalam jendela tanggal, urut tanggal, dikelompokkan
+    per (tipe, bucket jumlah) selebar toleransi jumlah"""
+
+    def __init__(self, amount_tolerance: float):
+        self.width = max(amount_tolerance, 0.01)
+        self.entries: Deque[list] = deque()  # [ordinal, transaksi, masih_ada]
+        self.buckets: Dict[Tuple[str, int], Deque[list]] = {}
+
+    def _key(self, type_: str, amount: float) -> Tuple[str, int]:
+        return type_, round(amount / self.width)
+
+    def append(self, ordinal: int, row: sqlite3.Row):
+        entry = [ordinal, row, True]
+        self.entries.append(entry)
+        self.buckets.setdefault(self._key(row['type'], row['amount']), deque()).append(entry)
+
+    def evict_before(self, ordinal: int) -> Iterator[sqlite3.Row]:
+        """Mengeluarkan transaksi yang belum terpakai dengan tanggal < ordinal"""
+        while self.entries and self.entries[0][0] < ordinal:
+            entry = self.entries.popleft()
+            if entry[2]:
+                self._discard(entry)
+                yield entry[1]
+
+    def candidates(self, type_: str, amount: float) -> Iterator[list]:
+        _, key = self._key(type_, amount)
+        for bucket in (key - 1, key, key + 1):
+            yield from self.buckets.get((type_, bucket), ())
+
+    def take(self, entry: list):
+        entry[2] = False
+        self._discard(entry)
+
+    def _discard(self, entry: list):
+        key = self._key(entry[1]['type'], entry[1]['amount'])
+        bucket = self.buckets[key]
+        bucket.remove(entry)
+        if not bucket:
+            del self.buckets[key]
+
+    def remaining(self) -> List[sqlite3.Row]:
+        return [entry[1] for entry in self.entries if entry[2]]
+
+
+class Reconciler:
+    """Merge-join mutasi bank dengan ledger.
+
+    `date_tolerance`  : selisih tanggal maksimal (hari), misalnya karena
+                        tanggal pembukuan bank mundur beberapa hari
+    `amount_tolerance`: selisih jumlah maksimal (misalnya biaya admin)
+    `type_`           : hanya cocokkan transaksi tipe ini (default semua)
+    """
+
+    def __init__(self, db: Database, date_tolerance: int = 3, amount_tolerance: float = 0.0,
+                 type_: Optional[str] = None):
+        self.db = db
+        self.date_tolerance = date_tolerance
+        self.amount_tolerance = amount_tolerance
+        self.type_ = type_
+        self.summary = ReconcileSummary()
+
+    def run(self, lines: Iterable[StatementLine]) -> Iterator[ReconcileEntry]:
+        """Menghasilkan ReconcileEntry satu per satu (kira-kira urut tanggal).
+
+        Transaksi ledger hanya dilaporkan sebagai `extra` jika tanggalnya di
+        dalam periode mutasi (tanggal baris pertama sampai terakhir).
+        """
+        self.summary = summary = ReconcileSummary()
+        lines = iter(lines)
+        first = next(lines, None)
+        if first is None:
+            return
+        summary.start_date = first.date
+
+        ledger = self.db.iter_transactions_by_date_range(
+            _shift(first.date, -self.date_tolerance), '9999-12-31', self.type_
+        )
+        window = _Window(self.amount_tolerance)
+        pending = next(ledger, None)
+        try:
+            for line in chain([first], lines):
+                summary.statement_lines += 1
+                ordinal = Date.fromisoformat(line.date).toordinal()
+                upper = _shift(line.date, self.date_tolerance)
+                while pending is not None and pending['date'] <= upper:
+                    window.append(Date.fromisoformat(pending['date']).toordinal(), pending)
+                    pending = next(ledger, None)
+                for row in window.evict_before(ordinal - self.date_tolerance):
+                    yield from self._extra(row)
+
+                match = self._best_match(window, line, ordinal)
+                if match is None:
+                    summary.missing += 1
+                    summary.missing_amount += line.amount
+                    yield ReconcileEntry('missing', statement=line)
+                else:
+                    window.take(match)
+                    summary.matched += 1
+                    yield ReconcileEntry('matched', statement=line, transaction=match[1])
+                summary.end_date = line.date
+
+            # Sisa jendela; transaksi setelah tanggal terakhir mutasi di luar periode
+            for row in window.remaining():
+                if row['date'] <= summary.end_date:
+                    yield from self._extra(row)
+        finally:
+            ledger.close()
+
+    def _extra(self, row: sqlite3.Row) -> Iterator[ReconcileEntry]:
+        if row['date'] >= self.summary.start_date:
+            self.summary.extra += 1
+            self.summary.extra_amount += row['amount']
+            yield ReconcileEntry('extra', transaction=row)
+
+    def _best_match(self, window: _Window, line: StatementLine, ordinal: int) -> Optional[list]:
+        """Transaksi di jendela yang paling dekat (hari, lalu jumlah, lalu yang lebih dulu)"""
+        best, best_key = None, None
+        for entry in window.candidates(line.type, line.amount):
+            amount_diff = abs(entry[1]['amount'] - line.amount)
+            day_diff = abs(entry[0] - ordinal)
+            if amount_diff > self.amount_tolerance + 1e-9 or day_diff > self.date_tolerance:
+                continue
+            key = (day_diff, amount_diff, entry[1]['id'])
+            if best_key is None or key < best_key:
+                best, best_key = entry, key
+        return best
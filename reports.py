@@ -0,0 +1,180 @@
+"""
+Laporan akhir tahun paralel lintas ledger dan tahun
+
+Pekerjaan dipecah menjadi satu tugas per (ledger, tahun). Setiap tugas
+dijalankan di proses worker `ProcessPoolExecutor`; setiap worker membuka
+satu koneksi SQLite read-only per file ledger dan memakainya ulang untuk
+semua tugas yang ia kerjakan, lalu menghasilkan agregat parsial kecil, yang kemudian
+digabung di proses utama. Dengan begitu waktu total turun seiring jumlah
+core, bukan menjalankan `get_balance_summary` per file secara berurutan.
+"""
+import atexit
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ledger import LedgerRegistry
+
+
+@dataclass(frozen=True)
+class ReportTask:
+    """Satu unit kerja: agregasi satu tahun dari satu file ledger"""
+    ledger: str
+    db_path: str
+    year: int
+
+
+@dataclass
+class PartialAggregate:
+    """Hasil agregasi satu tugas"""
+    ledger: str
+    year: int
+    income: float = 0.0
+    expense: float = 0.0
+    count: int = 0
+    by_category: Dict[Tuple[str, str], float] = field(default_factory=dict)  # (type, nama) -> total
+    elapsed: float = 0.0  # Detik kerja worker untuk tugas ini
+
+
+@dataclass
+class YearEndReport:
+    """Gabungan semua agregat parsial"""
+    income: float = 0.0
+    expense: float = 0.0
+    count: int = 0
+    by_category: Dict[Tuple[str, str], float] = field(default_factory=dict)
+    by_year: Dict[int, Tuple[float, float]] = field(default_factory=dict)  # tahun -> (income, expense)
+    by_ledger: Dict[str, Tuple[float, float]] = field(default_factory=dict)
+    ledger_seconds: Dict[str, float] = field(default_factory=dict)  # Total detik kerja per ledger
+    workers: int = 1
+
+    @property
+    def work_seconds(self) -> float:
+        """Jumlah waktu kerja semua tugas (= waktu jika dijalankan berurutan)"""
+        return sum(self.ledger_seconds.values())
+
+    @property
+    def balance(self) -> float:
+        return self.income - self.expense
+
+    def merge(self, part: PartialAggregate):
+        """Menambahkan satu agregat parsial ke laporan"""
+        self.income += part.income
+        self.expense += part.expense
+        self.count += part.count
+        for key, total in part.by_category.items():
+            self.by_category[key] = self.by_category.get(key, 0.0) + total
+        for bucket, key in ((self.by_year, part.year), (self.by_ledger, part.ledger)):
+            income, expense = bucket.get(key, (0.0, 0.0))
+            bucket[key] = (income + part.income, expense + part.expense)
+        self.ledger_seconds[part.ledger] = self.ledger_seconds.get(part.ledger, 0.0) + part.elapsed
+
+
+def connect_read_only(db_path: str) -> sqlite3.Connection:
+    """Membuka database dalam mode read-only (tanpa migrasi/penulisan)"""
+    return sqlite3.connect(Path(db_path).resolve().as_uri() + '?mode=ro', uri=True)
+
+
+# Koneksi read-only per proses: db_path -> koneksi
+_CONNECTIONS: Dict[str, sqlite3.Connection] = {}
+
+
+def _cached_connection(db_path: str) -> sqlite3.Connection:
+    """Koneksi read-only ke `db_path` yang dipakai ulang di proses ini"""
+    conn = _CONNECTIONS.get(db_path)
+    if conn is None:
+        conn = _CONNECTIONS[db_path] = connect_read_only(db_path)
+    return conn
+
+
+def _close_connections():
+    while _CONNECTIONS:
+        _CONNECTIONS.popitem()[1].close()
+
+
+def _init_worker():
+    """Initializer worker: mulai dengan cache kosong (bukan warisan fork)
+    dan tutup semua koneksi saat proses selesai"""
+    _CONNECTIONS.clear()
+    atexit.register(_close_connections)
+
+
+def aggregate_year(task: ReportTask) -> PartialAggregate:
+    """Worker: menghitung total satu tahun dari satu file ledger"""
+    started = time.perf_counter()
+    start, end = f"{task.year}-01-01", f"{task.year}-12-31"
+    part = PartialAggregate(task.ledger, task.year)
+    cursor = _cached_connection(task.db_path).cursor()
+    try:
+        cursor.execute('''
+            SELECT c.type, c.name, SUM(t.amount), COUNT(*)
+            FROM transactions t
+            JOIN categories c ON c.id = t.category_id
+            WHERE t.date >= ? AND t.date <= ?
+            GROUP BY c.id
+        ''', (start, end))
+        for type_, name, total, count in cursor.fetchall():
+            part.by_category[(type_, name)] = total
+            part.count += count
+            if type_ == 'income':
+                part.income += total
+            else:
+                part.expense += total
+    finally:
+        cursor.close()
+    part.elapsed = time.perf_counter() - started
+    return part
+
+
+def year_range(db_path: str) -> Optional[Tuple[int, int]]:
+    """Tahun transaksi pertama dan terakhir di sebuah ledger (lewat index date)"""
+    if not os.path.exists(db_path):
+        return None
+    conn = connect_read_only(db_path)
+    try:
+        first = conn.execute('SELECT MIN(date) FROM transactions').fetchone()[0]
+        last = conn.execute('SELECT MAX(date) FROM transactions').fetchone()[0]
+    finally:
+        conn.close()
+    if first is None:
+        return None
+    return int(first[:4]), int(last[:4])
+
+
+def plan_tasks(registry: LedgerRegistry, ledgers: Optional[Iterable[str]] = None,
+               years: Optional[Iterable[int]] = None) -> List[ReportTask]:
+    """Menyusun daftar tugas (ledger x tahun). Tanpa `years`, semua tahun
+    yang ada datanya di tiap ledger dipakai."""
+    tasks = []
+    for name in (ledgers or registry.names()):
+        path = registry.get_path(name)
+        if years is not None:
+            ledger_years = list(years)
+        else:
+            found = year_range(path)
+            ledger_years = list(range(found[0], found[1] + 1)) if found else []
+        tasks.extend(ReportTask(name, path, year) for year in ledger_years)
+    return tasks
+
+
+def run_report(tasks: List[ReportTask], workers: Optional[int] = None) -> YearEndReport:
+    """Menjalankan semua tugas (paralel jika workers > 1) dan menggabungkan hasilnya"""
+    report = YearEndReport()
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(tasks) <= 1:
+        try:
+            for part in map(aggregate_year, tasks):
+                report.merge(part)
+        finally:
+            _close_connections()
+        return report
+
+    report.workers = min(workers, len(tasks))
+    with ProcessPoolExecutor(max_workers=report.workers, initializer=_init_worker) as pool:
+        for part in pool.map(aggregate_year, tasks):
+            report.merge(part)
+    return report
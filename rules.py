@@ -0,0 +1,331 @@
+"""
+Kategori otomatis berbasis aturan
+
+Tiga jenis aturan (tabel `category_rules`), masing-masing menunjuk satu
+kategori dan boleh dibatasi rentang jumlah `min_amount`..`max_amount`:
+
+- keyword : frasa (satu kata atau lebih) yang muncul utuh di deskripsi,
+            dibandingkan setelah `utils.normalize_description`
+- regex   : ekspresi reguler Python terhadap deskripsi asli (tanpa beda
+            huruf besar/kecil)
+- amount  : hanya rentang jumlah, tanpa pola
+
+Aturan hanya berlaku untuk kategori yang tipenya sama dengan transaksi.
+Jika beberapa aturan cocok, yang menang adalah prioritas tertinggi, lalu
+pola terpanjang (lebih spesifik), lalu aturan yang lebih dulu dibuat.
+
+Semua aturan dikompilasi sekali menjadi `RuleSet` sehingga biaya per
+transaksi hampir tidak bergantung pada jumlah aturan:
+- semua keyword menjadi satu automaton Aho-Corasick per kata, jadi
+  deskripsi cukup dipindai satu kali berapa pun jumlah keyword-nya;
+- semua regex digabung menjadi satu pola alternasi sebagai penyaring;
+  regex satu per satu hanya diperiksa jika pola gabungan cocok, dan hanya
+  yang peringkatnya lebih baik dari kandidat yang sudah ditemukan;
+- aturan rentang jumlah menjadi tabel segmen yang dicari dengan bisect.
+Aturan dikelompokkan per tipe transaksi sehingga aturan pemasukan tidak
+ikut diperiksa untuk pengeluaran dan sebaliknya.
+"""
+import bisect
+import re
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from database import Database
+from utils import normalize_description
+
+KINDS = ('keyword', 'regex', 'amount')
+_BACKREFERENCE = re.compile(r'\\[1-9]|\(\?P=')
+_ESCAPE = re.compile(r'\\(.)')
+
+
+@dataclass
+class Rule:
+    """Satu aturan kategori otomatis"""
+    id: int
+    kind: str
+    pattern: Optional[str]
+    category_id: int
+    category_type: str
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+    priority: int = 0
+    category_name: str = ''
+
+    @classmethod
+    def from_row(cls, row) -> 'Rule':
+        return cls(row['id'], row['kind'], row['pattern'], row['category_id'],
+                   row['category_type'], row['min_amount'], row['max_amount'],
+                   row['priority'], row['category_name'])
+
+    def applies_to(self, type_: str, amount: float) -> bool:
+        """Tipe kategori dan rentang jumlah cocok dengan transaksi"""
+        return (self.category_type == type_
+                and (self.min_amount is None or amount >= self.min_amount)
+                and (self.max_amount is None or amount <= self.max_amount))
+
+
+def validate_rule(kind: str, pattern: Optional[str], min_amount: Optional[float] = None,
+                  max_amount: Optional[float] = None) -> Optional[str]:
+    """Memeriksa aturan baru, mengembalikan pola yang siap disimpan
+    (keyword dinormalisasi); ValueError jika tidak valid"""
+    if kind not in KINDS:
+        raise ValueError(f"Jenis aturan tidak dikenal: {kind}")
+    if min_amount is not None and max_amount is not None and min_amount > max_amount:
+        raise ValueError("Jumlah minimum lebih besar dari maksimum")
+    if kind == 'amount':
+        if min_amount is None and max_amount is None:
+            raise ValueError("Aturan jumlah butuh minimum dan/atau maksimum")
+        return None
+    pattern = (pattern or '').strip()
+    if kind == 'keyword':
+        pattern = ' '.join(normalize_description(pattern).split())
+        if not pattern:
+            raise ValueError("Keyword kosong")
+        return pattern
+    if not pattern:
+        raise ValueError("Regex kosong")
+    try:
+        re.compile(pattern, re.IGNORECASE)
+    except re.error as e:
+        raise ValueError(f"Regex tidak valid: {e}") from None
+    return pattern
+
+
+def add_rule(db: Database, kind: str, pattern: Optional[str], category_id: int,
+             min_amount: Optional[float] = None, max_amount: Optional[float] = None,
+             priority: int = 0) -> int:
+    """Memvalidasi lalu menyimpan aturan baru, mengembalikan ID-nya"""
+    if db.get_category(category_id) is None:
+        raise ValueError(f"Kategori {category_id} tidak ditemukan")
+    pattern = validate_rule(kind, pattern, min_amount, max_amount)
+    return db.add_category_rule(kind, pattern, category_id, min_amount, max_amount, priority)
+
+
+class _PhraseMatcher:
+    """Automaton Aho-Corasick dengan kata (bukan karakter) sebagai simbol.
+
+    Menemukan semua frasa yang muncul utuh di deretan kata dalam satu kali
+    pindai, berapa pun jumlah frasanya.
+    """
+
+    def __init__(self, phrases: Iterable[Tuple[Sequence[str], int]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        for words, value in phrases:
+            state = 0
+            for word in words:
+                if word not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                    self._goto[state][word] = len(self._goto) - 1
+                state = self._goto[state][word]
+            self._out[state].append(value)
+
+        # Tautan gagal dibangun per kedalaman (BFS); simpul kedalaman 1 gagal ke akar
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for word, child in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and word not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(word, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+                queue.append(child)
+
+    def find(self, words: Iterable[str]) -> Set[int]:
+        """Nilai semua frasa yang muncul di `words`"""
+        goto, fail, out = self._goto, self._fail, self._out
+        found: Set[int] = set()
+        state = 0
+        for word in words:
+            while state and word not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(word, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+
+def _rank(rule: Rule) -> tuple:
+    return -rule.priority, -len(rule.pattern or ''), rule.id
+
+
+class _AmountIndex:
+    """Aturan rentang jumlah saja, dicari dengan bisect.
+
+    Titik batas semua rentang membagi garis bilangan menjadi segmen (di
+    antara dua titik, atau tepat di sebuah titik); di dalam satu segmen
+    himpunan aturan yang berlaku selalu sama, jadi aturan terbaik tiap
+    segmen cukup dihitung sekali saat kompilasi.
+    """
+
+    def __init__(self, rules: Sequence[Tuple[int, Rule]]):
+        self._points = sorted({value for _, rule in rules
+                               for value in (rule.min_amount, rule.max_amount) if value is not None})
+        # Segmen 2i = sebelum titik i, 2i + 1 = tepat di titik i, terakhir = setelah titik terakhir
+        samples = []
+        for i, point in enumerate(self._points):
+            samples += [(self._points[i - 1] + point) / 2 if i else point - 1, point]
+        samples.append(self._points[-1] + 1 if self._points else 0)
+        self._best: List[Optional[int]] = [
+            next((index for index, rule in rules if rule.applies_to(rule.category_type, sample)), None)
+            for sample in samples
+        ]
+
+    def best(self, amount: float) -> Optional[int]:
+        i = bisect.bisect_left(self._points, amount)
+        exact = i < len(self._points) and self._points[i] == amount
+        return self._best[2 * i + 1 if exact else 2 * i]
+
+
+class _TypeMatcher:
+    """Aturan yang sudah dikompilasi untuk satu tipe transaksi"""
+
+    def __init__(self, ranked: Sequence[Tuple[int, Rule]]):
+        self.amounts = _AmountIndex([(i, rule) for i, rule in ranked if rule.kind == 'amount'])
+        self.phrases = _PhraseMatcher(
+            (rule.pattern.split(), i) for i, rule in ranked if rule.kind == 'keyword'
+        )
+        # (peringkat, regex IGNORECASE, regex untuk deskripsi ASCII huruf kecil atau None)
+        self.regexes = [(i, re.compile(rule.pattern, re.IGNORECASE),
+                         re.compile(rule.pattern) if _lowercase_safe(rule.pattern) else None)
+                        for i, rule in ranked if rule.kind == 'regex']
+        patterns = [regex.pattern for _, regex, _ in self.regexes]
+        self.combined = _combine(patterns, re.IGNORECASE)
+        self.combined_lower = None
+        if all(lower is not None for _, _, lower in self.regexes):
+            self.combined_lower = _combine(patterns, 0)
+
+    def best_regex(self, rules: List[Rule], type_: str, amount: float, description: str,
+                   best: int) -> int:
+        """Peringkat regex terbaik yang cocok dan lebih baik dari `best` (jika ada)"""
+        # IGNORECASE jauh lebih lambat; deskripsi ASCII cukup dikecilkan sekali
+        lowered = description.lower() if description.isascii() else None
+        if lowered is not None and self.combined_lower is not None:
+            if not self.combined_lower.search(lowered):
+                return best
+        elif self.combined is not None and not self.combined.search(description):
+            return best
+        for index, regex, lower in self.regexes:
+            if index >= best:
+                break
+            if not rules[index].applies_to(type_, amount):
+                continue
+            if lower is not None and lowered is not None:
+                found = lower.search(lowered)
+            else:
+                found = regex.search(description)
+            if found:
+                return index
+        return best
+
+
+def _combine(patterns: List[str], flags: int):
+    """Satu pola alternasi dari semua regex, None jika tidak bisa digabung"""
+    # Nomor grup bergeser saat digabung, jadi regex dengan backreference
+    # tidak bisa ikut penyaring gabungan
+    if not patterns or any(_BACKREFERENCE.search(pattern) for pattern in patterns):
+        return None
+    try:
+        return re.compile('|'.join(f'(?:{pattern})' for pattern in patterns), flags)
+    except re.error:
+        # Misalnya nama grup yang sama di dua regex; periksa satu per satu
+        return None
+
+
+def _lowercase_safe(pattern: str) -> bool:
+    """Regex ASCII tanpa huruf besar: tanpa IGNORECASE terhadap teks ASCII yang
+    sudah dikecilkan hasilnya sama dengan IGNORECASE terhadap teks aslinya"""
+    if not pattern.isascii():
+        return False
+    for escape in _ESCAPE.findall(pattern):
+        # \D \S \W \B \A \Z tidak bergantung huruf besar/kecil; \x41 dsb. bisa berarti huruf besar
+        if escape in 'xuUN01234567' or escape.isupper() and escape not in 'DSWBAZ':
+            return False
+    return not any(ch.isupper() for ch in _ESCAPE.sub('', pattern))
+
+
+class RuleSet:
+    """Kumpulan aturan yang sudah dikompilasi untuk pencocokan massal"""
+
+    def __init__(self, rules: Iterable[Rule]):
+        # Posisi di self.rules = peringkat; indeks lebih kecil menang
+        self.rules: List[Rule] = sorted(rules, key=_rank)
+        self._matchers: Dict[str, _TypeMatcher] = {
+            type_: _TypeMatcher([(i, rule) for i, rule in enumerate(self.rules)
+                                 if rule.category_type == type_])
+            for type_ in {rule.category_type for rule in self.rules}
+        }
+
+    @classmethod
+    def load(cls, db: Database) -> 'RuleSet':
+        return cls(Rule.from_row(row) for row in db.get_category_rules())
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def match(self, type_: str, amount: float, description: Optional[str]) -> Optional[Rule]:
+        """Aturan pemenang untuk sebuah transaksi, None jika tidak ada yang cocok"""
+        matcher = self._matchers.get(type_)
+        if matcher is None:
+            return None
+        rules = self.rules
+        best = matcher.amounts.best(amount)
+        if best is None:
+            best = len(rules)
+        for index in sorted(matcher.phrases.find(normalize_description(description).split())):
+            if index >= best:
+                break
+            if rules[index].applies_to(type_, amount):
+                best = index
+                break
+
+        if matcher.regexes and description:
+            best = matcher.best_regex(rules, type_, amount, description, best)
+        return rules[best] if best < len(rules) else None
+
+    def categorize(self, type_: str, amount: float, description: Optional[str]) -> Optional[int]:
+        """ID kategori dari aturan pemenang, None jika tidak ada"""
+        rule = self.match(type_, amount, description)
+        return rule.category_id if rule else None
+
+
+@dataclass
+class RecategorizeResult:
+    """Hasil menerapkan aturan ke transaksi yang sudah ada"""
+    scanned: int = 0
+    matched: int = 0
+    changed: int = 0
+    elapsed: float = 0.0
+
+
+def recategorize(db: Database, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                 dry_run: bool = False, rules: Optional[RuleSet] = None) -> RecategorizeResult:
+    """Menerapkan aturan ke riwayat transaksi dalam rentang tanggal.
+
+    Transaksi yang tidak cocok aturan mana pun tidak diubah. Perubahan
+    dikumpulkan dulu lalu disimpan sekaligus lewat
+    `Database.recategorize_transactions`.
+    """
+    rules = rules if rules is not None else RuleSet.load(db)
+    result = RecategorizeResult()
+    started = time.perf_counter()
+    changes = []
+    if len(rules):
+        for row in db.iter_categorization_rows(start_date, end_date):
+            result.scanned += 1
+            category_id = rules.categorize(row['type'], row['amount'], row['description'])
+            if category_id is None:
+                continue
+            result.matched += 1
+            if category_id != row['category_id']:
+                changes.append((row['id'], category_id))
+    result.changed = len(changes)
+    if changes and not dry_run:
+        db.recategorize_transactions(changes)
+    result.elapsed = time.perf_counter() - started
+    return result
+
@@ -0,0 +1,280 @@
+"""
+Snapshot kolumnar transaksi untuk analisis offline
+
+Snapshot adalah satu folder berisi array berukuran tetap per kolom (biner,
+byte order mesin) yang dibuka dengan `mmap` dan dibaca tanpa disalin:
+
+    id.bin            int64    ID transaksi (urut naik)
+    date.bin          int32    tanggal sebagai angka YYYYMMDD
+    amount.bin        float64  jumlah
+    category.bin      int32    category_id
+    type.bin          int8     0 = income, 1 = expense
+    desc_end.bin      int64    offset akhir deskripsi baris ke-i
+    descriptions.bin           deskripsi UTF-8 yang disambung
+    meta.json                  jumlah baris, ID terakhir, tabel kategori
+
+`meta.json` ditulis paling akhir (atomic replace), jadi byte di file kolom
+setelah `rows` baris diabaikan pembaca dan ditimpa pada append berikutnya.
+Transaksi baru cukup di-append. Jika ada transaksi yang diedit atau dihapus
+sejak snapshot dibuat (penghitung `transaction_rewrites` berubah), snapshot
+dibangun ulang di folder baru lalu ditukar, sehingga pembaca yang masih
+membuka snapshot lama tidak terganggu.
+
+Jika numpy terinstall, kolom berupa array numpy (`np.frombuffer`, tetap
+zero-copy) dan agregasi memakai operasi vektor; tanpa numpy kolom berupa
+memoryview dan agregasi memakai loop Python biasa.
+"""
+import json
+import mmap
+import os
+import shutil
+import sys
+from array import array
+from itertools import islice
+from typing import Dict, List, Optional, Tuple
+
+from database import Database
+
+try:
+    import numpy as np
+except ImportError:  # numpy opsional
+    np = None
+
+FORMAT_VERSION = 1
+COLUMNS = {  # nama kolom -> typecode array/numpy
+    'id': 'q',
+    'date': 'i',
+    'amount': 'd',
+    'category': 'i',
+    'type': 'b',
+    'desc_end': 'q',
+}
+TYPE_CODES = {'income': 0, 'expense': 1}
+META_FILE = 'meta.json'
+DESCRIPTIONS_FILE = 'descriptions.bin'
+
+
+def default_path(db: Database) -> str:
+    """Lokasi snapshot bawaan: di samping file database"""
+    return db.db_name + '.snapshot'
+
+
+def encode_date(date: str) -> int:
+    """'2024-07-15' -> 20240715"""
+    return int(date[:4]) * 10000 + int(date[5:7]) * 100 + int(date[8:10])
+
+
+def decode_date(value: int) -> str:
+    """20240715 -> '2024-07-15'"""
+    return f"{value // 10000:04d}-{value // 100 % 100:02d}-{value % 100:02d}"
+
+
+def _read_meta(path: str) -> Optional[dict]:
+    """Metadata snapshot, None jika belum ada atau formatnya tidak cocok"""
+    try:
+        with open(os.path.join(path, META_FILE), encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get('version') != FORMAT_VERSION or meta.get('byteorder') != sys.byteorder:
+        return None
+    return meta
+
+
+def _write_meta(path: str, meta: dict):
+    temp = os.path.join(path, META_FILE + '.tmp')
+    with open(temp, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(temp, os.path.join(path, META_FILE))
+
+
+def _category_table(db: Database) -> Dict[str, dict]:
+    return {str(cat['id']): {'name': cat['name'], 'type': cat['type'], 'parent_id': cat['parent_id']}
+            for cat in db.get_all_categories()}
+
+
+def write_snapshot(db: Database, path: Optional[str] = None,
+                   batch_size: int = 50000) -> Tuple[int, bool]:
+    """Membuat atau memperbarui snapshot.
+
+    Mengembalikan (jumlah baris yang ditulis, True jika dibangun ulang).
+    """
+    path = path or default_path(db)
+    rewrites = db.transaction_rewrites()
+    meta = _read_meta(path)
+    rebuild = meta is None or meta['rewrites'] != rewrites
+    target = path + '.new' if rebuild else path
+    if rebuild:
+        shutil.rmtree(target, ignore_errors=True)
+        os.makedirs(target)
+        meta = {'version': FORMAT_VERSION, 'byteorder': sys.byteorder, 'rows': 0,
+                'last_id': 0, 'desc_bytes': 0, 'rewrites': rewrites}
+
+    # Buang sisa append yang tidak sempat tercatat di meta.json
+    files = {}
+    for name, code in COLUMNS.items():
+        files[name] = open(os.path.join(target, name + '.bin'), 'ab')
+        files[name].truncate(meta['rows'] * array(code).itemsize)
+    files['descriptions'] = open(os.path.join(target, DESCRIPTIONS_FILE), 'ab')
+    files['descriptions'].truncate(meta['desc_bytes'])
+
+    written = 0
+    try:
+        rows = db.iter_transactions(batch_size, after_id=meta['last_id'])
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            columns = {name: array(code) for name, code in COLUMNS.items()}
+            descriptions = bytearray()
+            for row in batch:
+                columns['id'].append(row['id'])
+                columns['date'].append(encode_date(row['date']))
+                columns['amount'].append(row['amount'])
+                columns['category'].append(row['category_id'])
+                columns['type'].append(TYPE_CODES[row['type']])
+                descriptions += (row['description'] or '').encode('utf-8')
+                columns['desc_end'].append(meta['desc_bytes'] + len(descriptions))
+            for name, values in columns.items():
+                values.tofile(files[name])
+            files['descriptions'].write(descriptions)
+            meta['rows'] += len(batch)
+            meta['desc_bytes'] += len(descriptions)
+            meta['last_id'] = batch[-1]['id']
+            written += len(batch)
+    finally:
+        for f in files.values():
+            f.close()
+
+    meta['categories'] = _category_table(db)
+    _write_meta(target, meta)
+    if rebuild:
+        old = path + '.old'
+        shutil.rmtree(old, ignore_errors=True)
+        if os.path.exists(path):
+            os.rename(path, old)
+        os.rename(target, path)
+        shutil.rmtree(old, ignore_errors=True)
+    return written, rebuild
+
+
+class ColumnarSnapshot:
+    """Snapshot yang dibuka read-only lewat mmap.
+
+    `columns` berisi array per kolom (lihat COLUMNS) sepanjang `rows`.
+    """
+
+    def __init__(self, path: str):
+        meta = _read_meta(path)
+        if meta is None:
+            raise FileNotFoundError(f"Snapshot tidak ditemukan atau formatnya tidak cocok: {path}")
+        self.path = path
+        self.rows: int = meta['rows']
+        self.last_id: int = meta['last_id']
+        self.categories = {int(cid): cat for cid, cat in meta['categories'].items()}
+        self._maps: List[mmap.mmap] = []
+        self.columns = {name: self._column(name, code) for name, code in COLUMNS.items()}
+        self._descriptions = self._map(DESCRIPTIONS_FILE, meta['desc_bytes'])
+
+    def _map(self, filename: str, size: int) -> memoryview:
+        if size == 0:
+            return memoryview(b'')
+        with open(os.path.join(self.path, filename), 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        return memoryview(mapped)
+
+    def _column(self, name: str, code: str):
+        view = self._map(name + '.bin', self.rows * array(code).itemsize).cast(code)
+        return np.frombuffer(view, dtype=code) if np is not None else view
+
+    def close(self):
+        self.columns = {}
+        self._descriptions = None
+        for mapped in self._maps:
+            try:
+                mapped.close()
+            except BufferError:
+                pass  # Masih ada array milik pemanggil; dilepas saat array itu dibuang
+        self._maps = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def description(self, index: int) -> Optional[str]:
+        """Deskripsi baris ke-`index` (None jika kosong)"""
+        ends = self.columns['desc_end']
+        start = int(ends[index - 1]) if index else 0
+        text = bytes(self._descriptions[start:int(ends[index])]).decode('utf-8')
+        return text or None
+
+    def _date_range(self, start_date: Optional[str], end_date: Optional[str]) -> Tuple[int, int]:
+        return (encode_date(start_date) if start_date else 0,
+                encode_date(end_date) if end_date else 99991231)
+
+    def category_totals(self, start_date: Optional[str] = None,
+                        end_date: Optional[str] = None) -> Dict[int, Tuple[float, int]]:
+        """Total dan jumlah transaksi per category_id dalam rentang tanggal (inklusif)"""
+        low, high = self._date_range(start_date, end_date)
+        dates, amounts, categories = (self.columns[name] for name in ('date', 'amount', 'category'))
+        if np is not None:
+            if start_date or end_date:
+                mask = (dates >= low) & (dates <= high)
+                amounts, categories = amounts[mask], categories[mask]
+            totals = np.bincount(categories, weights=amounts)
+            counts = np.bincount(categories)
+            return {int(cid): (float(totals[cid]), int(counts[cid])) for cid in np.flatnonzero(counts)}
+
+        result: Dict[int, List] = {}
+        for date, amount, category_id in zip(dates, amounts, categories):
+            if low <= date <= high:
+                entry = result.get(category_id)
+                if entry is None:
+                    result[category_id] = [amount, 1]
+                else:
+                    entry[0] += amount
+                    entry[1] += 1
+        return {cid: (total, count) for cid, (total, count) in result.items()}
+
+    def monthly_totals(self) -> List[Tuple[str, float, float]]:
+        """(periode YYYY-MM, pemasukan, pengeluaran) per bulan, urut periode"""
+        dates, amounts, types = (self.columns[name] for name in ('date', 'amount', 'type'))
+        if np is not None:
+            if not self.rows:
+                return []
+            months = dates // 10000 * 12 + dates // 100 % 100 - 1  # Bulan sejak tahun 0
+            first = int(months.min())
+            index = (months - first) * 2 + types  # Dua bin per bulan: income, expense
+            totals = np.bincount(index, weights=amounts, minlength=2 * (int(months.max()) - first + 1))
+            counts = np.bincount(index, minlength=len(totals))
+            return [(f"{(first + slot) // 12:04d}-{(first + slot) % 12 + 1:02d}",
+                     float(totals[2 * slot]), float(totals[2 * slot + 1]))
+                    for slot in range(len(totals) // 2) if counts[2 * slot] or counts[2 * slot + 1]]
+
+        sums: Dict[int, List[float]] = {}
+        for date, amount, type_ in zip(dates, amounts, types):
+            sums.setdefault(date // 100, [0.0, 0.0])[type_] += amount
+        return [(f"{month // 100:04d}-{month % 100:02d}", income, expense)
+                for month, (income, expense) in sorted(sums.items())]
+
+    def summary(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> dict:
+        """Ringkasan seperti Database.get_balance_summary (tanpa hierarki kategori)"""
+        totals = self.category_totals(start_date, end_date)
+        income = sum(total for cid, (total, _) in totals.items()
+                     if self.categories.get(cid, {}).get('type') == 'income')
+        expense = sum(total for cid, (total, _) in totals.items()
+                      if self.categories.get(cid, {}).get('type') == 'expense')
+        by_category = sorted(
+            ({'category_id': cid, 'name': self.categories.get(cid, {}).get('name', 'Unknown'),
+              'type': self.categories.get(cid, {}).get('type'), 'total': total, 'count': count}
+             for cid, (total, count) in totals.items()),
+            key=lambda row: row['total'], reverse=True
+        )
+        return {'total_income': income, 'total_expense': expense,
+                'balance': income - expense, 'by_category': by_category}
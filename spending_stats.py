@@ -0,0 +1,114 @@
+"""
+Statistik sebaran jumlah transaksi (median, p90, p99) per kategori
+
+Menghitung persentil secara eksak butuh mengurutkan semua jumlah. Sebagai
+gantinya setiap transaksi dimasukkan ke bucket logaritmik (gaya DDSketch,
+lihat `utils.amount_bucket`) dan tabel `amount_sketches` menyimpan jumlah
+transaksi per (kategori, bulan, bucket), dijaga trigger pada setiap insert,
+update, dan delete. Sketch ini bisa digabung (cukup menjumlahkan count per
+bucket), jadi persentil untuk rentang bulan mana pun dihitung dari paling
+banyak beberapa ratus bucket per kategori, berapa pun jumlah transaksinya,
+dengan galat relatif maksimal 1%.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from database import Database
+from utils import SKETCH_GAMMA, SKETCH_ZERO_BUCKET
+
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99)
+
+
+def bucket_value(bucket: int) -> float:
+    """Nilai wakil sebuah bucket (titik tengah relatif batas bawah dan atasnya)"""
+    if bucket == SKETCH_ZERO_BUCKET:
+        return 0.0
+    return 2 * SKETCH_GAMMA ** bucket / (SKETCH_GAMMA + 1)
+
+
+@dataclass
+class QuantileSketch:
+    """Histogram bucket logaritmik yang bisa digabung"""
+    counts: Dict[int, int] = field(default_factory=dict)
+    count: int = 0
+
+    def add(self, bucket: int, count: int = 1):
+        self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.count += count
+
+    def merge(self, other: 'QuantileSketch'):
+        for bucket, count in other.counts.items():
+            self.add(bucket, count)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimasi kuantil q (0..1), None jika sketch kosong"""
+        if self.count <= 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen > rank:
+                return bucket_value(bucket)
+        return bucket_value(max(self.counts))
+
+
+def distribution(sketch: QuantileSketch, bins: int = 8) -> List[Tuple[float, float, int]]:
+    """Histogram kasar (batas bawah, batas atas, jumlah) dengan lebar bin
+    logaritmik yang sama, untuk ditampilkan sebagai grafik batang"""
+    buckets = sorted(b for b in sketch.counts if b != SKETCH_ZERO_BUCKET)
+    if not buckets:
+        return []
+    low, high = buckets[0], buckets[-1]
+    width = max(1, -(-(high - low + 1) // bins))  # Pembagian dibulatkan ke atas
+    histogram = []
+    for start in range(low, high + 1, width):
+        count = sum(sketch.counts.get(b, 0) for b in range(start, start + width))
+        histogram.append((SKETCH_GAMMA ** (start - 1), SKETCH_GAMMA ** (start + width - 1), count))
+    return histogram
+
+
+@dataclass
+class CategoryStats:
+    """Ringkasan sebaran satu kategori"""
+    category_id: int
+    category_name: str
+    count: int
+    quantiles: Dict[float, float]  # kuantil -> jumlah
+    sketch: QuantileSketch
+
+
+class SpendingStats:
+    """Persentil jumlah transaksi per kategori dari tabel amount_sketches"""
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    def sketches(self, type_: str = 'expense', start_period: Optional[str] = None,
+                 end_period: Optional[str] = None,
+                 category_id: Optional[int] = None) -> Dict[int, QuantileSketch]:
+        """Sketch gabungan per kategori untuk rentang periode YYYY-MM"""
+        sketches: Dict[int, QuantileSketch] = {}
+        for row in self.db.get_amount_histogram(type_, start_period, end_period, category_id):
+            sketches.setdefault(row['category_id'], QuantileSketch()).add(row['bucket'], row['count'])
+        return sketches
+
+    def by_category(self, type_: str = 'expense', start_period: Optional[str] = None,
+                    end_period: Optional[str] = None, quantiles: Sequence[float] = DEFAULT_QUANTILES
+                    ) -> Tuple[List[CategoryStats], Optional[CategoryStats]]:
+        """Statistik per kategori (urut jumlah transaksi) beserta gabungan semuanya"""
+        names = {cat['id']: cat['name'] for cat in self.db.get_all_categories(type_)}
+        overall = QuantileSketch()
+        result = []
+        for category_id, sketch in self.sketches(type_, start_period, end_period).items():
+            overall.merge(sketch)
+            result.append(self._stats(category_id, names.get(category_id, 'Unknown'), sketch, quantiles))
+        result.sort(key=lambda stats: stats.count, reverse=True)
+        total = self._stats(0, 'Semua kategori', overall, quantiles) if overall.count else None
+        return result, total
+
+    @staticmethod
+    def _stats(category_id: int, name: str, sketch: QuantileSketch,
+               quantiles: Iterable[float]) -> CategoryStats:
+        return CategoryStats(category_id, name, sketch.count,
+                             {q: sketch.quantile(q) for q in quantiles}, sketch)
@@ -0,0 +1,170 @@
+"""
+Sinkronisasi inkremental antar perangkat lewat file
+
+Setiap perubahan kategori dan transaksi dicatat trigger di tabel
+`change_log` dengan nomor urut (seq) yang selalu naik. Export hanya
+mengirim perubahan sejak seq terakhir yang pernah dikirim ke perangkat
+tujuan, jadi ukuran file dan waktu proses sebanding dengan jumlah
+perubahan, bukan ukuran ledger. File bisa dipindahkan dengan cara apa pun
+(flashdisk, folder cloud, email).
+
+Format file (JSON Lines, opsional .gz): baris pertama header
+
+    {"format": "py-money-sync", "version": 1, "device_id": ..., "device_name": ...,
+     "from_seq": ..., "to_seq": ...}
+
+lalu satu baris per perubahan:
+
+    {"table": "transactions", "uid": ..., "op": "upsert", "changed_at": ...,
+     "origin": ..., "data": {"type", "amount", "category", "description", "date"}}
+
+Transaksi diidentifikasi dengan kolom `uid`, kategori dengan namanya.
+Konflik diselesaikan last-writer-wins per baris (lihat
+`Database.apply_changes`). Tag tidak ikut disinkronkan.
+"""
+import json
+from dataclasses import dataclass
+from typing import Iterator, Optional, Tuple
+
+from database import Database
+from transfer import open_text
+
+FORMAT_NAME = 'py-money-sync'
+FORMAT_VERSION = 1
+
+
+@dataclass
+class SyncResult:
+    """Hasil menerapkan satu file sinkronisasi"""
+    peer: str
+    applied: int = 0
+    skipped: int = 0  # Sudah pernah diterapkan
+    conflicts: int = 0  # Dikalahkan perubahan lokal yang lebih baru
+    to_seq: int = 0
+
+
+def _change_record(row) -> dict:
+    data = None
+    if row['op'] == 'upsert':
+        if row['table_name'] == 'categories':
+            data = {'type': row['category_type'], 'parent': row['parent_name']}
+        else:
+            data = {'type': row['type'], 'amount': row['amount'], 'category': row['category_name'],
+                    'description': row['description'], 'date': row['date']}
+    return {'table': row['table_name'], 'uid': row['uid'], 'op': row['op'],
+            'changed_at': row['changed_at'], 'origin': row['origin'], 'data': data}
+
+
+def export_changes(db: Database, path: str, peer: str,
+                   since: Optional[int] = None) -> Tuple[int, int, int]:
+    """Menulis perubahan yang belum dikirim ke `peer` ke file `path`.
+
+    `since` memaksa mulai dari seq tertentu (0 = kirim ulang semuanya).
+    Mengembalikan (jumlah perubahan, from_seq, to_seq).
+    """
+    record = db.get_sync_peer(name=peer)
+    if since is None:
+        since = record['last_sent_seq'] if record else 0
+    until = db.max_change_seq()
+    device_id, device_name = db.get_sync_device()
+    header = {'format': FORMAT_NAME, 'version': FORMAT_VERSION, 'device_id': device_id,
+              'device_name': device_name, 'from_seq': since, 'to_seq': until}
+
+    count = 0
+    with open_text(path, 'w') as f:
+        f.write(json.dumps(header, ensure_ascii=False) + '\n')
+        for row in db.iter_changes(since, until, record['device_id'] if record else None):
+            f.write(json.dumps(_change_record(row), ensure_ascii=False) + '\n')
+            count += 1
+    db.save_sync_peer(peer, last_sent_seq=until)
+    return count, since, until
+
+
+class SyncFile:
+    """File sinkronisasi yang dibuka untuk dibaca; `header` dibaca langsung,
+    perubahan dibaca bertahap lewat `changes()`"""
+
+    def __init__(self, path: str):
+        self._file = open_text(path, 'r')
+        try:
+            header = json.loads(self._file.readline() or 'null')
+            if not isinstance(header, dict) or header.get('format') != FORMAT_NAME:
+                raise ValueError(f"Bukan file sinkronisasi py-money: {path}")
+            if header.get('version') != FORMAT_VERSION:
+                raise ValueError(f"Versi file sinkronisasi tidak didukung: {header.get('version')}")
+        except ValueError:
+            self._file.close()
+            raise
+        self.header: dict = header
+
+    def changes(self) -> Iterator[dict]:
+        for line in self._file:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _bind_peer(db: Database, header: dict, peer: Optional[str]):
+    """Baris sync_peers untuk perangkat yang device_id-nya belum dikenal
+    (None jika harus dibuat baru); satu perangkat selalu satu baris"""
+    if peer:
+        record = db.get_sync_peer(name=peer)
+        if record is not None and record['device_id'] is not None:
+            raise ValueError(f"Nama perangkat '{peer}' sudah dipakai perangkat lain, "
+                             f"beri nama lain dengan --peer")
+        return record
+
+    # Export yang belum pernah dibalas belum tahu device_id tujuannya; tanpa
+    # --peer tidak jelas baris mana milik pengirim file ini
+    unbound = [row['name'] for row in db.get_sync_peers() if row['device_id'] is None]
+    if unbound:
+        raise ValueError(f"Perangkat '{header['device_name']}' belum dikenal. Sebutkan nama yang "
+                         f"dipakai saat export ke perangkat itu dengan --peer "
+                         f"(belum terhubung: {', '.join(unbound)}).")
+    record = db.get_sync_peer(name=header['device_name'])
+    if record is not None:
+        raise ValueError(f"Nama perangkat '{record['name']}' sudah dipakai perangkat lain, "
+                         f"beri nama lain dengan --peer")
+    return None
+
+
+def apply_changes(db: Database, path: str, peer: Optional[str] = None) -> SyncResult:
+    """Menerapkan file hasil `export_changes` dari perangkat lain.
+
+    Perangkat pengirim dikenali dari device_id di header. Saat perangkat itu
+    pertama kali dikenal, device_id-nya diikat ke satu nama: `peer` (nama yang
+    dipakai saat export ke perangkat itu), atau nama perangkatnya sendiri jika
+    belum pernah ada export yang belum terikat.
+    """
+    with SyncFile(path) as sync_file:
+        header = sync_file.header
+        device_id, _ = db.get_sync_device()
+        if header['device_id'] == device_id:
+            raise ValueError("File ini berasal dari perangkat ini sendiri. Jika database disalin "
+                             "dari perangkat lain, buat ID baru dengan `sync device --reset`.")
+
+        record = db.get_sync_peer(device_id=header['device_id'])
+        if record is None:
+            record = _bind_peer(db, header, peer)
+        elif peer and peer != record['name']:
+            raise ValueError(f"Perangkat ini sudah dikenal sebagai '{record['name']}', bukan '{peer}'")
+        name = record['name'] if record else peer or header['device_name']
+        last_received = record['last_received_seq'] if record else 0
+        if header['from_seq'] > last_received:
+            raise ValueError(f"Ada perubahan yang terlewat: file dimulai dari seq {header['from_seq']}, "
+                             f"terakhir diterima dari '{name}' seq {last_received}. "
+                             f"Minta export ulang dengan --since {last_received}.")
+
+        counts = db.apply_changes(sync_file.changes())
+    db.save_sync_peer(name, header['device_id'], last_received_seq=header['to_seq'])
+    return SyncResult(name, counts['applied'], counts['skipped'], counts['conflicts'],
+                      header['to_seq'])
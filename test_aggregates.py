@@ -0,0 +1,122 @@
+"""
+Agregat yang dijaga trigger harus sama dengan hasil hitung ulang dari tabel
+transaksi setelah insert, update, dan delete
+
+Jalankan dengan: python -m unittest test_aggregates
+"""
+import os
+import random
+import tempfile
+import unittest
+
+from anomaly import BUCKET_LOG
+from database import Database
+from spending_stats import SpendingStats
+from utils import SKETCH_RELATIVE_ACCURACY, SKETCH_ZERO_BUCKET
+
+
+class TriggerAggregateTest(unittest.TestCase):
+    """Total bulanan, sketch kuantil, dan statistik Welford per kategori"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.workdir = tempfile.TemporaryDirectory()
+        cls.db = Database(os.path.join(cls.workdir.name, 'test.db'), cache_size=0)
+        rng = random.Random(42)
+        expense = [cat['id'] for cat in cls.db.get_all_categories('expense')][:3]
+        income = [cat['id'] for cat in cls.db.get_all_categories('income')][:1]
+        cls.expense_ids = expense
+        cls.db.add_transactions_bulk(
+            ('expense', round(rng.lognormvariate(10, 1), 2), rng.choice(expense), f"belanja {i}",
+             f"2024-{rng.randint(1, 6):02d}-{rng.randint(1, 28):02d}")
+            for i in range(3000)
+        )
+        cls.db.add_transactions_bulk(
+            ('income', 5_000_000.0, income[0], 'gaji', f"2024-{month:02d}-25") for month in range(1, 7)
+        )
+
+        # Edit (jumlah, kategori, bulan) dan hapus sebagian transaksi
+        for transaction_id in rng.sample(range(1, 3001), 300):
+            row = cls.db.get_transaction(transaction_id)
+            cls.db.update_transaction(transaction_id, row['amount'] * rng.choice((0.5, 2, 10)),
+                                      rng.choice(expense), row['description'],
+                                      f"2024-{rng.randint(1, 6):02d}-{rng.randint(1, 28):02d}")
+        for transaction_id in rng.sample(range(1, 3001), 200):
+            cls.db.delete_transaction(transaction_id)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.db.close()
+        cls.workdir.cleanup()
+
+    def query(self, sql: str, params: tuple = ()) -> list:
+        return [tuple(row) for row in self.db.get_connection().execute(sql, params).fetchall()]
+
+    def test_monthly_totals_match_sum(self):
+        stored = {row[:2]: row[2:] for row in self.query(
+            'SELECT category_id, period, total, count FROM category_monthly_totals')}
+        recomputed = {row[:2]: row[2:] for row in self.query('''
+            SELECT category_id, substr(date, 1, 7), SUM(amount), COUNT(*) FROM transactions
+            GROUP BY category_id, substr(date, 1, 7)
+        ''')}
+        self.assertEqual(sorted(stored), sorted(recomputed))
+        for key, (total, count) in recomputed.items():
+            with self.subTest(key=key):
+                self.assertEqual(stored[key][1], count)
+                self.assertAlmostEqual(stored[key][0], total, places=2)
+
+    def test_monthly_balance_series_is_running_sum(self):
+        series = self.db.get_monthly_balance_series()
+        recomputed = self.query('''
+            SELECT substr(date, 1, 7), SUM(CASE WHEN type = 'income' THEN amount ELSE -amount END)
+            FROM transactions GROUP BY substr(date, 1, 7) ORDER BY substr(date, 1, 7)
+        ''')
+        self.assertEqual([row['period'] for row in series], [period for period, _ in recomputed])
+        balance = 0.0
+        for row, (period, net) in zip(series, recomputed):
+            balance += net
+            self.assertAlmostEqual(row['balance'], balance, places=2, msg=period)
+
+    def test_amount_sketches_match_group_by(self):
+        stored = self.query('''
+            SELECT category_id, period, bucket, count FROM amount_sketches
+            ORDER BY category_id, period, bucket
+        ''')
+        recomputed = self.query('''
+            SELECT category_id, substr(date, 1, 7), amount_bucket, COUNT(*) FROM transactions
+            GROUP BY category_id, substr(date, 1, 7), amount_bucket
+            ORDER BY category_id, substr(date, 1, 7), amount_bucket
+        ''')
+        self.assertEqual(stored, recomputed)
+
+    def test_sketch_quantiles_within_relative_accuracy(self):
+        sketches = SpendingStats(self.db).sketches('expense')
+        for category_id in self.expense_ids:
+            amounts = sorted(amount for (amount,) in self.query(
+                'SELECT amount FROM transactions WHERE category_id = ?', (category_id,)))
+            for q in (0.5, 0.9, 0.99):
+                with self.subTest(category_id=category_id, q=q):
+                    exact = amounts[int(q * (len(amounts) - 1))]
+                    estimate = sketches[category_id].quantile(q)
+                    self.assertLessEqual(abs(estimate - exact) / exact, SKETCH_RELATIVE_ACCURACY + 1e-9)
+
+    def test_welford_stats_match_recomputed(self):
+        stored = {row[0]: row[1:] for row in self.query(
+            'SELECT category_id, count, mean, m2 FROM category_amount_stats')}
+        buckets = {}
+        for category_id, bucket in self.query('SELECT category_id, amount_bucket FROM transactions'):
+            if bucket is not None and bucket != SKETCH_ZERO_BUCKET:
+                buckets.setdefault(category_id, []).append(bucket * BUCKET_LOG)
+        self.assertEqual(sorted(stored), sorted(buckets))
+        for category_id, values in buckets.items():
+            with self.subTest(category_id=category_id):
+                count, mean, m2 = stored[category_id]
+                expected_mean = sum(values) / len(values)
+                self.assertEqual(count, len(values))
+                self.assertAlmostEqual(mean, expected_mean, places=6)
+                self.assertAlmostEqual(m2 / count, sum((x - expected_mean) ** 2 for x in values) / count,
+                                       places=6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+"""
+Penyimpanan lampiran berbasis hash isi: baca ulang, blob bersama, gc
+
+Jalankan dengan: python -m unittest test_attachments
+"""
+import os
+import tempfile
+import unittest
+
+from attachments import CHUNK_SIZE, AttachmentStore
+from database import Database
+
+
+class AttachmentStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.db = Database(self.path('test.db'), cache_size=0)
+        self.store = AttachmentStore(self.db)
+        food = self.db.get_category_id_by_name('Makanan')
+        self.first = self.db.add_transaction('expense', 25000, food, 'Kopi', '2024-05-01')
+        self.second = self.db.add_transaction('expense', 30000, food, 'Roti', '2024-05-02')
+        # Lebih dari beberapa potongan agar pembacaan bertahap ikut teruji
+        self.content = b''.join(f"baris struk {i}\n".encode() for i in range(3 * CHUNK_SIZE // 10))
+
+    def tearDown(self):
+        self.db.close()
+        self.workdir.cleanup()
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.workdir.name, name)
+
+    def write(self, name: str, content: bytes) -> str:
+        with open(self.path(name), 'wb') as f:
+            f.write(content)
+        return self.path(name)
+
+    def blob_files(self) -> list:
+        return [name for entry in os.scandir(self.store.path)
+                if entry.is_dir() and entry.path != self.store.temp_dir
+                for name in os.listdir(entry.path)]
+
+    def test_round_trip(self):
+        for compress in (True, False):
+            with self.subTest(compress=compress):
+                attachment_id = self.store.add(self.first, self.write('struk.txt', self.content),
+                                               compress=compress)
+                self.assertEqual(b''.join(self.store.iter_content(attachment_id)), self.content)
+
+        attachment = self.db.get_attachment(attachment_id)
+        self.assertEqual(attachment['size'], len(self.content))
+        self.assertEqual(attachment['filename'], 'struk.txt')
+
+    def test_same_content_shares_one_blob(self):
+        source = self.write('struk.txt', self.content)
+        first = self.store.add(self.first, source)
+        second = self.store.add(self.second, source, filename='salinan.txt')
+        self.assertEqual(self.db.get_attachment(first)['hash'], self.db.get_attachment(second)['hash'])
+        self.assertEqual(len(self.blob_files()), 1)
+
+    def test_corrupted_blob_is_detected(self):
+        attachment_id = self.store.add(self.first, self.write('struk.txt', self.content), compress=False)
+        blob = self.store.blob_path(self.db.get_attachment(attachment_id)['hash'])
+        with open(blob, 'r+b') as f:
+            f.write(b'X')
+        with self.assertRaises(ValueError):
+            b''.join(self.store.iter_content(attachment_id))
+
+    def test_gc_keeps_blobs_still_referenced(self):
+        source = self.write('struk.txt', self.content)
+        first = self.store.add(self.first, source)
+        self.store.add(self.second, source)
+        self.store.add(self.second, self.write('lain.txt', b'isi lain'))
+
+        self.assertTrue(self.store.remove(first))
+        self.assertEqual(self.store.gc()[0], 0)  # Blob struk masih dipakai transaksi kedua
+        self.assertEqual(len(self.blob_files()), 2)
+
+        self.db.delete_transaction(self.second)
+        self.assertEqual(self.store.gc()[0], 2)
+        self.assertEqual(self.blob_files(), [])
+
+    def test_extract_does_not_overwrite(self):
+        attachment_id = self.store.add(self.first, self.write('struk.txt', self.content))
+        target_dir = self.path('unduhan')
+        os.makedirs(target_dir)
+        self.assertEqual(self.store.extract(attachment_id, target_dir), len(self.content))
+
+        target = os.path.join(target_dir, 'struk.txt')
+        with open(target, 'wb') as f:
+            f.write(b'jangan ditimpa')
+        with self.assertRaises(ValueError):
+            self.store.extract(attachment_id, target_dir)
+        with open(target, 'rb') as f:
+            self.assertEqual(f.read(), b'jangan ditimpa')
+
+        self.store.extract(attachment_id, target, overwrite=True)
+        with open(target, 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+"""
+Deteksi duplikat saat import: Bloom filter dan mode skip/flag/merge
+
+Jalankan dengan: python -m unittest test_dedupe
+"""
+import csv
+import hashlib
+import os
+import tempfile
+import unittest
+
+from database import Database
+from dedupe import ScalableBloomFilter
+from transfer import import_transactions
+
+HEADER = ('type', 'amount', 'category', 'description', 'date')
+
+
+def fingerprint(i: int) -> str:
+    return hashlib.blake2b(str(i).encode(), digest_size=8).hexdigest()
+
+
+class ScalableBloomFilterTest(unittest.TestCase):
+
+    def test_no_false_negatives_and_bounded_false_positives(self):
+        bloom = ScalableBloomFilter(1000, error_rate=0.01)
+        for i in range(20_000):  # 20x kapasitas awal
+            bloom.add(fingerprint(i))
+        self.assertGreater(len(bloom.layers), 1)
+        self.assertTrue(all(fingerprint(i) in bloom for i in range(20_000)))
+        false_positives = sum(fingerprint(-i) in bloom for i in range(1, 20_001))
+        self.assertLess(false_positives / 20_000, 0.01)
+
+
+class DeduplicatorImportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.db = Database(os.path.join(self.workdir.name, 'test.db'), cache_size=0)
+
+    def tearDown(self):
+        self.db.close()
+        self.workdir.cleanup()
+
+    def write_csv(self, name: str, rows) -> str:
+        path = os.path.join(self.workdir.name, name)
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(HEADER)
+            writer.writerows(rows)
+        return path
+
+    def import_rows(self, rows, mode: str):
+        # Batch kecil agar duplikat di batch tertunda maupun yang sudah
+        # tersimpan sama-sama teruji
+        path = self.write_csv(f'{mode}.csv', rows)
+        return import_transactions(self.db, path, batch_size=2, dedupe=mode)
+
+    def stored(self) -> list:
+        return [tuple(row) for row in self.db.get_connection().execute(
+            'SELECT id, description, duplicate_of FROM transactions ORDER BY id').fetchall()]
+
+    def test_skip_drops_duplicates(self):
+        rows = [('expense', 25000, 'Makanan', 'Kopi', '2024-05-01'),
+                ('expense', 25000, 'Makanan', 'kopi ', '2024-05-01'),  # Deskripsi dinormalisasi
+                ('expense', 30000, 'Makanan', 'Roti', '2024-05-01'),
+                ('expense', 25000, 'Makanan', 'Kopi', '2024-05-02')]
+        result = self.import_rows(rows, 'skip')
+        self.assertEqual((result.imported, result.duplicates), (3, 1))
+
+        result = self.import_rows(rows, 'skip')
+        self.assertEqual((result.imported, result.duplicates), (0, 4))
+        self.assertEqual(self.db.count_transactions(), 3)
+
+    def test_flag_keeps_duplicates_pointing_to_original(self):
+        rows = [('expense', 25000, 'Makanan', 'Kopi', '2024-05-01'),
+                ('expense', 30000, 'Makanan', 'Roti', '2024-05-01'),
+                ('expense', 25000, 'Makanan', 'Kopi', '2024-05-01'),  # Asli di batch sebelumnya
+                ('expense', 25000, 'Makanan', 'Kopi', '2024-05-01')]  # Asli sudah tersimpan
+        result = self.import_rows(rows, 'flag')
+        self.assertEqual((result.imported, result.duplicates), (4, 2))
+        self.assertEqual(self.stored(), [(1, 'Kopi', None), (2, 'Roti', None),
+                                         (3, 'Kopi', 1), (4, 'Kopi', 1)])
+
+    def test_flag_in_pending_batch(self):
+        rows = [('expense', 25000, 'Makanan', 'Kopi', '2024-05-01'),
+                ('expense', 25000, 'Makanan', 'Kopi', '2024-05-01')]
+        result = self.import_rows(rows, 'flag')
+        self.assertEqual(result.duplicates, 1)
+        self.assertEqual(self.stored(), [(1, 'Kopi', None), (2, 'Kopi', 1)])
+
+    def test_merge_ignores_description_and_keeps_longest(self):
+        rows = [('expense', 25000, 'Makanan', 'Kopi', '2024-05-01'),
+                ('expense', 25000, 'Makanan', 'Kopi Kenangan', '2024-05-01'),  # Batch tertunda
+                ('expense', 30000, 'Makanan', 'Roti', '2024-05-01'),
+                ('expense', 30000, 'Makanan', 'Roti Bakar Bandung', '2024-05-01'),  # Sudah tersimpan
+                ('expense', 25000, 'Makanan', 'Kopi', '2024-05-02')]
+        result = self.import_rows(rows, 'merge')
+        self.assertEqual((result.imported, result.duplicates), (3, 2))
+        self.assertEqual(self.stored(), [(1, 'Kopi Kenangan', None), (2, 'Roti Bakar Bandung', None),
+                                         (3, 'Kopi', None)])
+
+        result = self.import_rows([('expense', 25000, 'Makanan', 'Kopi Kenangan Senopati', '2024-05-01')],
+                                  'merge')
+        self.assertEqual((result.imported, result.duplicates), (0, 1))
+        self.assertEqual(self.db.get_transaction(1)['description'], 'Kopi Kenangan Senopati')
+
+
+if __name__ == '__main__':
+    unittest.main()
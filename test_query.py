@@ -0,0 +1,72 @@
+"""
+Memastikan query hasil TransactionQuery memakai index (EXPLAIN QUERY PLAN)
+
+Jalankan dengan: python -m unittest test_query
+"""
+import os
+import tempfile
+import unittest
+
+from database import Database
+from query import TransactionQuery
+
+
+class TransactionQueryPlanTest(unittest.TestCase):
+    """Setiap kombinasi filter yang umum harus dilayani index, bukan scan tabel"""
+
+    # Kombinasi filter -> awalan detail plan yang wajib ada untuk tabel transaksi
+    CASES = {
+        'tanpa filter': (TransactionQuery(), 'SCAN t USING INDEX idx_transactions_date'),
+        'tanpa filter, naik': (TransactionQuery(descending=False),
+                               'SCAN t USING INDEX idx_transactions_date'),
+        'tipe': (TransactionQuery(type='expense'), 'SEARCH t USING INDEX idx_transactions_type_date'),
+        'kategori': (TransactionQuery(category_ids=[4, 5]),
+                     'SEARCH t USING INDEX idx_transactions_category_date'),
+        'rentang tanggal': (TransactionQuery(start_date='2024-01-01', end_date='2024-01-31'),
+                            'SEARCH t USING INDEX idx_transactions_date'),
+        'rentang jumlah, urut jumlah': (TransactionQuery(min_amount=10000, max_amount=50000, sort='amount'),
+                                        'SEARCH t USING INDEX idx_transactions_amount'),
+        'tipe + kategori + tanggal': (TransactionQuery(type='expense', category_ids=[4],
+                                                       start_date='2024-01-01', end_date='2024-12-31'),
+                                      'SEARCH t USING INDEX'),
+        'teks': (TransactionQuery(text='kopi'), 'SCAN t USING INDEX idx_transactions_date'),
+        'tag (salah satu)': (TransactionQuery(tags_any=['trip-bali'], limit=None),
+                             'SEARCH t USING INTEGER PRIMARY KEY'),
+        'tag (semua)': (TransactionQuery(tags_all=['trip-bali', 'reimburse'], limit=None),
+                        'SEARCH t USING INTEGER PRIMARY KEY'),
+        'tag + tanggal (probe)': (TransactionQuery(tags_any=['trip-bali'], probe_tags=True,
+                                                   start_date='2024-07-01', end_date='2024-07-10'),
+                                  'SEARCH t USING INDEX idx_transactions_date'),
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        cls.workdir = tempfile.TemporaryDirectory()
+        cls.db = Database(os.path.join(cls.workdir.name, 'test.db'))
+        categories = [cat['id'] for cat in cls.db.get_all_categories('expense')]
+        cls.db.add_transactions_bulk(
+            ('expense', 1000.0 * (i % 97 + 1), categories[i % len(categories)], f"kopi {i}",
+             f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}")
+            for i in range(2000)
+        )
+        cls.db.tag_transactions(list(range(1, 200)), ['trip-bali'])
+        cls.db.tag_transactions(list(range(100, 300)), ['reimburse'])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.db.close()
+        cls.workdir.cleanup()
+
+    def test_filters_use_index(self):
+        for name, (query, expected) in self.CASES.items():
+            with self.subTest(name):
+                plan = self.db.explain_query(query)
+                self.assertTrue(any(detail.startswith(expected) for detail in plan),
+                                f"{expected!r} tidak ada di plan: {plan}")
+                self.assertNotIn('SCAN t', plan, f"scan tabel penuh: {plan}")
+                self.assertFalse(any(detail.startswith('SCAN transactions') for detail in plan),
+                                 f"scan tabel penuh: {plan}")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+"""
+Rekonsiliasi mutasi bank dengan ledger (merge-join dengan toleransi)
+
+Jalankan dengan: python -m unittest test_reconcile
+"""
+import os
+import tempfile
+import unittest
+
+from database import Database
+from reconcile import Reconciler, StatementLine, parse_statement_line
+
+
+class ReconcilerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.db = Database(os.path.join(self.workdir.name, 'test.db'), cache_size=0)
+        food = self.db.get_category_id_by_name('Makanan')
+        salary = self.db.get_category_id_by_name('Gaji')
+        self.ids = {name: self.db.add_transaction(type_, amount, category, name, date)
+                    for name, type_, amount, category, date in (
+                        ('lama', 'expense', 20000, food, '2024-02-20'),  # Sebelum periode mutasi
+                        ('makan 1', 'expense', 50000, food, '2024-03-01'),
+                        ('makan 2', 'expense', 50000, food, '2024-03-02'),
+                        ('gaji', 'income', 1_000_000, salary, '2024-03-10'),
+                        ('tidak di bank', 'expense', 75000, food, '2024-03-15'),
+                        ('servis', 'expense', 100000, food, '2024-03-18'),
+                        ('sesudah', 'expense', 12000, food, '2024-03-25'),  # Sesudah periode mutasi
+                    )}
+
+    def tearDown(self):
+        self.db.close()
+        self.workdir.cleanup()
+
+    def statement(self):
+        return [StatementLine(1, '2024-03-03', 'expense', 50000, 'DEBIT'),
+                StatementLine(2, '2024-03-03', 'expense', 50000, 'DEBIT'),
+                StatementLine(3, '2024-03-10', 'income', 1_000_000, 'GAJI'),
+                StatementLine(4, '2024-03-12', 'expense', 33000, 'QRIS'),
+                StatementLine(5, '2024-03-20', 'expense', 100500, 'SERVIS + ADMIN')]
+
+    def run_reconcile(self, **options):
+        reconciler = Reconciler(self.db, **options)
+        entries = list(reconciler.run(self.statement()))
+        matched = {entry.statement.line_no: entry.transaction['description']
+                   for entry in entries if entry.status == 'matched'}
+        missing = sorted(entry.statement.line_no for entry in entries if entry.status == 'missing')
+        extra = sorted(entry.transaction['description'] for entry in entries if entry.status == 'extra')
+        return reconciler.summary, matched, missing, extra
+
+    def test_match_missing_and_extra(self):
+        summary, matched, missing, extra = self.run_reconcile()
+        # Baris pertama mengambil transaksi yang tanggalnya paling dekat
+        self.assertEqual(matched, {1: 'makan 2', 2: 'makan 1', 3: 'gaji'})
+        self.assertEqual(missing, [4, 5])
+        self.assertEqual(extra, ['servis', 'tidak di bank'])
+        self.assertEqual((summary.matched, summary.missing, summary.extra), (3, 2, 2))
+        self.assertEqual(summary.missing_amount, 133500)
+        self.assertFalse(summary.balanced)
+
+    def test_amount_tolerance(self):
+        _, matched, missing, extra = self.run_reconcile(amount_tolerance=1000)
+        self.assertEqual(matched[5], 'servis')
+        self.assertEqual(missing, [4])
+        self.assertEqual(extra, ['tidak di bank'])
+
+    def test_date_tolerance(self):
+        _, matched, missing, _ = self.run_reconcile(date_tolerance=1)
+        # Hanya 'makan 2' yang masih dalam 1 hari dari tanggal mutasi
+        self.assertEqual(matched, {1: 'makan 2', 3: 'gaji'})
+        self.assertEqual(missing, [2, 4, 5])
+
+    def test_parse_statement_formats(self):
+        signed = parse_statement_line(2, {'date': '03/03/2024', 'amount': '-50000', 'description': 'x'})
+        self.assertEqual((signed.date, signed.type, signed.amount), ('2024-03-03', 'expense', 50000))
+        credit = parse_statement_line(3, {'date': '2024-03-10', 'debit': '', 'credit': '1000000'})
+        self.assertEqual((credit.type, credit.amount), ('income', 1_000_000))
+        with self.assertRaises(ValueError):
+            parse_statement_line(4, {'date': '2024-13-01', 'amount': '1'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+"""
+Sinkronisasi antar perangkat: export/apply, last-writer-wins, dan tanda hapus
+
+Jalankan dengan: python -m unittest test_sync
+"""
+import os
+import tempfile
+import unittest
+
+import sync
+from database import Database
+
+
+class SyncTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.laptop = Database(self.path('laptop.db'), cache_size=0)
+        self.phone = Database(self.path('hp.db'), cache_size=0)
+        self.laptop.update_sync_device(name='laptop')
+        self.phone.update_sync_device(name='hp')
+        self.food = self.laptop.get_category_id_by_name('Makanan')
+
+    def tearDown(self):
+        self.laptop.close()
+        self.phone.close()
+        self.workdir.cleanup()
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.workdir.name, name)
+
+    def send(self, source: Database, target: Database, source_name: str, target_name: str,
+             name: str) -> sync.SyncResult:
+        sync.export_changes(source, self.path(name), target_name)
+        return sync.apply_changes(target, self.path(name), peer=source_name)
+
+    def find(self, db: Database, uid: str):
+        return db.get_connection().execute('SELECT * FROM transactions WHERE uid = ?', (uid,)).fetchone()
+
+    def change(self, uid: str, amount: float, changed_at: str, op: str = 'upsert') -> dict:
+        data = None
+        if op == 'upsert':
+            data = {'type': 'expense', 'amount': amount, 'category': 'Makanan',
+                    'description': 'Kopi', 'date': '2024-05-01'}
+        return {'table': 'transactions', 'uid': uid, 'op': op, 'changed_at': changed_at,
+                'origin': 'perangkat-lain', 'data': data}
+
+    def test_round_trip_without_echo_or_duplicates(self):
+        transaction_id = self.laptop.add_transaction('expense', 25000, self.food, 'Kopi', '2024-05-01')
+        uid = self.laptop.get_transaction(transaction_id)['uid']
+
+        result = self.send(self.laptop, self.phone, 'laptop', 'hp', '1.jsonl')
+        self.assertEqual((result.applied, result.conflicts), (1, 0))  # Kategori bawaan dilewati
+        self.assertEqual(self.find(self.phone, uid)['amount'], 25000)
+
+        # File yang sama diterapkan ulang tidak mengubah apa pun
+        again = sync.apply_changes(self.phone, self.path('1.jsonl'), peer='laptop')
+        self.assertEqual(again.applied, 0)
+        self.assertEqual(self.phone.count_transactions(), 1)
+
+        # Balasan tidak mengirim balik perubahan dari laptop sendiri
+        reply = self.send(self.phone, self.laptop, 'hp', 'laptop', '2.jsonl')
+        self.assertEqual(reply.applied, 0)
+        self.assertEqual(self.laptop.count_transactions(), 1)
+        self.assertEqual([row['name'] for row in self.laptop.get_sync_peers()], ['hp'])
+        self.assertEqual([row['name'] for row in self.phone.get_sync_peers()], ['laptop'])
+
+    def test_last_writer_wins(self):
+        transaction_id = self.phone.add_transaction('expense', 25000, self.food, 'Kopi', '2024-05-01')
+        uid = self.phone.get_transaction(transaction_id)['uid']
+
+        older = self.phone.apply_changes([self.change(uid, 99000, '2000-01-01 00:00:00.000')])
+        self.assertEqual(older['conflicts'], 1)
+        self.assertEqual(self.find(self.phone, uid)['amount'], 25000)
+
+        newer = self.phone.apply_changes([self.change(uid, 30000, '9999-01-01 00:00:00.000')])
+        self.assertEqual(newer['applied'], 1)
+        self.assertEqual(self.find(self.phone, uid)['amount'], 30000)
+
+    def test_delete_survives_compaction(self):
+        transaction_id = self.laptop.add_transaction('expense', 25000, self.food, 'Kopi', '2024-05-01')
+        uid = self.laptop.get_transaction(transaction_id)['uid']
+        self.send(self.laptop, self.phone, 'laptop', 'hp', '1.jsonl')
+        self.laptop.delete_transaction(transaction_id)
+        self.send(self.laptop, self.phone, 'laptop', 'hp', '2.jsonl')
+        self.assertIsNone(self.find(self.phone, uid))
+
+        self.phone.compact_change_log()
+        stale = self.phone.apply_changes([self.change(uid, 25000, '2000-01-01 00:00:00.000')])
+        self.assertEqual(stale['conflicts'], 1)
+        self.assertIsNone(self.find(self.phone, uid))
+
+    def test_unknown_peer_requires_name(self):
+        # HP sudah export ke dua perangkat yang belum pernah membalas, jadi
+        # pengirim file balasan tidak bisa ditebak tanpa --peer
+        sync.export_changes(self.phone, self.path('ke-laptop.jsonl'), 'laptop-kantor')
+        sync.export_changes(self.phone, self.path('ke-tablet.jsonl'), 'tablet')
+        sync.export_changes(self.laptop, self.path('1.jsonl'), 'hp')
+        with self.assertRaises(ValueError):
+            sync.apply_changes(self.phone, self.path('1.jsonl'))
+        result = sync.apply_changes(self.phone, self.path('1.jsonl'), peer='laptop-kantor')
+        self.assertEqual(result.peer, 'laptop-kantor')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,279 @@
+"""
+Modul export/import transaksi secara streaming (CSV / JSON Lines)
+
+Data dibaca dan ditulis per baris/batch sehingga pemakaian memori tetap
+konstan, berapapun jumlah transaksinya. File berakhiran `.gz` otomatis
+dikompres/didekompres dengan gzip.
+"""
+import csv
+import gzip
+import json
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from database import Database
+from utils import validate_date, validate_amount
+
+EXPORT_FIELDS = ['id', 'date', 'type', 'category', 'amount', 'description']
+FORMATS = ('csv', 'jsonl')
+
+ProgressCallback = Callable[[int, float], None]
+
+
+@dataclass
+class ImportResult:
+    """Hasil proses import"""
+    imported: int = 0
+    skipped: int = 0
+    duplicates: int = 0
+    categorized: int = 0  # Kategori kosong yang diisi aturan kategori otomatis
+    errors: List[str] = field(default_factory=list)
+    anomalies: List[sqlite3.Row] = field(default_factory=list)  # Contoh pengeluaran tidak biasa
+    anomaly_count: int = 0
+    elapsed: float = 0.0
+
+    MAX_ERRORS = 20  # Hanya sebagian error yang disimpan agar memori tetap kecil
+    MAX_ANOMALIES = 10  # Begitu juga contoh anomali (jumlah totalnya di `anomaly_count`)
+
+    def add_error(self, line_no: int, message: str):
+        self.skipped += 1
+        if len(self.errors) < self.MAX_ERRORS:
+            self.errors.append(f"Baris {line_no}: {message}")
+
+    @property
+    def rate(self) -> float:
+        """Kecepatan import dalam baris/detik"""
+        return self.imported / self.elapsed if self.elapsed > 0 else 0
+
+
+class _Progress:
+    """Memanggil callback progress setiap `every` baris"""
+
+    def __init__(self, callback: Optional[ProgressCallback], every: int):
+        self.callback = callback
+        self.every = every
+        self.start = time.perf_counter()
+        self.count = 0
+
+    def step(self, n: int = 1):
+        before = self.count
+        self.count += n
+        if self.callback and self.count // self.every != before // self.every:
+            self.callback(self.count, self.elapsed)
+
+    def finish(self):
+        if self.callback:
+            self.callback(self.count, self.elapsed)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+
+def detect_format(path: str) -> str:
+    """Menentukan format file dari ekstensinya (csv/jsonl)"""
+    name = path[:-3] if path.endswith('.gz') else path
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    raise ValueError(f"Format file tidak dikenali: {path} (gunakan .csv atau .jsonl)")
+
+
+def open_text(path: str, mode: str, compress: Optional[bool] = None):
+    """Membuka file teks, memakai gzip jika `compress` atau berakhiran .gz"""
+    if compress is None:
+        compress = path.endswith('.gz')
+    if compress:
+        return gzip.open(path, mode + 't', encoding='utf-8', newline='')
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+# ===== EXPORT =====
+def export_transactions(db: Database, path: str, fmt: Optional[str] = None,
+                        compress: Optional[bool] = None, batch_size: int = 5000,
+                        progress: Optional[ProgressCallback] = None) -> int:
+    """Export seluruh transaksi ke CSV/JSONL secara streaming.
+
+    Mengembalikan jumlah baris yang ditulis.
+    """
+    fmt = fmt or detect_format(path)
+    tracker = _Progress(progress, batch_size)
+
+    with open_text(path, 'w', compress) as f:
+        if fmt == 'csv':
+            writer = csv.writer(f)
+            writer.writerow(EXPORT_FIELDS)
+            write = writer.writerow
+        else:
+            def write(values):
+                f.write(json.dumps(dict(zip(EXPORT_FIELDS, values)), ensure_ascii=False) + '\n')
+
+        for row in db.iter_transactions(batch_size):
+            write([row['id'], row['date'], row['type'], row['category_name'],
+                   row['amount'], row['description'] or ''])
+            tracker.step()
+
+    tracker.finish()
+    return tracker.count
+
+
+# ===== IMPORT =====
+def read_records(path: str, fmt: Optional[str] = None,
+                 on_error: Optional[Callable[[int, str], None]] = None) -> Iterator[Tuple[int, dict]]:
+    """Membaca record dari CSV/JSONL satu per satu sebagai (nomor baris file, record).
+
+    Baris yang tidak bisa dibaca dilaporkan ke `on_error(nomor_baris, pesan)`
+    lalu dilewati; tanpa `on_error`, ValueError dengan nomor baris.
+    """
+    def fail(line_no: int, message: str):
+        if on_error is None:
+            raise ValueError(f"Baris {line_no}: {message}")
+        on_error(line_no, message)
+
+    fmt = fmt or detect_format(path)
+    with open_text(path, 'r') as f:
+        if fmt == 'csv':
+            reader = csv.DictReader(f)
+            while True:
+                try:
+                    record = next(reader)
+                except StopIteration:
+                    break
+                except csv.Error as e:
+                    fail(reader.line_num, f"CSV tidak valid: {e}")
+                    continue
+                # line_num = baris terakhir record (header ikut dihitung)
+                yield reader.line_num, record
+        else:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    fail(line_no, f"JSON tidak valid: {e}")
+                    continue
+                if not isinstance(record, dict):
+                    fail(line_no, "bukan objek JSON")
+                    continue
+                yield line_no, record
+
+
+class _CategoryResolver:
+    """Memetakan nama kategori ke ID, membuat kategori baru bila belum ada.
+    Kategori kosong diisi dari aturan kategori otomatis (`rules.RuleSet`)."""
+
+    def __init__(self, db: Database, rules=None):
+        self.db = db
+        self.rules = rules
+        self.categorized = 0
+        self.cache: Dict[str, Tuple] = {
+            cat['name']: (cat['id'], cat['type']) for cat in db.get_all_categories()
+        }
+
+    def resolve(self, name: str, type_: str) -> int:
+        if name not in self.cache:
+            try:
+                self.cache[name] = (self.db.add_category(name, type_), type_)
+            except sqlite3.IntegrityError:
+                raise ValueError(f"kategori '{name}' tidak dapat dibuat")
+        category_id, category_type = self.cache[name]
+        if category_type != type_:
+            raise ValueError(f"kategori '{name}' bukan kategori {type_}")
+        return category_id
+
+    def auto(self, type_: str, amount: float, description: Optional[str]) -> int:
+        category_id = self.rules.categorize(type_, amount, description) if self.rules else None
+        if category_id is None:
+            raise ValueError("kategori kosong dan tidak ada aturan yang cocok")
+        self.categorized += 1
+        return category_id
+
+
+def validate_record(record: dict, categories: _CategoryResolver) -> tuple:
+    """Validasi satu record import dan ubah menjadi tuple siap insert"""
+    type_ = (record.get('type') or '').strip().lower()
+    if type_ not in ('income', 'expense'):
+        raise ValueError(f"tipe tidak valid: {record.get('type')!r}")
+
+    amount = validate_amount(str(record.get('amount') or ''))
+    if amount is None:
+        raise ValueError(f"jumlah tidak valid: {record.get('amount')!r}")
+
+    date = (record.get('date') or '').strip()
+    if not validate_date(date):
+        raise ValueError(f"tanggal tidak valid: {date!r}")
+
+    description = (record.get('description') or '').strip() or None
+    category = (record.get('category') or '').strip()
+    if category:
+        category_id = categories.resolve(category, type_)
+    else:
+        category_id = categories.auto(type_, amount, description)
+    return (type_, amount, category_id, description, date)
+
+
+def import_transactions(db: Database, path: str, fmt: Optional[str] = None,
+                        batch_size: int = 5000,
+                        progress: Optional[ProgressCallback] = None,
+                        dedupe: Optional[str] = None) -> ImportResult:
+    """Import transaksi dari CSV/JSONL secara streaming.
+
+    Setiap baris divalidasi lalu disimpan per batch; baris yang tidak valid
+    dilewati dan dicatat di hasil; kategori yang kosong diisi aturan
+    kategori otomatis (lihat modul `rules`). `dedupe` ('skip', 'flag', 'merge')
+    mengaktifkan deteksi duplikat (lihat `dedupe.Deduplicator`). Pengeluaran
+    hasil import yang jumlahnya tidak biasa dihitung di `anomaly_count`, beberapa
+    yang terbaru disimpan di `anomalies`.
+    """
+    result = ImportResult()
+    first_id = db.max_transaction_id() + 1
+    from rules import RuleSet
+    categories = _CategoryResolver(db, RuleSet.load(db))
+    tracker = _Progress(progress, batch_size)
+    batch = []
+
+    def flush():
+        nonlocal batch
+        if batch:
+            db.add_transactions_bulk(batch)
+            tracker.step(len(batch))
+            batch = []
+            if deduplicator:
+                deduplicator.flushed()
+
+    deduplicator = None
+    if dedupe:
+        from dedupe import Deduplicator
+        deduplicator = Deduplicator(db, dedupe)
+
+    for line_no, record in read_records(path, fmt, on_error=result.add_error):
+        try:
+            row = validate_record(record, categories)
+        except (ValueError, AttributeError) as e:
+            result.add_error(line_no, str(e))
+            continue
+
+        if deduplicator:
+            row = deduplicator.check(row, batch, flush)
+            if row is None:
+                continue
+        batch.append(row)
+
+        if len(batch) >= batch_size:
+            flush()
+
+    flush()
+    tracker.finish()
+    if deduplicator:
+        result.duplicates = deduplicator.duplicates
+    result.categorized = categories.categorized
+    result.anomalies = db.get_anomalies(min_id=first_id, limit=ImportResult.MAX_ANOMALIES)
+    result.anomaly_count = db.count_anomalies(min_id=first_id)
+    result.imported = tracker.count
+    result.elapsed = tracker.elapsed
+    return result
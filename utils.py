@@ -1,9 +1,31 @@
 """
 Utility functions untuk py-money
 """
+import hashlib
+import math
 import os
+import re
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
+
+_NON_WORD = re.compile(r'[\W_]+', re.UNICODE)
+
+# Bucket logaritmik untuk sketch kuantil jumlah transaksi (lihat spending_stats):
+# setiap nilai di bucket i berada dalam (gamma^(i-1), gamma^i], sehingga
+# estimasi kuantil punya galat relatif maksimal SKETCH_RELATIVE_ACCURACY
+SKETCH_RELATIVE_ACCURACY = 0.01
+SKETCH_GAMMA = (1 + SKETCH_RELATIVE_ACCURACY) / (1 - SKETCH_RELATIVE_ACCURACY)
+SKETCH_ZERO_BUCKET = -1_000_000  # Bucket khusus untuk jumlah 0
+_LOG_GAMMA = math.log(SKETCH_GAMMA)
+
+# Kunci merchant: kata pertama deskripsi setelah membuang kata yang
+# mengandung angka (nomor referensi, cabang, tanggal) dan kata umum transaksi
+MERCHANT_WORDS = 2
+MERCHANT_STOPWORDS = frozenset({
+    'bayar', 'pembayaran', 'beli', 'pembelian', 'belanja', 'trf', 'transfer', 'tarik',
+    'setor', 'qris', 'debit', 'kredit', 'edc', 'pos', 'ref', 'no', 'di', 'ke', 'dari',
+    'via', 'untuk', 'payment', 'purchase', 'pt', 'cv', 'tbk',
+})
 
 def clear_screen():
     """Membersihkan layar terminal"""
@@ -36,6 +58,16 @@ def validate_date(date_str: str) -> bool:
     except ValueError:
         return False
 
+def validate_period(period_str: str) -> bool:
+    """Validasi bulan YYYY-MM atau tanggal YYYY-MM-DD"""
+    if validate_date(period_str):
+        return True
+    try:
+        datetime.strptime(period_str, "%Y-%m")
+        return len(period_str) == 7
+    except ValueError:
+        return False
+
 def validate_amount(amount_str: str) -> Optional[float]:
     """Validasi dan konversi string amount ke float"""
     try:
@@ -63,4 +95,49 @@ def get_input(prompt: str, default: str = "", required: bool = True) -> str:
 def confirm_action(prompt: str = "Apakah Anda yakin?") -> bool:
     """Konfirmasi tindakan dengan user"""
     response = input(f"{prompt} (y/n): ").strip().lower()
-    return response in ['y', 'ya', 'yes']
\ No newline at end of file
+    return response in ['y', 'ya', 'yes']
+
+def format_category_name(category) -> str:
+    """Nama kategori diindentasi sesuai levelnya di pohon kategori"""
+    return "  " * category['level'] + ("└ " if category['level'] else "") + category['name']
+
+def print_progress(rows: int, elapsed: float):
+    """Mencetak progress proses batch dalam baris/detik (satu baris, ditimpa)"""
+    rate = rows / elapsed if elapsed > 0 else 0
+    print(f"\r  {rows:>12,} baris | {elapsed:8.1f} detik | {rate:>10,.0f} baris/detik",
+          end='', flush=True)
+
+def normalize_description(description: Optional[str]) -> str:
+    """Deskripsi huruf kecil tanpa tanda baca dan spasi berlebih"""
+    if not description:
+        return ''
+    return _NON_WORD.sub(' ', description.lower()).strip()
+
+def transaction_fingerprint(date: str, amount: float, description: Optional[str],
+                            category_id: int) -> str:
+    """Hash 64-bit (16 karakter hex) dari isi transaksi untuk deteksi duplikat"""
+    key = f"{date}|{amount:.2f}|{normalize_description(description)}|{category_id}"
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=8).hexdigest()
+
+def merchant_key(description: Optional[str]) -> Optional[str]:
+    """Kunci merchant ternormalisasi dari deskripsi, misalnya
+    "QRIS Indomaret 1234 Jkt" -> "indomaret jkt"; None jika tidak ada"""
+    words = [word for word in normalize_description(description).split()
+             if word not in MERCHANT_STOPWORDS and not any(ch.isdigit() for ch in word)]
+    return ' '.join(words[:MERCHANT_WORDS]) or None
+
+def amount_bucket(amount: float) -> int:
+    """Nomor bucket sketch untuk sebuah jumlah transaksi"""
+    if amount <= 0:
+        return SKETCH_ZERO_BUCKET
+    return math.ceil(math.log(amount) / _LOG_GAMMA)
+
+def parse_tags(text: Optional[str]) -> List[str]:
+    """Memecah input tag dipisah koma menjadi nama tag yang dinormalisasi
+    (huruf kecil, spasi diganti '-'), tanpa duplikat"""
+    tags = []
+    for part in (text or '').split(','):
+        tag = '-'.join(part.lower().split())
+        if tag and tag not in tags:
+            tags.append(tag)
+    return tags